@@ -0,0 +1,46 @@
+"""Time of computing the color range of SPM images with two `np.percentile`
+calls compared to `color_range` in the modes "exact" and "approx".
+
+Run with `uv run python benchmarks/bench_colorrange.py`.
+"""
+
+import time
+from collections.abc import Callable
+
+import numpy as np
+
+from proespm.spm.colorrange import color_range
+
+PERCENTILES = (0.1, 99.9)
+
+
+def best_time(func: Callable[[], object], repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _ = func()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    for size in (512, 2048, 4096):
+        arr = rng.normal(size=(size, size))
+        numpy_time = best_time(
+            lambda: (np.percentile(arr, 0.1), np.percentile(arr, 99.9))
+        )
+        exact_time = best_time(lambda: color_range(arr, PERCENTILES))
+        approx_time = best_time(
+            lambda: color_range(arr, PERCENTILES, "approx")
+        )
+        print(
+            f"{size:>4}x{size:<4}: np.percentile {numpy_time * 1e3:7.1f} ms, "
+            f"exact {exact_time * 1e3:7.1f} ms, "
+            f"approx {approx_time * 1e3:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
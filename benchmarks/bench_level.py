@@ -0,0 +1,79 @@
+"""Time of leveling SPM images with `SpmImage.level` compared to the chain
+`corr_plane().corr_lines_median().corr_plane().corr_lines_median()`, and of
+leveling the frames of a movie with `level_images` compared to calling
+`SpmImage.level` for each frame.
+
+Run with `uv run python benchmarks/bench_level.py`.
+"""
+
+import time
+from collections.abc import Callable
+
+import numpy as np
+
+from proespm.config import Config
+from proespm.spm.spm import SpmImage, level_images
+
+
+def chain(image: SpmImage) -> None:
+    _ = (
+        image.corr_plane()
+        .corr_lines_median()
+        .corr_plane()
+        .corr_lines_median()
+    )
+
+
+def level(image: SpmImage) -> None:
+    _ = image.level()
+
+
+def best_time(
+    arr: np.ndarray, correction: Callable[[SpmImage], None], repeat: int = 5
+) -> float:
+    """Best time of applying `correction` to a copy of `arr`."""
+    times = []
+    for _ in range(repeat):
+        image = SpmImage(arr.copy(), 100.0)
+        start = time.perf_counter()
+        correction(image)
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    for size in (512, 2048, 4096):
+        y, x = np.mgrid[0:size, 0:size]
+        arr = 0.1 * x + 0.2 * y + rng.normal(size=(size, size))
+        chain_time = best_time(arr, chain)
+        level_time = best_time(arr, level)
+        print(
+            f"{size:>4}x{size:<4}: chain {chain_time * 1e3:8.1f} ms, "
+            f"level {level_time * 1e3:8.1f} ms "
+            f"({chain_time / level_time:.1f}x)"
+        )
+
+    config = Config(colormap="inferno", colorrange=(0.1, 99.9))
+    for num_frames, size in ((5000, 64), (1000, 128)):
+        frames = rng.normal(size=(num_frames, size, size))
+        times = []
+        for stacked in (False, True):
+            images = [SpmImage(frame, 100.0) for frame in frames]
+            start = time.perf_counter()
+            if stacked:
+                level_images(images, config)
+            else:
+                for image in images:
+                    _ = image.prepare(config).level()
+            times.append(time.perf_counter() - start)
+        print(
+            f"{num_frames:>4} frames of {size}x{size}: per frame "
+            f"{times[0] * 1e3:8.1f} ms, stacked {times[1] * 1e3:8.1f} ms "
+            f"({times[0] / times[1]:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
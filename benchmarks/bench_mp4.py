@@ -0,0 +1,99 @@
+"""Time of writing the movie of a .flm file with `StmFlm.convert_to_mp4`
+compared to the previous loop, which normalized, colored, labeled and
+encoded one frame after another, and with frames downscaled by 2.
+
+Encoding runs in a background thread, so the gain depends on the number of
+available cores.
+
+Run with `uv run python benchmarks/bench_mp4.py`.
+"""
+
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from proespm.spm.flm import StmFlm
+from proespm.spm.spm import SpmImage
+
+
+def make_flm(frames: np.ndarray, movie_dir: str) -> StmFlm:
+    """`StmFlm` with the given frames, without reading a file."""
+    flm = StmFlm.__new__(StmFlm)
+    flm.mulimages = [
+        SimpleNamespace(
+            img_data=SpmImage(frame, 100.0), speed=1.0, xsize=100, ysize=100
+        )
+        for frame in frames
+    ]
+    flm.mp4_save_dir = movie_dir
+    flm.mp4_name = os.path.join(movie_dir, "bench.mp4")
+    flm.dimensions = frames.shape[1:]
+    return flm
+
+
+def serial(flm: StmFlm, fps: int = 10) -> None:
+    """Frame by frame encoding as done before."""
+    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+    video = cv2.VideoWriter(flm.mp4_name, fourcc, fps, flm.dimensions)
+    scan_duration = 0
+    for frame, img in enumerate(flm.mulimages):
+        img_norm = cv2.normalize(
+            img.img_data.arr,
+            None,
+            255,
+            0,
+            norm_type=cv2.NORM_MINMAX,
+            dtype=cv2.CV_8U,
+        )
+        img_color = cv2.applyColorMap(img_norm, cv2.COLORMAP_HOT)
+        overlay = img_color.copy()
+        scan_duration += img.speed
+        size = f"{img.xsize:.0f}nm x {img.ysize:.0f}nm"
+        _ = cv2.putText(
+            overlay,
+            f"{frame}, {scan_duration:.2f} s, {size}",
+            (10, 20),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.4,
+            (255, 255, 255, 0.1),
+            1,
+        )
+        _ = cv2.addWeighted(overlay, 0.5, img_color, 0.5, 0, img_color)
+        video.write(img_color)
+    video.release()
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as movie_dir:
+        for num_frames, size in ((2000, 128), (500, 256), (100, 512)):
+            frames = rng.normal(size=(num_frames, size, size))
+            flm = make_flm(frames, movie_dir)
+
+            start = time.perf_counter()
+            serial(flm)
+            serial_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            flm.convert_to_mp4()
+            pipelined_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            flm.convert_to_mp4(downscale=2)
+            downscaled_time = time.perf_counter() - start
+
+            print(
+                f"{num_frames:>4} frames {size:>3}x{size:<3}: "
+                f"serial {serial_time * 1e3:8.1f} ms, "
+                f"pipelined {pipelined_time * 1e3:8.1f} ms "
+                f"({serial_time / pipelined_time:.1f}x), "
+                f"downscaled {downscaled_time * 1e3:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
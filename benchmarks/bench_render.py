@@ -0,0 +1,44 @@
+"""Time of `SpmImage.plot` with the matplotlib and the fast renderer.
+
+Run with `uv run python benchmarks/bench_render.py`.
+"""
+
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from proespm.config import Config
+from proespm.spm.spm import SpmImage
+
+CONFIG = Config(colormap="inferno", colorrange=(0.1, 99.9))
+
+
+def plot_time(arr: np.ndarray, renderer: str, repeat: int = 5) -> float:
+    """Best time of plotting `arr` with `renderer`."""
+    config = replace(CONFIG, renderer=renderer)
+    times = []
+    for _ in range(repeat):
+        image = SpmImage(arr.copy(), 100.0)
+        start = time.perf_counter()
+        _ = image.plot(config, "image")
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    for size in (512, 2048):
+        arr = rng.random((size, size))
+        matplotlib_time = plot_time(arr, "matplotlib")
+        fast_time = plot_time(arr, "fast")
+        print(
+            f"{size:>4}x{size:<4}: matplotlib {matplotlib_time * 1e3:7.1f} ms, "
+            f"fast {fast_time * 1e3:7.1f} ms "
+            f"({matplotlib_time / fast_time:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Classification cost per file of the header checks in `_read_measurement`.
+
+Compares the previous approach, which reopened the file for every check, with
+`FileSniffer`, which reads the start of a file only once.
+
+Run with `uv run python benchmarks/bench_sniffer.py`.
+"""
+
+import timeit
+from pathlib import Path
+
+from proespm.sniffer import FileSniffer
+
+testdata = Path(__file__).parent.parent / "tests" / "testdata"
+
+CSV_FILES = sorted(testdata.rglob("*.csv"))
+
+# The checks of the `.csv` cases in `_read_measurement`, in order
+CSV_CHECKS = (
+    ("Scan rate", 1),
+    ("Freq_Hz", 1),
+    ("Date and time", 1),
+    ("Date and time", 4),
+    ("Scan rate", 1),
+    ("Freq_Hz", 1),
+    ("Chronopotentiometry", 4),
+    ("Chronoamperometry", 4),
+    ("Cyclic Voltammetry", 4),
+    ("Linear Sweep Voltammetry", 4),
+    ("Impedance Spectroscopy", 2),
+)
+
+
+def _check_file_for_str(
+    file: Path, string_to_check: str, line_num: int
+) -> bool:
+    """Previous implementation, opening the file on every call."""
+    try:
+        with file.open() as f:
+            [next(f) for _ in range(line_num - 1)]
+            line = f.readline()
+
+    except UnicodeDecodeError:
+        with file.open(encoding="utf-16") as f:
+            [next(f) for _ in range(line_num - 1)]
+            line = f.readline()
+
+    return string_to_check in line
+
+
+def classify_before(path: Path) -> None:
+    for string, line_num in CSV_CHECKS:
+        _ = _check_file_for_str(path, string, line_num)
+
+
+def classify_after(path: Path) -> None:
+    check = FileSniffer(path).check
+    for string, line_num in CSV_CHECKS:
+        _ = check(string, line_num)
+
+
+def main() -> None:
+    number = 200
+    print(f"Classification of {len(CSV_FILES)} .csv files, {number} runs")
+    for name, func in (("before", classify_before), ("after", classify_after)):
+        seconds = min(
+            timeit.repeat(
+                lambda: [func(path) for path in CSV_FILES],
+                number=number,
+                repeat=5,
+            )
+        )
+        per_file = seconds / number / len(CSV_FILES) * 1e6
+        print(f"{name:>8}: {per_file:8.1f} µs per file")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Startup time of the CLI, measured as the wall time of `proespm --version`.
+
+Heavy dependencies of the readers (matplotlib, bokeh, h5py, ...) are only
+imported once a file of the according type is read, so this should stay far
+below the time needed to import all readers, which is shown for comparison.
+
+Run with `uv run python benchmarks/bench_startup.py`.
+"""
+
+import subprocess
+import sys
+import time
+
+VERSION = (
+    "import sys; sys.argv = ['proespm', '--version'];"
+    "from proespm.cli import run_cli; run_cli()"
+)
+ALL_READERS = (
+    "from proespm.registry import BUILTIN_READERS;"
+    "[spec.load() for spec in BUILTIN_READERS]"
+)
+
+
+def wall_time(code: str, repeat: int = 5) -> float:
+    """Best wall time of running `code` in a fresh interpreter."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _ = subprocess.run(
+            [sys.executable, "-c", code], check=True, capture_output=True
+        )
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main() -> None:
+    for name, code in (
+        ("proespm --version", VERSION),
+        ("import all readers", ALL_READERS),
+    ):
+        print(f"{name:>20}: {wall_time(code) * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Time and memory of reading .sxm files with `StmSxm`, which only reads the
+Z channel, compared to `nanonispy.read.Scan`, which reads all channels.
+
+The files are created from the test file with additional channels, like
+files recorded with current, phase, amplitude, etc.
+
+Run with `uv run python benchmarks/bench_sxm.py`.
+"""
+
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import nanonispy as nap
+import numpy as np
+
+from proespm.spm.sxm import DATA_START, StmSxm
+
+TESTDATA = Path(__file__).parents[1] / "tests" / "testdata"
+TEST_FILE = TESTDATA / "stm-nanonis-sxm.sxm"
+
+
+def make_sxm(path: Path, size: int, num_channels: int) -> None:
+    """Write an .sxm file with the header of the test file, `size` x `size`
+    pixels and `num_channels` channels recorded in both directions."""
+    content = TEST_FILE.read_bytes()
+    header = content[: content.index(DATA_START)].decode()
+    info_start = header.index(":DATA_INFO:")
+    info_end = header.index("\n\n", info_start)
+    rows = ["\tChannel\tName\tUnit\tDirection\tCalibration\tOffset"]
+    rows.append("\t14\tZ\tm\tboth\t7.500E-8\t0.000E+0")
+    rows.extend(
+        f"\t{i}\tSignal{i}\tV\tboth\t1.000E+0\t0.000E+0"
+        for i in range(num_channels - 1)
+    )
+    header = (
+        header[:info_start]
+        + ":DATA_INFO:\n"
+        + "\n".join(rows)
+        + header[info_end:]
+    ).replace("256       256", f"{size}       {size}")
+
+    data = np.random.default_rng(0).random(
+        (num_channels, 2, size, size), dtype=np.float32
+    )
+    with open(path, "wb") as f:
+        _ = f.write(header.encode() + DATA_START)
+        _ = f.write(data.astype(">f4").tobytes())
+
+
+def measure(read: Callable[[Path], Any], path: Path) -> tuple[float, float]:
+    """Best time in ms and peak of allocated memory in MiB of `read`."""
+    times = []
+    for _ in range(3):
+        start = time.perf_counter()
+        _ = read(path)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    _ = read(path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return min(times) * 1e3, peak / 1024**2
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size, num_channels in ((512, 2), (512, 8), (1024, 8), (2048, 4)):
+            path = Path(tmp_dir) / f"{size}_{num_channels}.sxm"
+            make_sxm(path, size, num_channels)
+            nap_time, nap_peak = measure(nap.read.Scan, path)
+            sxm_time, sxm_peak = measure(StmSxm, path)
+            print(
+                f"{size:>4}x{size:<4} {num_channels} channels: "
+                f"nanonispy {nap_time:7.1f} ms {nap_peak:6.1f} MiB, "
+                f"StmSxm {sxm_time:7.1f} ms {sxm_peak:6.1f} MiB "
+                f"({nap_time / sxm_time:.1f}x)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import base64
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import Any
+
+from proespm.config import Config, config_digest
+
+
+def assets_dir_for(output_path: Path) -> Path:
+    """Directory of the external assets of the report at `output_path`."""
+    return output_path.with_name(f"{output_path.stem}_files")
+
+
+def asset_name(filepath: Path, suffix: str = "") -> str:
+    """Name for `image_uri` of an image of the measurement file `filepath`.
+
+    The stem of the file is followed by a short hash of its full path, as
+    files with the same name in different subdirectories must not share an
+    image.
+
+    Args:
+        filepath: Path to the measurement file.
+        suffix: Appended to distinguish several images of the same file.
+
+    Returns:
+        The name of the image.
+    """
+    path_hash = hashlib.sha256(str(filepath.resolve()).encode()).hexdigest()
+    return f"{filepath.stem}_{path_hash[:8]}{suffix}"
+
+
+def write_atomic(filepath: Path, data: bytes) -> None:
+    """Write `data` to `filepath` through a temporary file in the same
+    directory, so that concurrent readers and writers never see a partially
+    written file.
+
+    The temporary file is created with `open`, so the file gets the usual
+    permissions of new files according to the umask, unlike files from
+    `tempfile.mkstemp`, which only the owner can read.
+    """
+    tmp_path = filepath.with_name(f".{filepath.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp_path, "xb") as f:
+            _ = f.write(data)
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def image_uri(data: bytes, extension: str, name: str, config: Config) -> str:
+    """URI of an image in the HTML report.
+
+    Images are embedded as data URI, unless `config.assets_dir` is set. Then
+    the image is written to a file in this directory and its URL relative to
+    the report is returned. The filename ends with a short hash of `config`,
+    so that reports of the same files with other settings do not overwrite
+    the image, which cached results of these settings still refer to.
+
+    Args:
+        data: Encoded image.
+        extension: File extension of the image format without leading dot,
+            also used as MIME subtype.
+        name: Filename of the image without extension, which must be unique
+            within the report, see `asset_name`. Not used if
+            `config.hash_assets` is set.
+        config: Runtime configuration.
+
+    Returns:
+        Value for the `src` attribute of the `<img>` tag.
+    """
+    if config.assets_dir is None:
+        encoded = base64.b64encode(data).decode("ascii")
+        return f"data:image/{extension};base64,{encoded}"
+
+    if config.hash_assets:
+        name = hashlib.sha256(data).hexdigest()[:32]
+    else:
+        name = f"{name}_{config_digest(config)[:8]}"
+    filepath = config.assets_dir / f"{name}.{extension}"
+
+    if not (config.hash_assets and filepath.exists()):
+        config.assets_dir.mkdir(parents=True, exist_ok=True)
+        # Workers may write the same file concurrently
+        write_atomic(filepath, data)
+
+    return f"{config.assets_dir.name}/{filepath.name}"
+
+
+def assets_exist(artifacts: Any, assets_dir: Path) -> bool:
+    """Check if all files in `assets_dir` that are referenced by the render
+    `artifacts` exist."""
+    match artifacts:
+        case str() if artifacts.startswith(f"{assets_dir.name}/"):
+            return (assets_dir.parent / artifacts).exists()
+        case dict():
+            return all(assets_exist(v, assets_dir) for v in artifacts.values())
+        case list() | tuple():
+            return all(assets_exist(v, assets_dir) for v in artifacts)
+        case _:
+            return True
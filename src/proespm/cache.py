@@ -0,0 +1,124 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any, final
+
+from proespm.assets import assets_exist
+from proespm.config import Config, config_digest
+from proespm.measurement import Measurement
+
+def default_cache_dir() -> Path:
+    """Platform specific default location of the cache."""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")
+
+    return Path(base) / "proespm"
+
+
+@final
+class ArtifactCache:
+    """Persistent cache of the render artifacts of processed measurements.
+
+    Entries are keyed by the size, modification time and inode of the
+    measurement's source files together with the `Config` and the version of
+    proespm. If the total size of the cache exceeds `max_size`, the least
+    recently used entries are removed by `evict`.
+
+    Args:
+        cache_dir: Directory where the cache entries are stored.
+        max_size: Maximum size of the cache in bytes.
+    """
+
+    def __init__(self, cache_dir: Path, max_size: int) -> None:
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def get(
+        self, measurement: Measurement, config: Config
+    ) -> dict[str, Any] | None:
+        """Cached render artifacts of `measurement`, None if there are none."""
+        entry = self._entry_path(measurement, config)
+        if entry is None or not entry.exists():
+            return None
+
+        try:
+            with open(entry, "rb") as f:
+                artifacts = pickle.load(f)
+        except Exception:
+            entry.unlink(missing_ok=True)
+            return None
+
+        # Image files of a previous run may have been deleted since
+        if config.assets_dir is not None and not assets_exist(
+            artifacts, config.assets_dir
+        ):
+            return None
+
+        # Modification time serves as last access time for the LRU eviction
+        os.utime(entry)
+        return artifacts
+
+    def put(self, measurement: Measurement, config: Config) -> None:
+        """Store the render artifacts of the processed `measurement`."""
+        entry = self._entry_path(measurement, config)
+        if entry is None:
+            return
+
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so concurrent runs never read
+        # partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=entry.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(measurement.render_artifacts(), f)
+        os.replace(tmp_path, entry)
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache is smaller
+        than `max_size`."""
+        entries: list[tuple[float, int, Path]] = []
+        for path in self.cache_dir.glob("*/*.pickle"):
+            stat = path.stat()
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+
+    def _entry_path(
+        self, measurement: Measurement, config: Config
+    ) -> Path | None:
+        """Location of the cache entry, None for measurements without
+        render artifacts."""
+        if not measurement.render_artifacts():
+            return None
+
+        key = hashlib.sha256()
+        key.update(_proespm_version().encode())
+        key.update(type(measurement).__qualname__.encode())
+        key.update(measurement.m_id().encode())
+        for path in measurement.source_files():
+            stat = path.stat()
+            key.update(
+                f"{path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}:"
+                f"{stat.st_ino}".encode()
+            )
+        key.update(config_digest(config).encode())
+
+        digest = key.hexdigest()
+        return self.cache_dir / digest[:2] / f"{digest}.pickle"
+
+
+def _proespm_version() -> str:
+    try:
+        return version("proespm")
+    except PackageNotFoundError:
+        return ""
@@ -1,20 +1,24 @@
 import argparse
 import logging
 import sys
+import time
 import tomllib
 from dataclasses import dataclass
 from pathlib import Path
 from pprint import pformat
 from typing import cast
 
-import matplotlib.pyplot as plt
-
-from proespm.config import Config
+from proespm.assets import assets_dir_for
+from proespm.cache import ArtifactCache, default_cache_dir
+from proespm.config import DEFAULT_CACHE_SIZE, Config
 from proespm.processing import (
     create_html,
     create_measurement_objs,
     process_loop,
+    read_and_process,
 )
+from proespm.profiling import Profiler
+from proespm.watch import ReportWatcher
 
 
 @dataclass
@@ -24,6 +28,23 @@ class Args:
     colormap: str
     colorrange_start: float
     colorrange_end: float
+    colorrange_mode: str
+    colorrange_tolerance: float
+    float32: bool
+    renderer: str
+    mp4_fps: int
+    mp4_downscale: int
+    fastspm_preview_frames: int
+    fastspm_image_max_size: int
+    jobs: int
+    lean: bool
+    no_cache: bool
+    cache_dir: Path | None
+    external_assets: bool
+    hash_assets: bool
+    profile: Path | None
+    watch: bool
+    watch_interval: float
     verbose: int
 
 
@@ -35,7 +56,10 @@ def run_cli() -> None:
         print(f"No such directory: {data_dir}", file=sys.stderr)
         sys.exit(1)
 
-    if args.colormap not in plt.colormaps():
+    # Imported here, so that e.g. `--version` does not load matplotlib
+    from matplotlib import colormaps
+
+    if args.colormap not in colormaps:
         print(f"No such colormap '{args.colormap}'", file=sys.stderr)
         sys.exit(1)
 
@@ -52,6 +76,36 @@ def run_cli() -> None:
         )
         sys.exit(1)
 
+    if args.colorrange_tolerance <= 0:
+        print("Color range tolerance must be greater than 0", file=sys.stderr)
+        sys.exit(1)
+
+    if args.mp4_fps < 1:
+        print("Frame rate of movies must be at least 1", file=sys.stderr)
+        sys.exit(1)
+
+    if args.mp4_downscale < 1:
+        print("Downscale factor of movies must be at least 1", file=sys.stderr)
+        sys.exit(1)
+
+    if args.fastspm_preview_frames < 0:
+        print(
+            "Number of preview frames must not be negative", file=sys.stderr
+        )
+        sys.exit(1)
+
+    if args.fastspm_image_max_size < 0:
+        print("Maximum image size must not be negative", file=sys.stderr)
+        sys.exit(1)
+
+    if args.jobs < 1:
+        print("Number of jobs must be at least 1", file=sys.stderr)
+        sys.exit(1)
+
+    if args.watch_interval <= 0:
+        print("Watch interval must be greater than 0", file=sys.stderr)
+        sys.exit(1)
+
     log_format = "[%(asctime)s %(levelname)s %(name)s]: %(message)s"
     log_level = determine_log_level(args.verbose)
     logging.basicConfig(format=log_format, level=log_level)
@@ -64,20 +118,104 @@ def run_cli() -> None:
 
     report_name = args.data_dir.name
 
-    config = Config(colormap=args.colormap, colorrange=colorrange)
+    assets_dir = None
+    if args.external_assets or args.hash_assets:
+        assets_dir = assets_dir_for(output_path.resolve())
+
+    config = Config(
+        colormap=args.colormap,
+        colorrange=colorrange,
+        colorrange_mode=args.colorrange_mode,
+        colorrange_tolerance=args.colorrange_tolerance,
+        float32=args.float32,
+        renderer=args.renderer,
+        mp4_fps=args.mp4_fps,
+        mp4_downscale=args.mp4_downscale,
+        fastspm_preview_frames=args.fastspm_preview_frames,
+        fastspm_image_max_size=args.fastspm_image_max_size,
+        jobs=args.jobs,
+        lean=args.lean,
+        assets_dir=assets_dir,
+        hash_assets=args.hash_assets,
+    )
     logging.info(f"Using config: {config}")
 
+    cache = None
+    if not args.no_cache:
+        cache_dir = args.cache_dir or default_cache_dir()
+        cache = ArtifactCache(cache_dir, DEFAULT_CACHE_SIZE)
+        logging.info(f"Using cache at {cache_dir}")
+
+    if args.watch:
+        watch(
+            data_dir,
+            output_path,
+            report_name,
+            config,
+            cache,
+            args.watch_interval,
+        )
+        return
+
+    profiler = Profiler() if args.profile is not None else None
+
     print(f"Start processing of {data_dir}")
-    measurement_objs = create_measurement_objs(str(data_dir), print)
-    logging.info(
-        f"Created measurement objects:\n{pformat([x.m_id() for x in measurement_objs])}"
-    )
+    if config.lean:
+        measurement_objs = read_and_process(
+            str(data_dir), config, print, cache, profiler
+        )
+    else:
+        measurement_objs = create_measurement_objs(
+            str(data_dir), print, args.jobs, profiler, cache
+        )
+        logging.info(
+            f"Created measurement objects:\n{pformat([x.m_id() for x in measurement_objs])}"
+        )
 
-    process_loop(measurement_objs, config, print)
-    create_html(measurement_objs, str(output_path), report_name)
+        process_loop(measurement_objs, config, print, cache, profiler)
+    create_html(
+        measurement_objs,
+        str(output_path),
+        report_name,
+        release=True,
+        profiler=profiler,
+    )
 
     print(f"HTML created at {output_path}")
 
+    if profiler is not None and args.profile is not None:
+        profiler.write_trace(args.profile)
+        logging.info("Profile summary:\n" + "\n".join(profiler.summary()))
+        print(f"Profile written to {args.profile}")
+
+
+def watch(
+    data_dir: Path,
+    output_path: Path,
+    report_name: str,
+    config: Config,
+    cache: ArtifactCache | None,
+    interval: float,
+) -> None:
+    """Update the report whenever files in `data_dir` change, until
+    interrupted with Ctrl+C."""
+    watcher = ReportWatcher(
+        str(data_dir), str(output_path), report_name, config, print, cache
+    )
+    print(f"Watching {data_dir} (press Ctrl+C to stop)")
+    try:
+        while True:
+            try:
+                if watcher.update():
+                    print(f"HTML updated at {output_path}")
+            except Exception as e:
+                # Files may be incomplete or vanish while being copied
+                logging.exception(e)
+                print(f"Update failed: {e}", file=sys.stderr)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
 
 def parse_args() -> Args:
     parser = argparse.ArgumentParser(
@@ -116,6 +254,103 @@ def parse_args() -> Args:
         default=99.9,
         help="Percentile end of color range for microscopy data (default: %(default)s)",
     )
+    _ = parser.add_argument(
+        "--colorrange-mode",
+        choices=("exact", "approx"),
+        default="exact",
+        help="Computation of the color range, 'approx' estimates the percentiles from a sample of the pixels (default: %(default)s)",
+    )
+    _ = parser.add_argument(
+        "--colorrange-tolerance",
+        type=float,
+        default=0.05,
+        help="Maximum error of the color range in percentile units with --colorrange-mode approx (default: %(default)s)",
+    )
+    _ = parser.add_argument(
+        "--float32",
+        action="store_true",
+        help="Process microscopy data in single precision, which halves its memory usage",
+    )
+    _ = parser.add_argument(
+        "--renderer",
+        choices=("matplotlib", "fast"),
+        default="matplotlib",
+        help="Renderer of microscopy images, 'fast' does not create matplotlib figures (default: %(default)s)",
+    )
+    _ = parser.add_argument(
+        "--mp4-fps",
+        type=int,
+        default=10,
+        help="Frame rate of the movies created from .flm files (default: %(default)s)",
+    )
+    _ = parser.add_argument(
+        "--mp4-downscale",
+        type=int,
+        default=1,
+        help="Factor by which the frames of the movies created from .flm files are downscaled (default: %(default)s)",
+    )
+    _ = parser.add_argument(
+        "--fastspm-preview-frames",
+        type=int,
+        default=8,
+        help="Number of frames in the preview of fast scan .h5 files, 0 to disable (default: %(default)s)",
+    )
+    _ = parser.add_argument(
+        "--fastspm-image-max-size",
+        type=int,
+        default=0,
+        help="Maximum width and height in pixels of the screenshots of FastSPM files, 0 to embed them unchanged (default: %(default)s)",
+    )
+    _ = parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of parallel jobs used for reading and processing (default: %(default)s)",
+    )
+    _ = parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="Read and process one file after another and free its data right away, which keeps the memory usage low for large directories",
+    )
+    _ = parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Process all files again instead of using cached results",
+    )
+    _ = parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        help="Directory of the cache for processed results (default: user cache directory)",
+    )
+    _ = parser.add_argument(
+        "--external-assets",
+        action="store_true",
+        help="Write images to separate files in a directory next to the report instead of embedding them",
+    )
+    _ = parser.add_argument(
+        "--hash-assets",
+        action="store_true",
+        help="Name external image files by a hash of their content (implies --external-assets)",
+    )
+    _ = parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="PATH",
+        help="Write timings of all stages as Chrome trace (JSON) to PATH, e.g. for viewing in Perfetto",
+    )
+    _ = parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="Keep running and update the report when files are added or modified",
+    )
+    _ = parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=2.0,
+        help="Seconds between checks for changed files in watch mode (default: %(default)s)",
+    )
     _ = parser.add_argument(
         "-v",
         "--verbose",
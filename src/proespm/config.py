@@ -1,27 +1,14 @@
+import dataclasses
+import hashlib
 from dataclasses import dataclass
+from pathlib import Path
 
 # Static configurations
 DEFAULT_COLORMAP = "inferno"
-ALLOWED_FILE_TYPES = (
-    ".mul",
-    ".z_mtrx",
-    ".sm4",
-    ".sxm",
-    ".nid",
-    ".flm",
-    ".vms",
-    ".txt",
-    ".log",
-    ".dat",
-    ".csv",
-    ".png",
-    ".jpg",
-    ".jpeg",
-    ".lvm",
-    ".pssession",
-    ".h5",
-    ".json",
-)
+DEFAULT_CACHE_SIZE = 2 * 1024**3  # in bytes
+
+# Config fields that do not influence the processing result
+_IGNORED_FIELDS = ("jobs", "lean")
 
 
 @dataclass
@@ -30,3 +17,49 @@ class Config:
 
     colormap: str
     colorrange: tuple[float, float]
+    colorrange_mode: str = "exact"
+    """Computation of the color range of SPM images, `"exact"` or
+    `"approx"` for an estimate from a sample of the pixels."""
+    colorrange_tolerance: float = 0.05
+    """Maximum error of the color range in percentile units in the mode
+    `"approx"`."""
+    float32: bool = False
+    """Process SPM image data in single instead of double precision, which
+    halves its memory usage."""
+    renderer: str = "matplotlib"
+    """Rendering of SPM images, `"matplotlib"` or `"fast"` for the
+    matplotlib-free renderer in `proespm.spm.render`."""
+    mp4_fps: int = 10
+    """Frame rate of the movies created from .flm files."""
+    mp4_downscale: int = 1
+    """Factor by which the frames of the movies created from .flm files are
+    downscaled."""
+    fastspm_preview_frames: int = 8
+    """Number of frames in the preview of fast scan .h5 files, read from the
+    raw data, 0 to show only the screenshot."""
+    fastspm_image_max_size: int = 0
+    """Maximum width and height of the screenshots of FastSPM files, larger
+    ones are scaled down, 0 to embed them unchanged."""
+    jobs: int = 1
+    """Number of worker processes used for processing, 1 processes in the
+    calling process."""
+    lean: bool = False
+    """Release the raw data of each measurement as soon as it is processed,
+    so that only the data of few files is held in memory at a time."""
+    assets_dir: Path | None = None
+    """Directory next to the report where images are written to, None to
+    embed images into the report as data URIs."""
+    hash_assets: bool = False
+    """Name image files in `assets_dir` after a hash of their content, so
+    identical images are stored only once."""
+
+
+def config_digest(config: Config) -> str:
+    """Hash of the fields of `config` that influence the processing result."""
+    key = hashlib.sha256()
+    for field in dataclasses.fields(config):
+        if field.name not in _IGNORED_FIELDS:
+            value = getattr(config, field.name)
+            key.update(f"{field.name}={value!r}".encode())
+
+    return key.hexdigest()
@@ -27,6 +27,8 @@ class EisPalmSens(Measurement):
     """
 
     measurement_family = "Electro chemistry (PalmSens)"
+    render_attrs = ("script", "div")
+    data_attrs = ("data",)
 
     controller = "PalmSens"
     op_mode = "Impedence Spectroscopy"
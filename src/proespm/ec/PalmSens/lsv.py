@@ -25,6 +25,8 @@ class LsvPalmSens(Measurement):
     """
 
     measurement_family = "Electro chemistry (PalmSens)"
+    render_attrs = ("script", "div")
+    data_attrs = ("data",)
 
     controller = "PalmSens"
     op_mode = "Linear Sweep Voltammetry"
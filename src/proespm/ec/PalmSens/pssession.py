@@ -27,6 +27,8 @@ class PalmSensSession(Measurement):
     controller = "PalmSens"
 
     measurement_family = "Electro chemistry (PalmSens)"
+    render_attrs = ("script", "div")
+    data_attrs = ("parsed", "data")
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo: Fileinfo = Fileinfo(filepath)
@@ -19,6 +19,8 @@ class CvLabview(Measurement):
     """Class handeling the CV files from self-written LabView software"""
 
     measurement_family = "Electro chemistry"
+    render_attrs = ("script", "div")
+    data_attrs = ("data", "cycles")
 
     controller = "LabView"
     op_mode = "Cyclic Voltammetry"
@@ -184,6 +186,8 @@ class CaLabview(Measurement):
     """Class handling the CA files from self-written LabView software"""
 
     measurement_family = "Electro chemistry"
+    render_attrs = ("script", "div")
+    data_attrs = ("data",)
 
     controller = "LabView"
     op_mode = "Chronoamperometry"
@@ -318,6 +322,8 @@ class FftLabview(Measurement):
     """Class handeling the FFT files from self-written LabView software"""
 
     measurement_family = "Electro chemistry"
+    render_attrs = ("script", "div")
+    data_attrs = ("data",)
 
     controller = "LabView"
     op_mode = "FFT"
@@ -331,8 +337,8 @@ class FftLabview(Measurement):
         self.type: str | None = None
         self.data = self.read_fft_data(filepath)
 
-        self.script = str | None
-        self.div = str | None
+        self.script: str | None = None
+        self.div: str | None = None
 
     def read_fft_data(self, filepath: Path) -> NDArray[np.float64]:
         """Read the numeric data as numpy array"""
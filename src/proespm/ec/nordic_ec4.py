@@ -30,6 +30,8 @@ class NordicEc4(Measurement):
     """Class for handling Nordic Electrochemistry EC4 files (.txt)"""
 
     measurement_family = "Electro chemistry"
+    render_attrs = ("script", "div")
+    data_attrs = ("data",)
 
     controller = "Nordic EC4"
 
@@ -46,6 +48,7 @@ class NordicEc4(Measurement):
         self.op_mode: str | None = None
 
         self.data: list[NDArray[np.float64]] = [self.read_cv_data(filepath)]
+        self.pushed_files: list[Path] = []
         self.script: str | None = None
         self.div: str | None = None
 
@@ -55,6 +58,7 @@ class NordicEc4(Measurement):
     def push_cv_data(self, other: NordicEc4) -> None:
         for arr in other.data:
             self.data.append(arr)
+        self.pushed_files += other.source_files()
 
     def read_params(self) -> None:
         with open(self.fileinfo.filepath) as f:
@@ -166,3 +170,7 @@ class NordicEc4(Measurement):
     @override
     def template_name(self) -> str:
         return "ec.j2"
+
+    @override
+    def source_files(self) -> list[Path]:
+        return [self.fileinfo.filepath, *self.pushed_files]
@@ -1,13 +1,15 @@
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Self, final, override
-
-import h5py
+from typing import Any, Self, final, override
 
 from proespm.config import Config
+from proespm.fastspm.catalog import file_attributes
 from proespm.fastspm.fastspm import (
+    aux_signal,
+    find_corresponding_image,
     read_corresponding_image,
     read_corresponding_par_file,
+    set_attributes,
 )
 from proespm.fileinfo import Fileinfo
 from proespm.measurement import Measurement
@@ -22,8 +24,44 @@ class AtomTracking(Measurement):
     """
 
     measurement_family = "FastSPM"
+    render_attrs = ("img_uri",)
 
     op_mode = "AT"
+    attribute_names = (
+        "Scanner.X1_Gain",
+        "Scanner.X2_Gain",
+        "Scanner.Y1_Gain",
+        "Scanner.Y2_Gain",
+        "Signal_In.ConversionFactor",
+        "Signal_In.LogAmp",
+        "Signal_In.Offset",
+        "Signal_In.Offset.Unit",
+        "Signal_In.Unit",
+        "Z_In.ConversionFactor",
+        "Z_In.Offset",
+        "Z_In.Offset.Unit",
+        "Z_In.Unit",
+        "ExperimentInfo.TemperatureStart",
+        "ExperimentInfo.TemperatureEnd",
+        "ExperimentInfo.Temperature.Unit",
+        "Circular_movement.X_Amplitude",
+        "Circular_movement.X_Amplitude.Unit",
+        "Circular_movement.Y_Amplitude",
+        "Circular_movement.Y_Amplitude.Unit",
+        "Circular_movement.Rotation_Phase",
+        "LockIn.Phase",
+        "LockIn.TimeConstant",
+        "LockIn.TimeConstant.Unit",
+        "PI.Kp",
+        "PI.Kp.Unit",
+        "PI.Ti",
+        "PI.Ti.Unit",
+        "PI.ControlTimeStep",
+        "PI.ControlTimeStep.Unit",
+        "PI.Hardware",
+        "PI.CircleByCircle",
+        "PI.CircleByCircle.Number",
+    )
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
@@ -31,104 +69,20 @@ class AtomTracking(Measurement):
         self.img_uri: str | None = None
         self.slide_num: int | None = None
 
-        with h5py.File(filepath, mode="r") as f:
-            self.attributes = dict(f["data"].attrs)
-
-        self.aux_1 = (
-            float(self.attributes.get("Aux1.Value", "0"))
-            * float(self.attributes.get("Aux1.ConversionFactor", "0"))
-            * (2 * float(self.attributes.get("Aux1.InvertSignalIn", "0")) - 1)
-        )
-        self.aux_1_unit = self.attributes.get("Aux1.Unit", "")
-        self.aux_1_label = self.attributes.get("Aux1.Label", "")
-
-        self.aux_2 = (
-            float(self.attributes.get("Aux2.Value", "0"))
-            * float(self.attributes.get("Aux2.ConversionFactor", "0"))
-            * (2 * float(self.attributes.get("Aux2.InvertSignalIn", "0")) - 1)
-        )
-        self.aux_2_unit = self.attributes.get("Aux2.Unit", "")
-        self.aux_2_label = self.attributes.get("Aux2.Label", "")
+        self.attributes = file_attributes(filepath, "data")
 
-        self.scangain_x1 = self.attributes.get("Scanner.X1_Gain", "")
-        self.scangain_x2 = self.attributes.get("Scanner.X2_Gain", "")
-        self.scangain_y1 = self.attributes.get("Scanner.Y1_Gain", "")
-        self.scangain_y2 = self.attributes.get("Scanner.Y2_Gain", "")
-
-        self.sig_in_convfact = float(
-            self.attributes.get("Signal_In.ConversionFactor", "nan")
-        )
-        self.sig_in_logamp = self.attributes.get("Signal_In.LogAmp", "")
-        self.sig_in_offset = float(
-            self.attributes.get("Signal_In.Offset", "nan")
-        )
-        self._sig_in_offset_unit = self.attributes.get(
-            "Signal_In.Offset.Unit", ""
-        )
-        self.sig_in_unit = self.attributes.get("Signal_In.Unit", "")
-
-        self.z_in_convfact = float(
-            self.attributes.get("Z_In.ConversionFactor", "nan")
-        )
-        self.z_in_offset = float(self.attributes.get("Z_In.Offset", "nan"))
-        self.z_in_offset_unit = self.attributes.get("Z_In.Offset.Unit", "")
-        self.z_in_unit = self.attributes.get("Z_In.Unit", "")
-
-        self.temp_start = self.attributes.get(
-            "ExperimentInfo.TemperatureStart", "nan"
-        )
-        self.temp_end = self.attributes.get(
-            "ExperimentInfo.TemperatureEnd", "nan"
-        )
-        self.temp_unit = self.attributes.get(
-            "ExperimentInfo.Temperature.Unit", "nan"
-        )
-
-        self.x_amplitude = self.attributes.get(
-            "Circular_movement.X_Amplitude", ""
-        )
-        self.x_amplitude_unit = self.attributes.get(
-            "Circular_movement.X_Amplitude.Unit", ""
+        self.aux_1, self.aux_1_unit, self.aux_1_label = aux_signal(
+            self.attributes, "Aux1"
         )
 
-        self.y_amplitude = self.attributes.get(
-            "Circular_movement.Y_Amplitude", ""
-        )
-        self.y_amplitude_unit = self.attributes.get(
-            "Circular_movement.Y_Amplitude.Unit", ""
+        self.aux_2, self.aux_2_unit, self.aux_2_label = aux_signal(
+            self.attributes, "Aux2"
         )
 
-        self.rotation_phase = self.attributes.get(
-            "Circular_movement.Rotation_Phase", ""
-        )
+        set_attributes(self, self.attributes, self.attribute_names)
         self.rotation_phase_unit = "°"
-
-        self.lockin_phase = self.attributes.get("LockIn.Phase", "")
         self.lockin_phase_unit = "°"
 
-        self.lockin_timeconstant = self.attributes.get(
-            "LockIn.TimeConstant", ""
-        )
-        self.lockin_timeconstant_unit = self.attributes.get(
-            "LockIn.TimeConstant.Unit", ""
-        )
-
-        self.k_p = self.attributes.get("PI.Kp", "")
-        self.k_p_unit = self.attributes.get("PI.Kp.Unit", "")
-
-        self.ti = self.attributes.get("PI.Ti", "")
-        self.ti_unit = self.attributes.get("PI.Ti.Unit", "")
-
-        self.control_timestep = self.attributes.get("PI.ControlTimeStep", "")
-        self.control_timestep_unit = self.attributes.get(
-            "PI.ControlTimeStep.Unit", ""
-        )
-
-        self.hardware = self.attributes.get("PI.Hardware", "")
-
-        self.circle_by_circle = self.attributes.get("PI.CircleByCircle", "")
-        self.num_circles = self.attributes.get("PI.CircleByCircle.Number", "")
-
         self.par = read_corresponding_par_file(filepath)
 
     @override
@@ -148,9 +102,22 @@ class AtomTracking(Measurement):
 
     @override
     def process(self, config: Config) -> Self:
-        self.img_uri = read_corresponding_image(self.fileinfo.filepath, False)
+        self.img_uri = read_corresponding_image(
+            self.fileinfo.filepath, False, config
+        )
         return self
 
     @override
     def template_name(self) -> str:
         return "fastspm.j2"
+
+    @override
+    def slides(self) -> list[Any]:
+        return [self]
+
+    @override
+    def source_files(self) -> list[Path]:
+        return [
+            self.fileinfo.filepath,
+            find_corresponding_image(self.fileinfo.filepath),
+        ]
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any, final
+
+import h5py
+import numpy as np
+
+from proespm.assets import write_atomic
+
+# Subdirectory of the cache directory with the catalogs
+CATALOG_DIR = "fastspm"
+# Incremented when the format of the entries changes
+CATALOG_VERSION = 1
+# Key of the attributes of the root group
+ROOT_GROUP = "/"
+
+# Directory of the catalogs that `file_attributes` reads, see `use_catalogs`
+_catalog_dir: Path | None = None
+_catalogs: dict[tuple[Path, Path], "MetadataCatalog"] = {}
+_catalogs_lock = threading.Lock()
+
+
+@final
+class MetadataCatalog:
+    """Index of the attributes of the FastSPM .h5 files in a directory,
+    stored in a JSON file in `catalog_dir` named by a hash of the path of
+    the directory.
+
+    Entries are keyed by filename and only valid as long as the size and
+    modification time of the file are unchanged.
+
+    Args:
+        directory: Directory of the .h5 files.
+        catalog_dir: Directory where the catalog is stored.
+    """
+
+    def __init__(self, directory: Path, catalog_dir: Path) -> None:
+        self.directory = directory.resolve()
+        digest = hashlib.sha256(str(self.directory).encode()).hexdigest()
+        self.path = catalog_dir / f"{digest[:32]}.json"
+        self._entries = self._load()
+        self._changed = False
+
+    def get(self, filepath: Path) -> dict[str, dict[str, Any]] | None:
+        """Attributes of the root group and datasets of `filepath` by their
+        name, None if the file is not in the catalog or changed since."""
+        entry = self._entries.get(filepath.name)
+        if entry is None or entry["stat"] != _stat_key(filepath):
+            return None
+        return entry["groups"]
+
+    def update(self, filepath: Path) -> dict[str, dict[str, Any]]:
+        """Read the attributes of `filepath` into the catalog, unless its
+        entry is up to date."""
+        groups = self.get(filepath)
+        if groups is None:
+            stat = _stat_key(filepath)
+            groups = read_h5_attributes(filepath)
+            self._entries[filepath.name] = {"stat": stat, "groups": groups}
+            self._changed = True
+        return groups
+
+    def prune(self, filenames: Iterable[str]) -> None:
+        """Remove the entries of all files except `filenames`, e.g. of files
+        that were deleted since."""
+        removed = self._entries.keys() - set(filenames)
+        for filename in removed:
+            del self._entries[filename]
+        if removed:
+            self._changed = True
+
+    def save(self) -> None:
+        """Write the catalog, if entries were changed since it was loaded.
+
+        If the catalog cannot be written, the attributes are read from the
+        .h5 files again on the next run."""
+        if not self._changed:
+            return
+
+        content = {
+            "version": CATALOG_VERSION,
+            "directory": str(self.directory),
+            "entries": self._entries,
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_atomic(self.path, json.dumps(content).encode("utf-8"))
+        except OSError:
+            return
+        self._changed = False
+
+    def _load(self) -> dict[str, Any]:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+        if content.get("version") != CATALOG_VERSION:
+            return {}
+        return content["entries"]
+
+
+def use_catalogs(cache_dir: Path | None) -> None:
+    """Let `file_attributes` read from the catalogs in `cache_dir`, None to
+    read all attributes from the .h5 files."""
+    global _catalog_dir
+    _catalog_dir = cache_dir / CATALOG_DIR if cache_dir is not None else None
+
+
+def build_catalogs(paths: Iterable[Path], cache_dir: Path) -> None:
+    """Index the attributes of all .h5 files among `paths`, one catalog per
+    directory in `cache_dir`, so that `file_attributes` finds them without
+    opening the files.
+
+    `paths` are all files of the scanned directories, entries of other
+    files are removed. The files are read one after another, since h5py
+    serializes all access to HDF5 files anyway.
+    """
+    use_catalogs(cache_dir)
+    catalog_dir = cache_dir / CATALOG_DIR
+
+    by_directory: dict[Path, list[Path]] = {}
+    for path in paths:
+        if path.suffix.lower() == ".h5":
+            by_directory.setdefault(path.parent, []).append(path)
+
+    for directory, h5_paths in by_directory.items():
+        catalog = _catalog(directory, catalog_dir)
+        catalog.prune(path.name for path in h5_paths)
+        for path in h5_paths:
+            try:
+                _ = catalog.update(path)
+            except OSError:
+                continue  # Reported when the file itself is read
+        catalog.save()
+
+
+def file_attributes(filepath: Path, group: str = ROOT_GROUP) -> dict[str, Any]:
+    """Attributes of the root group or a dataset of a FastSPM .h5 file.
+
+    They are taken from the catalog of the directory if it is up to date and
+    read from the file otherwise. Either way, the values are plain Python
+    objects, with arrays as lists.
+
+    Args:
+        filepath: Path to the .h5 file.
+        group: Name of the dataset or `ROOT_GROUP`.
+
+    Returns:
+        Attribute values by name.
+    """
+    groups = None
+    if _catalog_dir is not None:
+        groups = _catalog(filepath.parent, _catalog_dir).get(filepath)
+    if groups is None:
+        groups = read_h5_attributes(filepath)
+    return groups[group]
+
+
+def read_h5_attributes(filepath: Path) -> dict[str, dict[str, Any]]:
+    """Attributes of the root group and of all datasets at the top level of
+    `filepath`, by name of the group or dataset."""
+    with h5py.File(filepath, mode="r") as f:
+        groups = {ROOT_GROUP: _decode(f.attrs)}
+        for name, obj in f.items():
+            if isinstance(obj, h5py.Dataset):
+                groups[name] = _decode(obj.attrs)
+    return groups
+
+
+def _catalog(directory: Path, catalog_dir: Path) -> MetadataCatalog:
+    """Catalog of `directory` in `catalog_dir`, loaded once per process."""
+    key = (catalog_dir, directory)
+    with _catalogs_lock:
+        if key not in _catalogs:
+            _catalogs[key] = MetadataCatalog(directory, catalog_dir)
+        return _catalogs[key]
+
+
+def _stat_key(filepath: Path) -> list[int]:
+    stat = filepath.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _decode(attrs: h5py.AttributeManager) -> dict[str, Any]:
+    """Attribute values as objects that can be stored as JSON."""
+    return {key: _to_python(value) for key, value in attrs.items()}
+
+
+def _to_python(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return [_to_python(item) for item in value.tolist()]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value
@@ -1,13 +1,15 @@
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Self, final, override
-
-import h5py
+from typing import Any, Self, final, override
 
 from proespm.config import Config
+from proespm.fastspm.catalog import file_attributes
 from proespm.fastspm.fastspm import (
+    aux_signal,
+    find_corresponding_image,
     read_corresponding_image,
     read_corresponding_par_file,
+    set_attributes,
 )
 from proespm.fileinfo import Fileinfo
 from proespm.measurement import Measurement
@@ -22,8 +24,13 @@ class ErrorTopography(Measurement):
     """
 
     measurement_family = "FastSPM"
+    render_attrs = ("img_uri",)
 
     op_mode = "ET"
+    attribute_names = (
+        "PI.ControlTimeStep",
+        "PI.ControlTimeStep.Unit",
+    )
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
@@ -31,29 +38,17 @@ class ErrorTopography(Measurement):
         self.img_uri: str | None = None
         self.slide_num: int | None = None
 
-        with h5py.File(filepath, "r") as f:
-            self.attributes = dict(f.attrs)
+        self.attributes = file_attributes(filepath)
 
-        self.aux_1 = (
-            float(self.attributes.get("Aux1.Value", "0"))
-            * float(self.attributes.get("Aux1.ConversionFactor", "0"))
-            * (2 * float(self.attributes.get("Aux1.InvertSignalIn", "0")) - 1)
+        self.aux_1, self.aux_1_unit, self.aux_1_label = aux_signal(
+            self.attributes, "Aux1"
         )
-        self.aux_1_unit = self.attributes.get("Aux1.Unit", "")
-        self.aux_1_label = self.attributes.get("Aux1.Label", "")
 
-        self.aux_2 = (
-            float(self.attributes.get("Aux2.Value", "0"))
-            * float(self.attributes.get("Aux2.ConversionFactor", "0"))
-            * (2 * float(self.attributes.get("Aux2.InvertSignalIn", "0")) - 1)
+        self.aux_2, self.aux_2_unit, self.aux_2_label = aux_signal(
+            self.attributes, "Aux2"
         )
-        self.aux_2_unit = self.attributes.get("Aux2.Unit", "")
-        self.aux_2_label = self.attributes.get("Aux2.Label", "")
 
-        self.time_per_pixel = self.attributes.get("PI.ControlTimeStep", "")
-        self.time_per_pixel_unit = self.attributes.get(
-            "PI.ControlTimeStep.Unit", ""
-        )
+        set_attributes(self, self.attributes, self.attribute_names)
 
         self.par = read_corresponding_par_file(filepath)
 
@@ -74,9 +69,22 @@ class ErrorTopography(Measurement):
 
     @override
     def process(self, config: Config) -> Self:
-        self.img_uri = read_corresponding_image(self.fileinfo.filepath, True)
+        self.img_uri = read_corresponding_image(
+            self.fileinfo.filepath, True, config
+        )
         return self
 
     @override
     def template_name(self) -> str:
         return "fastspm.j2"
+
+    @override
+    def slides(self) -> list[Any]:
+        return [self]
+
+    @override
+    def source_files(self) -> list[Path]:
+        return [
+            self.fileinfo.filepath,
+            find_corresponding_image(self.fileinfo.filepath),
+        ]
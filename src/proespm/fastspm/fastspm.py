@@ -1,34 +1,212 @@
-from pathlib import Path
-from PIL import Image
-import base64
 import io
+import math
+import struct
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+import h5py
+import numpy as np
+from numpy.typing import NDArray
+from PIL import ExifTags, Image
+
+from proespm.assets import asset_name, image_uri
+from proespm.config import Config
+from proespm.spm.colorrange import color_range
+from proespm.spm.render import colormap_lut
 
 FASTSPM_SCREENSHOT_EXTENSIONS = ("jpg", "jpeg")
+# EXIF orientation of an image that is displayed rotated by 90° ccw
+EXIF_ROTATE_90 = 8
+# Samples of the `data` dataset read at a time
+FRAME_BLOCK_SAMPLES = 2**22
+# White pixels between the frames of a frame strip
+FRAME_STRIP_GAP = 2
+
+
+def _unconverted(value: Any) -> Any:
+    return value
 
 
-def read_corresponding_image(filepath: Path, rotate: bool) -> str:
+# Attributes of FastSPM .h5 files by name, with the field of the measurement
+# they are stored in, their conversion and their default value
+ATTRIBUTES: dict[str, tuple[str, Callable[[Any], Any], Any]] = {
+    "Acquisition.ADC_SamplingRate": ("px_frequency", float, "nan"),
+    "Acquisition.ADC_SamplingRate.Units": (
+        "px_frequency_unit", _unconverted, ""
+    ),
+    "Acquisition.NumFrames": ("numframes", _unconverted, ""),
+    "Acquisition.X_Phase": ("x_phase", _unconverted, ""),
+    "Acquisition.X_Phase.Unit": ("x_phase_unit", _unconverted, ""),
+    "Acquisition.Y_Phase": ("y_phase", _unconverted, ""),
+    "Acquisition.Y_Phase.Unit": ("y_phase_unit", _unconverted, ""),
+    "Circular_movement.Rotation_Phase": ("rotation_phase", float, "nan"),
+    "Circular_movement.X_Amplitude": ("x_amplitude", float, "nan"),
+    "Circular_movement.X_Amplitude.Unit": (
+        "x_amplitude_unit", _unconverted, ""
+    ),
+    "Circular_movement.Y_Amplitude": ("y_amplitude", float, "nan"),
+    "Circular_movement.Y_Amplitude.Unit": (
+        "y_amplitude_unit", _unconverted, ""
+    ),
+    "ExperimentInfo.Temperature.Unit": ("temp_unit", _unconverted, "nan"),
+    "ExperimentInfo.TemperatureEnd": ("temp_end", float, "nan"),
+    "ExperimentInfo.TemperatureStart": ("temp_start", float, "nan"),
+    "LockIn.Phase": ("lockin_phase", float, "nan"),
+    "LockIn.TimeConstant": ("lockin_timeconstant", float, "nan"),
+    "LockIn.TimeConstant.Unit": (
+        "lockin_timeconstant_unit", _unconverted, ""
+    ),
+    "PI.CircleByCircle": ("circle_by_circle", _unconverted, ""),
+    "PI.CircleByCircle.Number": ("num_circles", _unconverted, ""),
+    "PI.ControlTimeStep": ("control_timestep", float, "nan"),
+    "PI.ControlTimeStep.Unit": ("control_timestep_unit", _unconverted, ""),
+    "PI.Hardware": ("hardware", _unconverted, ""),
+    "PI.Kp": ("k_p", float, "nan"),
+    "PI.Kp.Unit": ("k_p_unit", _unconverted, ""),
+    "PI.Ti": ("ti", float, "nan"),
+    "PI.Ti.Unit": ("ti_unit", _unconverted, ""),
+    "Scanner.Angle": ("angle", _unconverted, ""),
+    "Scanner.X1_Gain": ("scangain_x1", _unconverted, ""),
+    "Scanner.X2_Gain": ("scangain_x2", _unconverted, ""),
+    "Scanner.X_Amplitude": ("scan_volt_x", float, "nan"),
+    "Scanner.X_Amplitude.Unit": ("scan_volt_x_unit", _unconverted, ""),
+    "Scanner.X_Calibration": ("scan_calib_x", float, "nan"),
+    "Scanner.X_Calibration.Unit": ("scan_calib_x_unit", _unconverted, ""),
+    "Scanner.X_Frequency": ("x_frequency", float, "nan"),
+    "Scanner.X_Frequency.Unit": ("x_frequency_unit", _unconverted, ""),
+    "Scanner.X_Points": ("scan_pnts_x", float, "nan"),
+    "Scanner.Y1_Gain": ("scangain_y1", _unconverted, ""),
+    # Spelling mistake in .h5 files of fast scans
+    "Scanner.Y1_Gain ": ("scangain_y1", _unconverted, ""),
+    "Scanner.Y2_Gain": ("scangain_y2", _unconverted, ""),
+    "Scanner.Y_Amplitude": ("scan_volt_y", float, "nan"),
+    "Scanner.Y_Amplitude.Unit": ("scan_volt_y_unit", _unconverted, ""),
+    "Scanner.Y_Calibration": ("scan_calib_y", float, "nan"),
+    "Scanner.Y_Calibration.Unit": ("scan_calib_y_unit", _unconverted, ""),
+    "Scanner.Y_Frequency": ("y_frequency", float, "nan"),
+    "Scanner.Y_Frequency.Unit": ("frames_s_unit", _unconverted, ""),
+    "Scanner.Y_Points": ("scan_pnts_y", float, "nan"),
+    "Signal_In.ConversionFactor": ("sig_in_convfact", float, "nan"),
+    "Signal_In.InputRange": ("sig_in_range", float, "nan"),
+    "Signal_In.LogAmp": ("sig_in_logamp", _unconverted, ""),
+    "Signal_In.Offset": ("sig_in_offset", float, "nan"),
+    "Signal_In.Offset.Unit": ("_sig_in_offset_unit", _unconverted, ""),
+    "Signal_In.Unit": ("sig_in_unit", _unconverted, ""),
+    "Z_In.ConversionFactor": ("z_in_convfact", float, "nan"),
+    "Z_In.InputRange": ("z_in_range", float, "nan"),
+    "Z_In.Offset": ("z_in_offset", float, "nan"),
+    "Z_In.Offset.Unit": ("z_in_offset_unit", _unconverted, ""),
+    "Z_In.Unit": ("z_in_unit", _unconverted, ""),
+}
+
+
+def find_corresponding_image(filepath: Path) -> Path:
     base_path = filepath.with_suffix("")
 
     for ext in FASTSPM_SCREENSHOT_EXTENSIONS:
         path = base_path.with_suffix(f".{ext}")
         if path.exists():
-            image_path = path
-            image_extension = ext
+            return path
+
+    raise FileNotFoundError(
+        f"No JPEG image found next to the .h5 file '{filepath}'"
+    )
+
+
+def read_corresponding_image(
+    filepath: Path, rotate: bool, config: Config
+) -> str:
+    """URI of the JPEG screenshot next to a FastSPM file.
+
+    The JPEG is embedded as it is. A rotation is stored as EXIF orientation,
+    which browsers apply when displaying the image. Only images larger than
+    `config.fastspm_image_max_size` are decoded, to be scaled down.
+
+    Args:
+        filepath: Path to the FastSPM file.
+        rotate: Rotate the image by 90° counterclockwise.
+        config: Runtime configuration.
+
+    Returns:
+        URI of the image.
+    """
+    data = find_corresponding_image(filepath).read_bytes()
+
+    max_size = config.fastspm_image_max_size
+    if max_size > 0:
+        with Image.open(io.BytesIO(data)) as img:
+            if max(img.size) > max_size:
+                img = img.rotate(90, expand=True) if rotate else img
+                img.thumbnail((max_size, max_size))
+                data, rotate = _encode_jpeg(img), False
+
+    if rotate:
+        data = _with_exif_orientation(data, EXIF_ROTATE_90)
+
+    return image_uri(data, "jpeg", asset_name(filepath), config)
+
+
+def _encode_jpeg(img: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _with_exif_orientation(jpeg: bytes, orientation: int) -> bytes:
+    """`jpeg` with `orientation` set in its EXIF data, without decoding the
+    image. The EXIF segment is replaced or inserted after the JFIF segment.
+    """
+    with Image.open(io.BytesIO(jpeg)) as img:
+        exif = img.getexif()
+    # Sub-IFDs are only written if they were loaded
+    for ifd in (ExifTags.IFD.Exif, ExifTags.IFD.GPSInfo):
+        if ifd in exif:
+            _ = exif.get_ifd(ifd)
+    exif[ExifTags.Base.Orientation] = orientation
+    exif_bytes = exif.tobytes()
+    segment = b"\xff\xe1" + struct.pack(">H", len(exif_bytes) + 2) + exif_bytes
+
+    # Application segments follow the start of image marker
+    start = end = pos = 2
+    while len(jpeg) > pos + 3 and jpeg[pos] == 0xFF:
+        marker = jpeg[pos + 1]
+        if not 0xE0 <= marker <= 0xEF:
             break
-    else:
-        raise FileNotFoundError(
-            f"No JPEG image found next to the .h5 file '{filepath}'"
-        )
+        segment_end = pos + 2 + int.from_bytes(jpeg[pos + 2 : pos + 4], "big")
+        if marker == 0xE1 and jpeg[pos + 4 : pos + 10] == b"Exif\0\0":
+            start, end = pos, segment_end
+            break
+        if marker == 0xE0:
+            start = end = segment_end
+        pos = segment_end
+
+    return jpeg[:start] + segment + jpeg[end:]
 
-    with Image.open(image_path) as img:
-        if rotate:
-            img = img.rotate(90, expand=True)
 
-        buffer = io.BytesIO()
-        img.save(buffer, format="JPEG")
-        encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+def set_attributes(
+    measurement: Any, attributes: dict[str, Any], names: Iterable[str]
+) -> None:
+    """Set the fields of `measurement` from the attributes `names` of a
+    FastSPM .h5 file, as declared in `ATTRIBUTES`."""
+    for name in names:
+        field, convert, default = ATTRIBUTES[name]
+        setattr(measurement, field, convert(attributes.get(name, default)))
 
-        return f"data:image/{image_extension};base64,{encoded}"
+
+def aux_signal(attributes: dict[str, Any], name: str) -> tuple[float, str, str]:
+    """Value, unit and label of the auxiliary signal `name`, `"Aux1"` or
+    `"Aux2"`, from the attributes of a FastSPM .h5 file."""
+    value = (
+        float(attributes.get(f"{name}.Value", "0"))
+        * float(attributes.get(f"{name}.ConversionFactor", "0"))
+        * (2 * float(attributes.get(f"{name}.InvertSignalIn", "0")) - 1)
+    )
+    return (
+        value,
+        attributes.get(f"{name}.Unit", ""),
+        attributes.get(f"{name}.Label", ""),
+    )
 
 
 def read_corresponding_par_file(filepath: Path) -> dict[str, str] | None:
@@ -54,3 +232,102 @@ def read_corresponding_par_file(filepath: Path) -> dict[str, str] | None:
                 output[pair[0]] = pair[1] + unit
 
         return output
+
+
+def iter_frames(
+    dataset: h5py.Dataset, x_points: int, y_points: int, step: int = 1
+) -> Iterator[NDArray[np.float32]]:
+    """Frames reconstructed from the time series of a fast scan.
+
+    Each frame consists of `y_points` lines of `2 * x_points` samples, the
+    forward and backward half of the sinusoidal fast scan. The forward half
+    is used without correcting the sinusoidal distortion. Frames alternate
+    between upward and downward scans, downward frames are flipped so all
+    frames have the same orientation.
+
+    The dataset is read in blocks of whole frames of about
+    `FRAME_BLOCK_SAMPLES` samples, or frame by frame if frames are skipped,
+    so memory usage does not depend on the number of frames.
+
+    Args:
+        dataset: One-dimensional `data` dataset of the .h5 file.
+        x_points: Number of pixels per line.
+        y_points: Number of lines per frame.
+        step: Only every `step`-th frame is read.
+
+    Returns:
+        Iterator over the frames of shape `(y_points, x_points)`.
+    """
+    line_samples = 2 * x_points
+    frame_samples = line_samples * y_points
+    num_frames = dataset.shape[0] // frame_samples
+    block_frames = (
+        max(FRAME_BLOCK_SAMPLES // frame_samples, 1) if step == 1 else 1
+    )
+
+    for first in range(0, num_frames, step * block_frames):
+        last = min(first + block_frames, num_frames)
+        block = dataset[first * frame_samples : last * frame_samples]
+        lines = block.reshape(last - first, y_points, line_samples)
+        for frame_num, frame in enumerate(lines[:, :, :x_points], first):
+            frame = frame[::-1] if frame_num % 2 else frame
+            yield frame.astype(np.float32)
+
+
+def read_frame_strip(
+    filepath: Path, num_frames: int, config: Config
+) -> str | None:
+    """Preview of the frames of a fast scan .h5 file, `num_frames` evenly
+    spaced frames side by side.
+
+    Only the previewed frames are read from the file. Each frame gets its own
+    color range.
+
+    Args:
+        filepath: Path to the .h5 file.
+        num_frames: Maximum number of frames in the preview.
+        config: Runtime configuration.
+
+    Returns:
+        URI of the PNG image or None if the file contains no complete frame.
+    """
+    with h5py.File(filepath, mode="r") as f:
+        dataset = f.get("data")
+        if not isinstance(dataset, h5py.Dataset) or dataset.ndim != 1:
+            return None
+
+        x_points = int(float(dataset.attrs.get("Scanner.X_Points", "0")))
+        y_points = int(float(dataset.attrs.get("Scanner.Y_Points", "0")))
+        if x_points < 1 or y_points < 1:
+            return None
+
+        total_frames = dataset.shape[0] // (2 * x_points * y_points)
+        if total_frames < 1 or num_frames < 1:
+            return None
+
+        lut = colormap_lut(config.colormap)
+        strip = np.full(
+            (y_points, (x_points + FRAME_STRIP_GAP) * num_frames, 3),
+            255,
+            dtype=np.uint8,
+        )
+        step = math.ceil(total_frames / num_frames)
+        left = 0
+        for frame in iter_frames(dataset, x_points, y_points, step):
+            vmin, vmax = color_range(
+                frame,
+                config.colorrange,
+                config.colorrange_mode,
+                config.colorrange_tolerance,
+            )
+            scale = 255 / (vmax - vmin) if vmax > vmin else 0.0
+            indices = np.clip((frame - vmin) * scale, 0, 255).astype(np.uint8)
+            strip[:, left : left + x_points] = lut[indices]
+            left += x_points + FRAME_STRIP_GAP
+
+    buffer = io.BytesIO()
+    Image.fromarray(strip[:, : left - FRAME_STRIP_GAP], "RGB").save(
+        buffer, format="PNG"
+    )
+    name = asset_name(filepath, "_frames")
+    return image_uri(buffer.getvalue(), "png", name, config)
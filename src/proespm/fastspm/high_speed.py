@@ -1,13 +1,15 @@
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Self, final, override
-
-import h5py
+from typing import Any, Self, final, override
 
 from proespm.config import Config
+from proespm.fastspm.catalog import file_attributes
 from proespm.fastspm.fastspm import (
+    aux_signal,
+    find_corresponding_image,
     read_corresponding_image,
     read_corresponding_par_file,
+    set_attributes,
 )
 from proespm.fileinfo import Fileinfo
 from proespm.measurement import Measurement
@@ -22,8 +24,25 @@ class HighSpeed(Measurement):
     """
 
     measurement_family = "FastSPM"
+    render_attrs = ("img_uri",)
 
     op_mode = "HS"
+    attribute_names = (
+        "Signal_In.ConversionFactor",
+        "Signal_In.LogAmp",
+        "Signal_In.Offset",
+        "Signal_In.Offset.Unit",
+        "Signal_In.Unit",
+        "Z_In.ConversionFactor",
+        "Z_In.Offset",
+        "Z_In.Offset.Unit",
+        "Z_In.Unit",
+        "ExperimentInfo.TemperatureStart",
+        "ExperimentInfo.TemperatureEnd",
+        "ExperimentInfo.Temperature.Unit",
+        "PI.ControlTimeStep",
+        "PI.ControlTimeStep.Unit",
+    )
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
@@ -31,54 +50,17 @@ class HighSpeed(Measurement):
         self.img_uri: str | None = None
         self.slide_num: int | None = None
 
-        with h5py.File(filepath, "r") as f:
-            self.attributes = dict(f.attrs)
-
-        self.aux_1 = (
-            float(self.attributes.get("Aux1.Value", "0"))
-            * float(self.attributes.get("Aux1.ConversionFactor", "0"))
-            * (2 * float(self.attributes.get("Aux1.InvertSignalIn", "0")) - 1)
-        )
-        self.aux_1_unit = self.attributes.get("Aux1.Unit", "")
-        self.aux_1_label = self.attributes.get("Aux1.Label", "")
+        self.attributes = file_attributes(filepath)
 
-        self.aux_2 = (
-            float(self.attributes.get("Aux2.Value", "0"))
-            * float(self.attributes.get("Aux2.ConversionFactor", "0"))
-            * (2 * float(self.attributes.get("Aux2.InvertSignalIn", "0")) - 1)
+        self.aux_1, self.aux_1_unit, self.aux_1_label = aux_signal(
+            self.attributes, "Aux1"
         )
-        self.aux_2_unit = self.attributes.get("Aux2.Unit", "")
-        self.aux_2_label = self.attributes.get("Aux2.Label", "")
 
-        self.sig_in_convfact = float(
-            self.attributes.get("Signal_In.ConversionFactor", "nan")
-        )
-        self.sig_in_logamp = self.attributes.get("Signal_In.LogAmp", "")
-        self.sig_in_offset = float(
-            self.attributes.get("Signal_In.Offset", "nan")
+        self.aux_2, self.aux_2_unit, self.aux_2_label = aux_signal(
+            self.attributes, "Aux2"
         )
-        self._sig_in_offset_unit = self.attributes.get(
-            "Signal_In.Offset.Unit", ""
-        )
-        self.sig_in_unit = self.attributes.get("Signal_In.Unit", "")
 
-        self.z_in_convfact = self.attributes.get("Z_In.ConversionFactor", "")
-        self.z_in_offset = self.attributes.get("Z_In.Offset", "")
-        self.z_in_offset_unit = self.attributes.get("Z_In.Offset.Unit", "")
-        self.z_in_unit = self.attributes.get("Z_In.Unit", "")
-
-        self.temp_start = self.attributes.get(
-            "ExperimentInfo.TemperatureStart", "nan"
-        )
-        self.temp_end = self.attributes.get(
-            "ExperimentInfo.TemperatureEnd", "nan"
-        )
-        self.temp_unit = self.attributes.get(
-            "ExperimentInfo.Temperature.Unit", "nan"
-        )
-
-        self.timestep = self.attributes.get("PI.ControlTimeStep", "")
-        self.timestep_unit = self.attributes.get("PI.ControlTimeStep.Unit", "")
+        set_attributes(self, self.attributes, self.attribute_names)
 
         self.par = read_corresponding_par_file(filepath)
 
@@ -99,9 +81,22 @@ class HighSpeed(Measurement):
 
     @override
     def process(self, config: Config) -> Self:
-        self.img_uri = read_corresponding_image(self.fileinfo.filepath, True)
+        self.img_uri = read_corresponding_image(
+            self.fileinfo.filepath, True, config
+        )
         return self
 
     @override
     def template_name(self) -> str:
         return "fastspm.j2"
+
+    @override
+    def slides(self) -> list[Any]:
+        return [self]
+
+    @override
+    def source_files(self) -> list[Path]:
+        return [
+            self.fileinfo.filepath,
+            find_corresponding_image(self.fileinfo.filepath),
+        ]
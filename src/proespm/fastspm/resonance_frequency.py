@@ -1,7 +1,7 @@
 from pathlib import Path
 from datetime import datetime
 import os
-from typing import Self, final, override
+from typing import Any, Self, final, override
 
 
 from proespm.config import Config
@@ -19,15 +19,14 @@ class ResonanceFrequency(Measurement):
     """
 
     measurement_family = "FastSPM"
+    render_attrs = ("img_uri",)
 
     op_mode = "RF"
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
 
-        self.img_uri = read_corresponding_image(
-            self.fileinfo.filepath, rotate=True
-        )
+        self.img_uri: str | None = None
         self.slide_num: int | None = None
 
     @override
@@ -40,8 +39,15 @@ class ResonanceFrequency(Measurement):
 
     @override
     def process(self, config: Config) -> Self:
+        self.img_uri = read_corresponding_image(
+            self.fileinfo.filepath, rotate=True, config=config
+        )
         return self
 
     @override
     def template_name(self) -> str:
         return "fastspm.j2"
+
+    @override
+    def slides(self) -> list[Any]:
+        return [self]
@@ -1,13 +1,15 @@
 from pathlib import Path
 from datetime import datetime, timezone
-from typing import Self, final, override
-
-import h5py
+from typing import Any, Self, final, override
 
 from proespm.config import Config
+from proespm.fastspm.catalog import file_attributes
 from proespm.fastspm.fastspm import (
+    aux_signal,
+    find_corresponding_image,
     read_corresponding_image,
     read_corresponding_par_file,
+    set_attributes,
 )
 from proespm.fileinfo import Fileinfo
 from proespm.measurement import Measurement
@@ -22,8 +24,19 @@ class SlowImage(Measurement):
     """
 
     measurement_family = "FastSPM"
+    render_attrs = ("img_uri",)
 
     op_mode = "SI"
+    attribute_names = (
+        "Z_In.ConversionFactor",
+        "Z_In.Offset",
+        "Z_In.Unit",
+        "ExperimentInfo.TemperatureStart",
+        "ExperimentInfo.TemperatureEnd",
+        "ExperimentInfo.Temperature.Unit",
+        "PI.ControlTimeStep",
+        "PI.ControlTimeStep.Unit",
+    )
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
@@ -31,57 +44,29 @@ class SlowImage(Measurement):
         self.img_uri: str | None = None
         self.slide_num: int | None = None
 
-        with h5py.File(filepath, "r") as f:
-            self.attributes = dict(f.attrs)
+        self.attributes = file_attributes(filepath)
 
-            # def show_attrs(name, obj):
-            #     print(f"= {obj} =")
-            #     if obj.attrs:
-            #         print(f"  [{name}]")
-            #         for k, v in obj.attrs.items():
-            #             print(f"    {k} -> {v}")
+        # def show_attrs(name, obj):
+        #     print(f"= {obj} =")
+        #     if obj.attrs:
+        #         print(f"  [{name}]")
+        #         for k, v in obj.attrs.items():
+        #             print(f"    {k} -> {v}")
 
-            # f.visititems(show_attrs)
+        # f.visititems(show_attrs)
 
         # for k, v in self.attributes.items():
         #     print(f"{k}->{v}".encode("utf8", "backslashreplace"))
 
-        self.aux_1 = (
-            float(self.attributes.get("Aux1.Value", "0"))
-            * float(self.attributes.get("Aux1.ConversionFactor", "0"))
-            * (2 * float(self.attributes.get("Aux1.InvertSignalIn", "0")) - 1)
+        self.aux_1, self.aux_1_unit, self.aux_1_label = aux_signal(
+            self.attributes, "Aux1"
         )
-        self.aux_1_unit = self.attributes.get("Aux1.Unit", "")
-        self.aux_1_label = self.attributes.get("Aux1.Label", "")
 
-        self.aux_2 = (
-            float(self.attributes.get("Aux2.Value", "0"))
-            * float(self.attributes.get("Aux2.ConversionFactor", "0"))
-            * (2 * float(self.attributes.get("Aux2.InvertSignalIn", "0")) - 1)
+        self.aux_2, self.aux_2_unit, self.aux_2_label = aux_signal(
+            self.attributes, "Aux2"
         )
-        self.aux_2_unit = self.attributes.get("Aux2.Unit", "")
-        self.aux_2_label = self.attributes.get("Aux2.Label", "")
 
-        self.z_in_convfact = float(
-            self.attributes.get("Z_In.ConversionFactor", "nan")
-        )
-        self.z_in_offset = float(self.attributes.get("Z_In.Offset", "nan"))
-        self.z_in_unit = self.attributes.get("Z_In.Unit", "")
-
-        self.temp_start = self.attributes.get(
-            "ExperimentInfo.TemperatureStart", "nan"
-        )
-        self.temp_end = self.attributes.get(
-            "ExperimentInfo.TemperatureEnd", "nan"
-        )
-        self.temp_unit = self.attributes.get(
-            "ExperimentInfo.Temperature.Unit", "nan"
-        )
-
-        self.time_per_pixel = self.attributes.get("PI.ControlTimeStep", "")
-        self.time_per_pixel_unit = self.attributes.get(
-            "PI.ControlTimeStep.Unit", ""
-        )
+        set_attributes(self, self.attributes, self.attribute_names)
 
         self.par = read_corresponding_par_file(filepath)
 
@@ -102,9 +87,22 @@ class SlowImage(Measurement):
 
     @override
     def process(self, config: Config) -> Self:
-        self.img_uri = read_corresponding_image(self.fileinfo.filepath, True)
+        self.img_uri = read_corresponding_image(
+            self.fileinfo.filepath, True, config
+        )
         return self
 
     @override
     def template_name(self) -> str:
         return "fastspm.j2"
+
+    @override
+    def slides(self) -> list[Any]:
+        return [self]
+
+    @override
+    def source_files(self) -> list[Path]:
+        return [
+            self.fileinfo.filepath,
+            find_corresponding_image(self.fileinfo.filepath),
+        ]
@@ -16,6 +16,7 @@ from PyQt6.QtCore import (
 from PyQt6.QtGui import QFont
 from PyQt6.QtWidgets import (
     QApplication,
+    QCheckBox,
     QComboBox,
     QDoubleSpinBox,
     QFileDialog,
@@ -26,17 +27,21 @@ from PyQt6.QtWidgets import (
     QMainWindow,
     QMessageBox,
     QPushButton,
+    QSpinBox,
     QTextEdit,
     QVBoxLayout,
     QWidget,
 )
 
-from proespm.config import DEFAULT_COLORMAP, Config
+from proespm.assets import assets_dir_for
+from proespm.cache import ArtifactCache, default_cache_dir
+from proespm.config import DEFAULT_CACHE_SIZE, DEFAULT_COLORMAP, Config
 from proespm.processing import (
     create_html,
     create_measurement_objs,
     process_loop,
 )
+from proespm.profiling import Profiler
 
 
 @final
@@ -49,11 +54,28 @@ class ProcessingWorker(QRunnable):
         output_path: str,
         colormap: str,
         colorrange: tuple[float, float],
+        jobs: int,
+        use_cache: bool,
+        external_assets: bool,
+        fast_renderer: bool,
     ) -> None:
         super().__init__()
         self.process_dir = process_dir
         self.output_path = output_path
-        self.config = Config(colormap=colormap, colorrange=colorrange)
+        self.config = Config(
+            colormap=colormap,
+            colorrange=colorrange,
+            renderer="fast" if fast_renderer else "matplotlib",
+            jobs=jobs,
+            assets_dir=(
+                assets_dir_for(Path(output_path)) if external_assets else None
+            ),
+        )
+        self.cache = (
+            ArtifactCache(default_cache_dir(), DEFAULT_CACHE_SIZE)
+            if use_cache
+            else None
+        )
         self.signals = WorkerSignals()
 
     def log(self, message: str) -> None:
@@ -67,11 +89,23 @@ class ProcessingWorker(QRunnable):
         report_name = Path(process_dir).name
 
         try:
+            profiler = Profiler()
             self.log(f"Start processing of {process_dir}")
-            process_objs = create_measurement_objs(process_dir, self.log)
-            process_loop(process_objs, self.config, self.log)
-            create_html(process_objs, output_path, report_name)
+            process_objs = create_measurement_objs(
+                process_dir, self.log, self.config.jobs, profiler, self.cache
+            )
+            process_loop(
+                process_objs, self.config, self.log, self.cache, profiler
+            )
+            create_html(
+                process_objs,
+                output_path,
+                report_name,
+                release=True,
+                profiler=profiler,
+            )
             self.log(f"HTML created at {output_path}")
+            self.log("\n".join(profiler.summary()))
             self.signals.finished.emit()
 
         except Exception:
@@ -157,6 +191,23 @@ class MainGui(QMainWindow):
         colorrange_layout.addWidget(self.colorrange_end)
         self.central_layout.addLayout(colorrange_layout)
 
+        # Number of parallel processes
+        jobs_layout = QHBoxLayout()
+        jobs_lbl = QLabel("Parallel processes:")
+        self.jobs = QSpinBox()
+        self.jobs.setRange(1, os.cpu_count() or 1)
+        self.jobs.setValue(1)
+        jobs_layout.addWidget(jobs_lbl)
+        jobs_layout.addWidget(self.jobs)
+        self.use_cache = QCheckBox("Use cached results")
+        self.use_cache.setChecked(True)
+        jobs_layout.addWidget(self.use_cache)
+        self.external_assets = QCheckBox("Save images as separate files")
+        jobs_layout.addWidget(self.external_assets)
+        self.fast_renderer = QCheckBox("Fast image rendering")
+        jobs_layout.addWidget(self.fast_renderer)
+        self.central_layout.addLayout(jobs_layout)
+
         # Logging area
         self.log_area = QTextEdit()
         self.log_area.setReadOnly(True)
@@ -264,6 +315,10 @@ class MainGui(QMainWindow):
             self.colorrange_start.value(),
             self.colorrange_end.value(),
         )
+        jobs = self.jobs.value()
+        use_cache = self.use_cache.isChecked()
+        external_assets = self.external_assets.isChecked()
+        fast_renderer = self.fast_renderer.isChecked()
 
         if not os.path.isdir(process_dir):
             _ = QMessageBox.warning(
@@ -278,6 +333,10 @@ class MainGui(QMainWindow):
             output_path,
             colormap,
             colorrange,
+            jobs,
+            use_cache,
+            external_assets,
+            fast_renderer,
         )
         _ = processing_worker.signals.message.connect(self.log)
         _ = processing_worker.signals.finished.connect(self.processing_finished)
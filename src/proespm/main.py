@@ -1,3 +1,4 @@
+import multiprocessing
 import sys
 
 from PyQt6.QtCore import QCoreApplication
@@ -7,6 +8,8 @@ from proespm.gui import MainGui
 
 
 def main():
+    # Needed for the process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     QCoreApplication.setApplicationName("Proespm")
 
     # icon = QIcon()
@@ -1,6 +1,8 @@
 import datetime
 from abc import ABC, abstractmethod
-from typing import Self
+from operator import attrgetter
+from pathlib import Path
+from typing import Any, ClassVar, Self
 
 from proespm.config import Config
 
@@ -8,6 +10,14 @@ from proespm.config import Config
 class Measurement(ABC):
     """Interface for a scientific measurement file."""
 
+    render_attrs: ClassVar[tuple[str, ...]] = ()
+    """Attributes (dotted paths allowed) that `process` populates and the
+    template needs for rendering, e.g. data URIs or Bokeh components."""
+
+    data_attrs: ClassVar[tuple[str, ...]] = ()
+    """Attributes (dotted paths allowed) holding raw data that is not needed
+    anymore once `process` has populated the `render_attrs`."""
+
     @abstractmethod
     def m_id(self) -> str:
         """Unique measurement identifier."""
@@ -27,3 +37,40 @@ class Measurement(ABC):
     def template_name(self) -> str | None:
         """Name of the Jinja2 template used for HTML rendering."""
         ...
+
+    def source_files(self) -> list[Path]:
+        """Files the measurement is read from, used to detect changes."""
+        return [self.fileinfo.filepath]  # ty:ignore[unresolved-attribute]
+
+    def slides(self) -> list[Any]:
+        """Images shown in the image modal of the HTML report, each gets a
+        running `slide_num` assigned."""
+        return []
+
+    def render_artifacts(self) -> dict[str, Any]:
+        """Outputs of `process` that are needed for HTML rendering.
+
+        The returned values must be picklable, as they are transferred from
+        worker processes back to the main process.
+        """
+        return {name: attrgetter(name)(self) for name in self.render_attrs}
+
+    def load_render_artifacts(self, artifacts: dict[str, Any]) -> None:
+        """Restore outputs of `process` returned by `render_artifacts`."""
+        for name, value in artifacts.items():
+            owner_path, _, attr = name.rpartition(".")
+            owner = attrgetter(owner_path)(self) if owner_path else self
+            setattr(owner, attr, value)
+
+    def release_render_artifacts(self) -> None:
+        """Free the memory of the outputs of `process` once they are
+        rendered."""
+        self.load_render_artifacts(dict.fromkeys(self.render_attrs))
+
+    def release_data(self) -> None:
+        """Free the memory of the raw data once the render artifacts exist.
+
+        Only the metadata needed by the template is kept, so the measurement
+        can not be processed again afterwards.
+        """
+        self.load_render_artifacts(dict.fromkeys(self.data_attrs))
@@ -27,7 +27,12 @@ def extract_elabftw(filepath: Path) -> list[ElabFtw]:
         json_content.get("body") or json_content.get("body_html", "")
     )
     return [
-        ElabFtw(row=entry, number=i + 1, json_content=json_content)
+        ElabFtw(
+            row=entry,
+            number=i + 1,
+            json_content=json_content,
+            filepath=filepath,
+        )
         for i, entry in enumerate(entries)
     ]
 
@@ -41,7 +46,9 @@ class ElabFtw(Measurement):
         row: dict[str, Any],
         number: int,
         json_content: dict[str, Any],
+        filepath: Path,
     ) -> None:
+        self.filepath = filepath
         self._datetime: datetime = row["timestamp"]
         self.text: str = row["content_html"]
         self._number = number
@@ -77,6 +84,10 @@ class ElabFtw(Measurement):
     def template_name(self) -> str | None:
         return "elab_ftw.j2"
 
+    @override
+    def source_files(self) -> list[Path]:
+        return [self.filepath]
+
 
 def _parse_html_body(raw_string: str) -> list[dict[str, Any]]:
     html_string = html.unescape(raw_string)
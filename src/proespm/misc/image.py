@@ -1,9 +1,9 @@
 from pathlib import Path
-import base64
 import os
 from datetime import datetime
-from typing import Self, final, override
+from typing import Any, Self, final, override
 
+from proespm.assets import asset_name, image_uri
 from proespm.fileinfo import Fileinfo
 from proespm.config import Config
 from proespm.measurement import Measurement
@@ -14,6 +14,7 @@ class Image(Measurement):
     """Class handeling image files (.png, .jpg, .jpeg)"""
 
     measurement_family = "Image"
+    render_attrs = ("img_uri",)
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
@@ -21,16 +22,18 @@ class Image(Measurement):
         self.img_uri: str | None = None
         self.slide_num: int | None = None
 
-    def encode_png(self):
-        """Encodes an image to base64
+    def encode_png(self, config: Config):
+        """Encodes an image to base64 or writes it to the external assets
 
         Returns:
-            str: Data uri of the image
+            str: URI of the image
         """
         with open(self.fileinfo.filepath, "rb") as f:
-            self.img_uri = (
-                f"data:image/{self.fileinfo.fileext};base64, "
-                + base64.b64encode(f.read()).decode("ascii")
+            self.img_uri = image_uri(
+                f.read(),
+                self.fileinfo.fileext.lstrip(".").lower(),
+                asset_name(self.fileinfo.filepath),
+                config,
             )
 
     @override
@@ -43,9 +46,13 @@ class Image(Measurement):
 
     @override
     def process(self, config: Config) -> Self:
-        self.encode_png()
+        self.encode_png(config)
         return self
 
     @override
     def template_name(self) -> str:
         return "image.j2"
+
+    @override
+    def slides(self) -> list[Any]:
+        return [self]
@@ -16,6 +16,8 @@ from proespm.measurement import Measurement
 @final
 class Qcmb(Measurement):
     measurement_family = "Qcmb"
+    render_attrs = ("script", "div")
+    data_attrs = ("time", "rate", "thickness")
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
@@ -18,6 +18,8 @@ from proespm.measurement import Measurement
 @final
 class RgaMassScan(Measurement):
     measurement_family = "RGA MassScan"
+    render_attrs = ("script", "div")
+    data_attrs = ("data",)
 
     op_mode = "MASSSCAN"
 
@@ -110,6 +112,8 @@ class RgaTimeSeries(Measurement):
     op_mode = "TIMESERIES"
 
     measurement_family = "RGA Timeseries"
+    render_attrs = ("script", "div")
+    data_attrs = ("data",)
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
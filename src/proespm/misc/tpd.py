@@ -19,6 +19,8 @@ from proespm.measurement import Measurement
 @final
 class Tpd(Measurement):
     measurement_family = "TPD"
+    render_attrs = ("script", "div")
+    data_attrs = ("data",)
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
@@ -28,8 +30,6 @@ class Tpd(Measurement):
 
         self.data = self.get_data()
 
-        self.colors = itertools.cycle(Category10_10)
-
     def get_data(self) -> dict[str, NDArray[np.float64]]:
         with open(self.fileinfo.filepath, "r") as f:
             header = f.readline()
@@ -48,6 +48,7 @@ class Tpd(Measurement):
 
     def plot(self) -> None:
         """Creates an interactive plot of the data"""
+        colors = itertools.cycle(Category10_10)
         time_data: NDArray[np.float64] = self.data.pop("Time")
         temperature_data: NDArray[np.float64] = self.data.pop("Temperature")
         y_min = np.inf
@@ -84,7 +85,7 @@ class Tpd(Measurement):
                 time_data,
                 v,
                 legend_label=k,
-                color=next(self.colors),
+                color=next(colors),
                 line_width=2,
             )
 
@@ -102,7 +103,7 @@ class Tpd(Measurement):
             time_data,
             temperature_data,
             legend_label="T",
-            color=next(self.colors),
+            color=next(colors),
             y_range_name=second_y_range_name,
             line_width=2,
         )
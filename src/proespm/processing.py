@@ -1,65 +1,27 @@
+import multiprocessing
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Callable
+from typing import TYPE_CHECKING, Any, Callable
 
 from jinja2 import Environment, FileSystemLoader
 
-from proespm.config import ALLOWED_FILE_TYPES, Config
-from proespm.ec.ec_labview import CaLabview, CvLabview, FftLabview
-from proespm.ec.nordic_ec4 import NordicEc4
-from proespm.ec.PalmSens.ca import CaPalmSens
-from proespm.ec.PalmSens.cp import CpPalmSens
-from proespm.ec.PalmSens.cv import CvPalmSens
-from proespm.ec.PalmSens.eis import EisPalmSens
-from proespm.ec.PalmSens.lsv import LsvPalmSens
-from proespm.ec.PalmSens.pssession import PalmSensSession
-from proespm.fastspm.atom_tracking import AtomTracking
-from proespm.fastspm.error_topography import ErrorTopography
-from proespm.fastspm.fast_scan import FastScan
-from proespm.fastspm.high_speed import HighSpeed
-from proespm.fastspm.resonance_frequency import ResonanceFrequency
-from proespm.fastspm.slow_image import SlowImage
+from proespm.cache import ArtifactCache
+from proespm.config import Config
 from proespm.measurement import Measurement
-from proespm.misc.elab_ftw import extract_elabftw, ElabFtw
-from proespm.misc.image import Image
-from proespm.misc.qcmb import Qcmb
-from proespm.misc.rga import RgaMassScan, RgaTimeSeries
-from proespm.misc.tpd import Tpd
-from proespm.spectroscopy.aes_staib import AesStaib
-from proespm.spectroscopy.xps_eis import XpsEis
-from proespm.spm.flm import StmFlm
-from proespm.spm.mtrx import StmMatrix
-from proespm.spm.mul import StmMul
-from proespm.spm.nid import SpmNid
-from proespm.spm.sm4 import StmSm4
-from proespm.spm.sxm import StmSxm
-
-
-def _check_file_for_str(
-    file: Path, string_to_check: str, line_num: int
-) -> bool:
-    """Check if a file contains a string at a certain line number.
+from proespm.profiling import Profiler, Span, measurement_args, span
+from proespm.registry import find_reader, registered_extensions
 
-    Args:
-        file: File to check.
-        string_to_check: String to check for in `file`.
-        line_num: Line number which is checked, starting from 1.
-
-    Returns:
-        True if `file` contains `string_to_check` at line `line_num`, False if not.
-    """
-    try:
-        with file.open() as f:
-            [next(f) for _ in range(line_num - 1)]
-            line = f.readline()
+if TYPE_CHECKING:
+    from proespm.ec.nordic_ec4 import NordicEc4
 
-    except UnicodeDecodeError:
-        with file.open(encoding="utf-16") as f:
-            [next(f) for _ in range(line_num - 1)]
-            line = f.readline()
 
-    return string_to_check in line
+class OrphanEc4FileError(Exception):
+    def __init__(self, filename: str) -> None:
+        message = f"{filename} continues an EC4 measurement without first file"
+        super().__init__(message)
 
 
 def _import_files(process_dir: str) -> list[Path]:
@@ -72,25 +34,42 @@ def _import_files(process_dir: str) -> list[Path]:
     Returns:
         List of full paths to imported files.
     """
+    extensions = registered_extensions()
     measurement_files: list[Path] = []
     for entry in os.scandir(process_dir):
         if entry.is_dir():
             for sub_entry in os.scandir(entry):
                 if sub_entry.is_file() and sub_entry.path.lower().endswith(
-                    ALLOWED_FILE_TYPES
+                    extensions
                 ):
                     measurement_files.append(Path(sub_entry.path))
 
-        elif entry.is_file() and entry.path.lower().endswith(
-            ALLOWED_FILE_TYPES
-        ):
+        elif entry.is_file() and entry.path.lower().endswith(extensions):
             measurement_files.append(Path(entry.path))
 
     return sorted(measurement_files, key=lambda x: os.path.getctime(x))
 
 
+def _catalog_fastspm_files(
+    paths: list[Path], cache: ArtifactCache | None
+) -> None:
+    """Index the attributes of FastSPM .h5 files in the cache, from which
+    they are read on this and later runs instead of opening every .h5 file.
+    Without cache, the attributes are read from the files."""
+    from proespm.fastspm.catalog import build_catalogs, use_catalogs
+
+    if cache is None:
+        use_catalogs(None)
+    else:
+        build_catalogs(paths, cache.cache_dir)
+
+
 def create_measurement_objs(
-    process_dir: str, _log: Callable[[str], None]
+    process_dir: str,
+    _log: Callable[[str], None],
+    jobs: int = 1,
+    profiler: Profiler | None = None,
+    cache: ArtifactCache | None = None,
 ) -> list[Measurement]:
     """Instantiation of `Measurement` objects.
 
@@ -100,142 +79,316 @@ def create_measurement_objs(
 
     Args:
         process_dir: Full path of the directory containing files to import.
+        jobs: Number of threads used for reading files concurrently.
+        profiler: Profiler that records the time needed for discovery and
+            reading of the files.
+        cache: Cache in which the attributes of FastSPM files are indexed.
 
     Returns:
         List of `Measurement` objects derived from files at `process_dir`.
     """
-    last_ec4: NordicEc4 | None = None
+    with span(profiler, "discovery", "stage"):
+        paths = _import_files(process_dir)
+        _catalog_fastspm_files(paths, cache)
 
-    measurement_objects: list[Measurement] = []
-    for path in _import_files(process_dir):
-        check = lambda s, n: _check_file_for_str(path, s, n)  # noqa: E731
-        match path.suffix.lower():
-            case ".z_mtrx":
-                obj = StmMatrix(path)
+    with span(profiler, "reading", "stage"):
+        return read_measurements(paths, jobs, profiler)
 
-            case ".mul":
-                obj = StmMul(path)
 
-            case ".sm4":
-                obj = StmSm4(path)
+def read_and_process(
+    process_dir: str,
+    config: Config,
+    log: Callable[[str], None],
+    cache: ArtifactCache | None = None,
+    profiler: Profiler | None = None,
+) -> list[Measurement]:
+    """Memory-lean combination of `create_measurement_objs` and
+    `process_loop`.
 
-            case ".sxm":
-                obj = StmSxm(path)
+    Each file is read, processed and its raw data released by
+    `Measurement.release_data` before the next file is read, so only the data
+    of `config.jobs` files is held in memory at a time. Files of an EC4
+    measurement are read and processed together.
 
-            case ".nid":
-                obj = SpmNid(path)
+    Args:
+        process_dir: Full path of the directory containing files to import.
+        config: Runtime configuration which contains information of
+            user-selected options.
+        log: Log function which is used to emit information about the
+            processing status.
+        cache: Cache of render artifacts. Measurements found in the cache are
+            not processed again.
+        profiler: Profiler that records the time needed for discovery and for
+            reading and processing each file.
 
-            case ".flm":
-                obj = StmFlm(path)
+    Returns:
+        List of processed `Measurement` objects, sorted by date and time.
+    """
+    with span(profiler, "discovery", "stage"):
+        paths = _import_files(process_dir)
+        _catalog_fastspm_files(paths, cache)
+        groups = _group_files(paths)
+
+    with span(profiler, "processing", "stage"):
+        if config.jobs > 1:
+            measurement_objects = _read_and_process_parallel(
+                groups, config, log, cache, profiler
+            )
+        else:
+            measurement_objects = [
+                measurement
+                for paths in groups
+                for measurement in _read_and_process(
+                    paths, config, log, cache, profiler
+                )
+            ]
+
+        if cache is not None:
+            cache.evict()
+
+        measurement_objects.sort(key=lambda x: x.get_datetime())
+        assign_slide_nums(measurement_objects)
 
-            # case ".vms" if _check_file_for_str(file_path, "Staib SuperCMA", 3):
-            case ".vms" if check("Staib SuperCMA", 3):
-                obj = AesStaib(path)
+    return measurement_objects
 
-            case ".dat" if check("AES", 3):
-                obj = AesStaib(path)
 
-            case ".txt" if check("Region", 1):
-                obj = XpsEis(path)
+def _group_files(paths: list[Path]) -> list[list[Path]]:
+    """Split `paths` into groups of files that are read together, which are
+    single files except for EC4 measurements continued in further files."""
+    groups: list[list[Path]] = []
+    ec4_group: list[Path] | None = None
+    for path in paths:
+        spec = find_reader(path)
+        is_ec4 = spec is not None and spec.name == "NordicEc4"
+        if is_ec4 and not _is_first_ec4_file(path) and ec4_group is not None:
+            ec4_group.append(path)
+            continue
 
-            case ".txt" if check("EC4 File", 1):
-                obj = NordicEc4(path)
-                if path.stem.endswith("1"):
-                    last_ec4 = obj
-                    measurement_objects.append(last_ec4)
-                else:
-                    assert last_ec4 is not None
-                    last_ec4.push_cv_data(obj)
+        groups.append([path])
+        if is_ec4 and _is_first_ec4_file(path):
+            ec4_group = groups[-1]
 
-                continue
+    return groups
 
-            case ".txt" if check("Residual Gas Analyzer Software", 2) and check(
-                "Analog Scan Setup:", 5
-            ):
-                obj = RgaMassScan(path)
 
-            case ".txt" if check("Residual Gas Analyzer Software", 2) and check(
-                "Pressure vs Time Scan Setup:", 5
+def _read_and_process(
+    paths: list[Path],
+    config: Config,
+    log: Callable[[str], None],
+    cache: ArtifactCache | None,
+    profiler: Profiler | None,
+) -> list[Measurement]:
+    """Read, process and release the data of a group of `_group_files`."""
+    measurement_objects = read_measurements(paths, profiler=profiler)
+    for measurement in measurement_objects:
+        artifacts = cache.get(measurement, config) if cache else None
+        if artifacts is not None:
+            log(f"Using cached result of {measurement.m_id()}")
+            measurement.load_render_artifacts(artifacts)
+        else:
+            log(f"Processing of {measurement.m_id()}")
+            with span(
+                profiler,
+                measurement.m_id(),
+                "process",
+                measurement_args(measurement),
             ):
-                obj = RgaTimeSeries(path)
+                _ = measurement.process(config)
+            if cache is not None:
+                cache.put(measurement, config)
 
-            case ".log" if check("Rate (Å/s)", 2):
-                obj = Qcmb(path)
+        measurement.release_data()
 
-            case ".csv" if (
-                not check("Scan rate", 1)
-                and not check("Freq_Hz", 1)
-                and not check("Date and time", 1)
-                and not check("Date and time", 4)
-            ):
-                obj = CaLabview(path)
-
-            case ".csv" if check("Scan rate", 1):
-                obj = CvLabview(path)
-
-            case ".csv" if check("Freq_Hz", 1):
-                obj = FftLabview(path)
-
-            case ".csv" if check("Chronopotentiometry", 4):
-                obj = CpPalmSens(path)
-
-            case ".csv" if check("Chronoamperometry", 4):
-                obj = CaPalmSens(path)
-
-            case ".csv" if check("Cyclic Voltammetry", 4):
-                obj = CvPalmSens(path)
-
-            case ".csv" if check("Linear Sweep Voltammetry", 4):
-                obj = LsvPalmSens(path)
-
-            case ".csv" if check("Impedance Spectroscopy", 2):
-                obj = EisPalmSens(path)
-
-            case ".png" | ".jpg" | ".jpeg" if not path.with_suffix(
-                ".h5"
-            ).exists():
-                if path.name.startswith("RF"):
-                    obj = ResonanceFrequency(path)
-                else:
-                    obj = Image(path)
-
-            case ".lvm":
-                obj = Tpd(path)
-
-            case ".pssession":
-                obj = PalmSensSession(path)
-
-            case ".h5":
-                if path.name.startswith("FS"):
-                    obj = FastScan(path)
-                elif path.name.startswith("AT"):
-                    obj = AtomTracking(path)
-                elif path.name.startswith("ET"):
-                    obj = ErrorTopography(path)
-                elif path.name.startswith("SI"):
-                    obj = SlowImage(path)
-                elif path.name.startswith("HS"):
-                    obj = HighSpeed(path)
-                else:
-                    continue
-
-            case ".json":
-                objs = extract_elabftw(path)
-                measurement_objects += objs
-                continue
+    return measurement_objects
 
-            case _:
+
+def _read_and_process_parallel(
+    groups: list[list[Path]],
+    config: Config,
+    log: Callable[[str], None],
+    cache: ArtifactCache | None,
+    profiler: Profiler | None,
+) -> list[Measurement]:
+    """Call `_read_and_process` for all `groups` in a process pool.
+
+    Only the released measurements are sent back. Results are collected in
+    the order of `groups`, so the log output is the same as for sequential
+    processing.
+    """
+    # Forking a process that runs Qt threads is unsafe, spawn on all platforms
+    mp_context = multiprocessing.get_context("spawn")
+    measurement_objects: list[Measurement] = []
+    with ProcessPoolExecutor(
+        max_workers=config.jobs, mp_context=mp_context
+    ) as executor:
+        futures = [
+            executor.submit(
+                _read_and_process_group,
+                paths,
+                config,
+                cache,
+                profiler is not None,
+            )
+            for paths in groups
+        ]
+        for future in futures:
+            measurements, messages, spans = future.result()
+            for message in messages:
+                log(message)
+            if profiler is not None:
+                profiler.extend(spans)
+            measurement_objects += measurements
+
+    return measurement_objects
+
+
+def _read_and_process_group(
+    paths: list[Path],
+    config: Config,
+    cache: ArtifactCache | None,
+    profile: bool,
+) -> tuple[list[Measurement], list[str], list[Span]]:
+    """Worker function of `_read_and_process_parallel`, returns the released
+    measurements, the log messages and, if `profile` is set, the recorded
+    spans."""
+    # Only reads the catalogs built by the parent process
+    _catalog_fastspm_files([], cache)
+    profiler = Profiler() if profile else None
+    messages: list[str] = []
+    measurement_objects = _read_and_process(
+        paths, config, messages.append, cache, profiler
+    )
+
+    return measurement_objects, messages, profiler.spans if profiler else []
+
+
+def read_measurements(
+    paths: list[Path],
+    jobs: int = 1,
+    profiler: Profiler | None = None,
+    on_error: Callable[[Path, Exception], None] | None = None,
+) -> list[Measurement]:
+    """Read `paths` into `Measurement` objects.
+
+    Args:
+        paths: Full paths of the files to read, in the order of creation.
+        jobs: Number of threads used for reading files concurrently.
+        profiler: Profiler that records the time needed for reading each file.
+        on_error: Called with the path and the error for each file that
+            cannot be read, which is then skipped. If None, the error is
+            raised.
+
+    Returns:
+        List of `Measurement` objects derived from `paths`, files that are
+        not known measurement files are skipped.
+
+    Raises:
+        OrphanEc4FileError: If `paths` contains a continuation file of an EC4
+            measurement without the preceding first file.
+    """
+
+    def read(
+        path: Path,
+    ) -> Measurement | list[Measurement] | _Ec4File | _ReadError | None:
+        try:
+            return _read_measurement(path, profiler)
+        except Exception as e:
+            if on_error is None:
+                raise
+            return _ReadError(e)
+
+    if jobs > 1:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(read, paths))
+    else:
+        results = [read(path) for path in paths]
+
+    last_ec4: NordicEc4 | None = None
+
+    measurement_objects: list[Measurement] = []
+    for path, result in zip(paths, results):
+        match result:
+            case None:
                 continue
 
-        measurement_objects.append(obj)
+            case _ReadError(error) if on_error is not None:
+                on_error(path, error)
+
+            case list():
+                measurement_objects += result
+
+            # EC4 measurements are split over multiple files, which are
+            # grouped into the object of the first file
+            case _Ec4File(measurement, is_first=True):
+                last_ec4 = measurement
+                measurement_objects.append(last_ec4)
+
+            case _Ec4File(measurement):
+                if last_ec4 is None:
+                    raise OrphanEc4FileError(path.name)
+                last_ec4.push_cv_data(measurement)
+
+            case _:
+                measurement_objects.append(result)
 
     return measurement_objects
 
 
+@dataclass
+class _Ec4File:
+    """A file of an EC4 measurement, which may be continued in further files."""
+
+    measurement: "NordicEc4"
+    is_first: bool
+
+
+@dataclass
+class _ReadError:
+    """Error of reading a file, reported by `read_measurements`."""
+
+    error: Exception
+
+
+def _read_measurement(
+    path: Path, profiler: Profiler | None = None
+) -> Measurement | list[Measurement] | _Ec4File | None:
+    """Identify the type of measurement of `path` and read it.
+
+    Args:
+        path: Full path of the file to read.
+        profiler: Profiler that records the time needed for reading.
+
+    Returns:
+        The `Measurement` object(s) contained in `path` or `None` if the file
+        is not a known measurement file.
+    """
+    spec = find_reader(path)
+    if spec is None:
+        return None
+
+    reader = spec.load()
+    with span(profiler, path.name, "read", {"reader": spec.name}):
+        result = reader(path)
+    if spec.name == "NordicEc4":
+        return _Ec4File(
+            result,  # ty:ignore[invalid-argument-type]
+            is_first=_is_first_ec4_file(path),
+        )
+
+    return result
+
+
+def _is_first_ec4_file(path: Path) -> bool:
+    """Check if `path` is the first file of an EC4 measurement."""
+    return path.stem.endswith("1")
+
+
 def process_loop(
     measurement_objects: list[Measurement],
     config: Config,
     log: Callable[[str], None],
+    cache: ArtifactCache | None = None,
+    profiler: Profiler | None = None,
 ) -> None:
     """Processing of `measurement_objects`.
 
@@ -244,6 +397,12 @@ def process_loop(
     For certain objects that contain image data, a running number is added that is
     used in the HTML report's image modal.
 
+    If `config.jobs` is greater than 1, the `process` calls run in a pool of
+    worker processes and only the render artifacts of the measurements are
+    sent back. If `config.lean` is set, the raw data of all measurements is
+    released afterwards, see `read_and_process` to also avoid holding it in
+    memory all at once.
+
     Args:
         measurement_objects: List of Objects that implement `Measurement` which
             are processed.
@@ -251,50 +410,135 @@ def process_loop(
             options.
         log: Log function which is used to emit information about the processing
             status.
+        cache: Cache of render artifacts. Measurements found in the cache are
+            not processed again.
+        profiler: Profiler that records the time needed for processing each
+            measurement.
     """
-    slide_num = 1
+    with span(profiler, "processing", "stage"):
+        _process_loop(measurement_objects, config, log, cache, profiler)
+
+
+def _process_loop(
+    measurement_objects: list[Measurement],
+    config: Config,
+    log: Callable[[str], None],
+    cache: ArtifactCache | None,
+    profiler: Profiler | None,
+) -> None:
     measurement_objects.sort(key=lambda x: x.get_datetime())
-    for measurement in measurement_objects:
-        log(f"Processing of {measurement.m_id()}")
-        _ = measurement.process(config)
-        match measurement:
-            case (
-                StmMatrix()
-                | StmSm4()
-                | StmSxm()
-                | SpmNid()
-                | Image()
-                | FastScan()
-                | AtomTracking()
-                | ErrorTopography()
-                | SlowImage()
-                | HighSpeed()
-                | ResonanceFrequency()
+
+    to_process = measurement_objects
+    if cache is not None:
+        to_process = []
+        for measurement in measurement_objects:
+            artifacts = cache.get(measurement, config)
+            if artifacts is None:
+                to_process.append(measurement)
+            else:
+                log(f"Using cached result of {measurement.m_id()}")
+                measurement.load_render_artifacts(artifacts)
+
+    if config.jobs > 1:
+        _process_parallel(to_process, config, log, profiler)
+    else:
+        for measurement in to_process:
+            log(f"Processing of {measurement.m_id()}")
+            with span(
+                profiler,
+                measurement.m_id(),
+                "process",
+                measurement_args(measurement),
             ):
-                measurement.slide_num = slide_num
-                slide_num += 1
-            case StmMul() if type(measurement) is StmMul:
-                for mul_image in measurement.mulimages:
-                    mul_image.slide_num = slide_num  # ty:ignore[unresolved-attribute]
-                    slide_num += 1
-            case _:
-                pass
+                _ = measurement.process(config)
+
+    if cache is not None:
+        for measurement in to_process:
+            cache.put(measurement, config)
+        cache.evict()
+
+    if config.lean:
+        for measurement in measurement_objects:
+            measurement.release_data()
+
+    assign_slide_nums(measurement_objects)
+
+
+def _process_parallel(
+    measurement_objects: list[Measurement],
+    config: Config,
+    log: Callable[[str], None],
+    profiler: Profiler | None,
+) -> None:
+    """Call `process` of all `measurement_objects` in a process pool.
+
+    Results are collected in the order of `measurement_objects`, so the log
+    output is the same as for sequential processing.
+    """
+    # Forking a process that runs Qt threads is unsafe, spawn on all platforms
+    mp_context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=config.jobs, mp_context=mp_context
+    ) as executor:
+        futures = [
+            executor.submit(
+                _process_measurement, measurement, config, profiler is not None
+            )
+            for measurement in measurement_objects
+        ]
+        for measurement, future in zip(measurement_objects, futures):
+            log(f"Processing of {measurement.m_id()}")
+            artifacts, spans = future.result()
+            measurement.load_render_artifacts(artifacts)
+            if profiler is not None:
+                profiler.extend(spans)
+
+
+def _process_measurement(
+    measurement: Measurement, config: Config, profile: bool
+) -> tuple[dict[str, Any], list[Span]]:
+    """Worker function of `_process_parallel`, returns the render artifacts
+    and, if `profile` is set, the recorded spans."""
+    profiler = Profiler() if profile else None
+    with span(
+        profiler, measurement.m_id(), "process", measurement_args(measurement)
+    ):
+        _ = measurement.process(config)
+
+    return measurement.render_artifacts(), profiler.spans if profiler else []
+
+
+def assign_slide_nums(measurement_objects: list[Measurement]) -> None:
+    """Number all images in `measurement_objects` for the image modal."""
+    slide_num = 1
+    for measurement in measurement_objects:
+        for slide in measurement.slides():
+            slide.slide_num = slide_num
+            slide_num += 1
 
 
 def create_html(
     measurement_objects: list[Measurement],
     output_path: str,
     report_name: str,
+    release: bool = False,
+    profiler: Profiler | None = None,
 ) -> None:
     """Creation of the HTML report.
 
     The list of data_objs get passed to the jinja environment and can be used
-    inside of templates.
+    inside of templates. The report is written to `output_path` while it is
+    rendered, so it is never held in memory as a whole.
 
     Args:
         measurement_objects: List with DataObjects for the html report
         output_path: Full path where the report will be saved
         report_name: Name of the report
+        release: Release the render artifacts of each measurement as soon as
+            its section is written, which keeps the memory usage low. The
+            measurements can not be rendered again afterwards.
+        profiler: Profiler that records the time needed for writing the
+            report.
     """
 
     if getattr(sys, "frozen", False):
@@ -302,17 +546,34 @@ def create_html(
     else:
         template_dir = os.path.join(os.path.dirname(__file__), "templates")
 
+    from proespm.misc.elab_ftw import ElabFtw
+
     env = Environment(loader=FileSystemLoader(template_dir))
     env.globals["isinstance"] = isinstance  # ty:ignore[invalid-assignment]
     env.globals["ElabFTW"] = ElabFtw  # ty:ignore[invalid-assignment]
+    env.globals["release"] = _release if release else _keep  # ty:ignore[invalid-assignment]
 
     template = env.get_template("base_template.j2")
 
-    output = template.render(
+    stream = template.stream(
         measurement_objects=measurement_objects,
         title=report_name,
         files_dir=output_path.rstrip("_report.html"),
     )
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        _ = f.write(output)
+    with (
+        span(profiler, "report", "stage"),
+        open(output_path, "w", encoding="utf-8") as f,
+    ):
+        stream.dump(f)
+
+
+def _release(measurement: Measurement) -> str:
+    """Template function called after the section of `measurement` is
+    written."""
+    measurement.release_render_artifacts()
+    return ""
+
+
+def _keep(_measurement: Measurement) -> str:
+    return ""
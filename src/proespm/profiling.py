@@ -0,0 +1,191 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, ContextManager, final
+
+from proespm.measurement import Measurement
+
+
+def _peak_rss() -> int | None:
+    """Peak resident set size of the process in bytes, None if not
+    available on this platform."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux and bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+@dataclass
+class Span:
+    """Timing of a single stage.
+
+    Args:
+        name: Name of the stage, e.g. the measurement ID.
+        category: Kind of stage, e.g. `"read"` or `"process"`.
+        start: Start time in microseconds since the epoch.
+        wall_time: Duration in microseconds.
+        cpu_time: CPU time in microseconds of the executing thread, or of
+            the whole process for the category `"stage"`.
+        peak_memory: Increase of the peak memory usage of the process in
+            bytes, None if not available.
+        pid: ID of the executing process.
+        tid: ID of the executing thread.
+        args: Additional information, e.g. the measurement family.
+    """
+
+    name: str
+    category: str
+    start: int
+    wall_time: int
+    cpu_time: int
+    peak_memory: int | None
+    pid: int
+    tid: int
+    args: dict[str, str] = field(default_factory=dict)
+
+
+@final
+class Profiler:
+    """Recording of wall time, CPU time and peak memory of processing stages.
+
+    Spans can be recorded from multiple threads. Spans recorded in other
+    processes are added with `extend`.
+    """
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(
+        self, name: str, category: str, args: dict[str, str] | None = None
+    ) -> Iterator[None]:
+        """Record the execution of the `with` block as a span."""
+        peak_before = _peak_rss()
+        start = time.time_ns()
+        wall_start = time.perf_counter_ns()
+        # Stages may run work in other threads
+        cpu_clock = (
+            time.process_time_ns if category == "stage" else time.thread_time_ns
+        )
+        cpu_start = cpu_clock()
+        try:
+            yield
+        finally:
+            cpu_time = cpu_clock() - cpu_start
+            wall_time = time.perf_counter_ns() - wall_start
+            peak_after = _peak_rss()
+            peak_memory = (
+                None
+                if peak_before is None or peak_after is None
+                else peak_after - peak_before
+            )
+            span = Span(
+                name=name,
+                category=category,
+                start=start // 1000,
+                wall_time=wall_time // 1000,
+                cpu_time=cpu_time // 1000,
+                peak_memory=peak_memory,
+                pid=os.getpid(),
+                tid=threading.get_ident(),
+                args=args or {},
+            )
+            with self._lock:
+                self.spans.append(span)
+
+    def extend(self, spans: list[Span]) -> None:
+        """Add spans recorded by another profiler, e.g. in a worker."""
+        with self._lock:
+            self.spans.extend(spans)
+
+    def write_trace(self, path: Path) -> None:
+        """Write the spans in the Chrome trace event format, which can be
+        viewed with Perfetto (https://ui.perfetto.dev) or chrome://tracing."""
+        events = []
+        for span in self.spans:
+            args: dict[str, Any] = {
+                **span.args,
+                "cpu_time_ms": span.cpu_time / 1000,
+            }
+            if span.peak_memory is not None:
+                args["peak_memory_delta_mib"] = span.peak_memory / 1024**2
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": span.start,
+                    "dur": span.wall_time,
+                    "pid": span.pid,
+                    "tid": span.tid,
+                    "args": args,
+                }
+            )
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self) -> list[str]:
+        """Lines of a table with the times of all stages and the processing
+        times per measurement family."""
+        rows: dict[str, list[Span]] = {}
+        for span in self.spans:
+            if span.category == "stage":
+                key = span.name
+            elif span.category == "read":
+                key = f"read: {span.args.get('reader', 'Unknown')}"
+            elif span.category == "process":
+                key = f"process: {span.args.get('family', 'Unknown')}"
+            else:
+                continue
+            rows.setdefault(key, []).append(span)
+
+        lines = [
+            f"{'Stage':<32} {'Count':>5} {'Wall (s)':>9} {'CPU (s)':>9} "
+            f"{'Peak incr. (MiB)':>16}"
+        ]
+        for key, spans in rows.items():
+            wall_time = sum(s.wall_time for s in spans) / 1e6
+            cpu_time = sum(s.cpu_time for s in spans) / 1e6
+            peaks = [s.peak_memory for s in spans if s.peak_memory is not None]
+            peak = f"{max(peaks) / 1024**2:16.1f}" if peaks else f"{'-':>16}"
+            lines.append(
+                f"{key:<32} {len(spans):>5} {wall_time:>9.2f} "
+                f"{cpu_time:>9.2f} {peak}"
+            )
+
+        return lines
+
+
+def span(
+    profiler: Profiler | None,
+    name: str,
+    category: str,
+    args: dict[str, str] | None = None,
+) -> ContextManager[None]:
+    """`Profiler.span` of `profiler`, which does nothing if it is None."""
+    if profiler is None:
+        return nullcontext()
+
+    return profiler.span(name, category, args)
+
+
+def measurement_args(measurement: Measurement) -> dict[str, str]:
+    """Information about `measurement` attached to its spans."""
+    return {
+        "family": getattr(
+            measurement, "measurement_family", type(measurement).__name__
+        ),
+        "class": type(measurement).__name__,
+    }
@@ -0,0 +1,265 @@
+import importlib
+from collections.abc import Iterable
+from dataclasses import dataclass
+from importlib.metadata import entry_points
+from pathlib import Path
+from typing import Callable
+
+from proespm.measurement import Measurement
+from proespm.sniffer import FileSniffer
+
+type Reader = Callable[[Path], Measurement | list[Measurement]]
+
+type Signature = tuple[str, int]
+"""A string that is contained in a line of the file, with line numbers
+starting from 1."""
+
+ENTRY_POINT_GROUP = "proespm.readers"
+
+
+@dataclass(frozen=True)
+class ReaderSpec:
+    """Declaration of the files that are read by a reader.
+
+    A file is read by the first registered reader whose extension, prefix,
+    signatures and condition all match.
+
+    Args:
+        target: Reader in the form `"module:name"`, where `name` is a
+            `Measurement` class or a function that returns a list of
+            `Measurement` objects. The module is only imported when a
+            matching file is read.
+        extensions: Lowercase file extensions, including the leading dot.
+        prefixes: Filename prefixes of which one must match, any filename if
+            empty.
+        signatures: Strings at line numbers that all must be contained in
+            the file.
+        exclusions: Strings at line numbers that must not be contained in the
+            file.
+        condition: Additional check of the path.
+    """
+
+    target: str
+    extensions: tuple[str, ...]
+    prefixes: tuple[str, ...] = ()
+    signatures: tuple[Signature, ...] = ()
+    exclusions: tuple[Signature, ...] = ()
+    condition: Callable[[Path], bool] | None = None
+
+    @property
+    def name(self) -> str:
+        """Name of the reader."""
+        return self.target.partition(":")[2]
+
+    def matches(self, path: Path, sniffer: FileSniffer) -> bool:
+        """Check if `path` is read by this reader, its extension is expected
+        to match already."""
+        if self.prefixes and not path.name.startswith(self.prefixes):
+            return False
+        if not all(sniffer.check(*sig) for sig in self.signatures):
+            return False
+        if any(sniffer.check(*sig) for sig in self.exclusions):
+            return False
+
+        return self.condition is None or self.condition(path)
+
+    def load(self) -> Reader:
+        """Import the reader."""
+        module_name, _, name = self.target.partition(":")
+        return getattr(importlib.import_module(module_name), name)
+
+
+def _has_no_h5(path: Path) -> bool:
+    """Images of FastSPM measurements are read along with their .h5 file."""
+    return not path.with_suffix(".h5").exists()
+
+
+BUILTIN_READERS = (
+    ReaderSpec("proespm.spm.mtrx:StmMatrix", (".z_mtrx",)),
+    ReaderSpec("proespm.spm.mul:StmMul", (".mul",)),
+    ReaderSpec("proespm.spm.sm4:StmSm4", (".sm4",)),
+    ReaderSpec("proespm.spm.sxm:StmSxm", (".sxm",)),
+    ReaderSpec("proespm.spm.nid:SpmNid", (".nid",)),
+    ReaderSpec("proespm.spm.flm:StmFlm", (".flm",)),
+    ReaderSpec(
+        "proespm.spectroscopy.aes_staib:AesStaib",
+        (".vms",),
+        signatures=(("Staib SuperCMA", 3),),
+    ),
+    ReaderSpec(
+        "proespm.spectroscopy.aes_staib:AesStaib",
+        (".dat",),
+        signatures=(("AES", 3),),
+    ),
+    ReaderSpec(
+        "proespm.spectroscopy.xps_eis:XpsEis",
+        (".txt",),
+        signatures=(("Region", 1),),
+    ),
+    ReaderSpec(
+        "proespm.ec.nordic_ec4:NordicEc4",
+        (".txt",),
+        signatures=(("EC4 File", 1),),
+    ),
+    ReaderSpec(
+        "proespm.misc.rga:RgaMassScan",
+        (".txt",),
+        signatures=(
+            ("Residual Gas Analyzer Software", 2),
+            ("Analog Scan Setup:", 5),
+        ),
+    ),
+    ReaderSpec(
+        "proespm.misc.rga:RgaTimeSeries",
+        (".txt",),
+        signatures=(
+            ("Residual Gas Analyzer Software", 2),
+            ("Pressure vs Time Scan Setup:", 5),
+        ),
+    ),
+    ReaderSpec(
+        "proespm.misc.qcmb:Qcmb",
+        (".log",),
+        signatures=(("Rate (Å/s)", 2),),
+    ),
+    ReaderSpec(
+        "proespm.ec.ec_labview:CaLabview",
+        (".csv",),
+        exclusions=(
+            ("Scan rate", 1),
+            ("Freq_Hz", 1),
+            ("Date and time", 1),
+            ("Date and time", 4),
+        ),
+    ),
+    ReaderSpec(
+        "proespm.ec.ec_labview:CvLabview",
+        (".csv",),
+        signatures=(("Scan rate", 1),),
+    ),
+    ReaderSpec(
+        "proespm.ec.ec_labview:FftLabview",
+        (".csv",),
+        signatures=(("Freq_Hz", 1),),
+    ),
+    ReaderSpec(
+        "proespm.ec.PalmSens.cp:CpPalmSens",
+        (".csv",),
+        signatures=(("Chronopotentiometry", 4),),
+    ),
+    ReaderSpec(
+        "proespm.ec.PalmSens.ca:CaPalmSens",
+        (".csv",),
+        signatures=(("Chronoamperometry", 4),),
+    ),
+    ReaderSpec(
+        "proespm.ec.PalmSens.cv:CvPalmSens",
+        (".csv",),
+        signatures=(("Cyclic Voltammetry", 4),),
+    ),
+    ReaderSpec(
+        "proespm.ec.PalmSens.lsv:LsvPalmSens",
+        (".csv",),
+        signatures=(("Linear Sweep Voltammetry", 4),),
+    ),
+    ReaderSpec(
+        "proespm.ec.PalmSens.eis:EisPalmSens",
+        (".csv",),
+        signatures=(("Impedance Spectroscopy", 2),),
+    ),
+    ReaderSpec(
+        "proespm.fastspm.resonance_frequency:ResonanceFrequency",
+        (".png", ".jpg", ".jpeg"),
+        prefixes=("RF",),
+        condition=_has_no_h5,
+    ),
+    ReaderSpec(
+        "proespm.misc.image:Image",
+        (".png", ".jpg", ".jpeg"),
+        condition=_has_no_h5,
+    ),
+    ReaderSpec("proespm.misc.tpd:Tpd", (".lvm",)),
+    ReaderSpec(
+        "proespm.ec.PalmSens.pssession:PalmSensSession", (".pssession",)
+    ),
+    ReaderSpec(
+        "proespm.fastspm.fast_scan:FastScan", (".h5",), prefixes=("FS",)
+    ),
+    ReaderSpec(
+        "proespm.fastspm.atom_tracking:AtomTracking",
+        (".h5",),
+        prefixes=("AT",),
+    ),
+    ReaderSpec(
+        "proespm.fastspm.error_topography:ErrorTopography",
+        (".h5",),
+        prefixes=("ET",),
+    ),
+    ReaderSpec(
+        "proespm.fastspm.slow_image:SlowImage", (".h5",), prefixes=("SI",)
+    ),
+    ReaderSpec(
+        "proespm.fastspm.high_speed:HighSpeed", (".h5",), prefixes=("HS",)
+    ),
+    ReaderSpec("proespm.misc.elab_ftw:extract_elabftw", (".json",)),
+)
+"""Readers of proespm, in the order in which they are tried."""
+
+# Readers by extension, in the order of registration
+_readers: dict[str, list[ReaderSpec]] = {}
+_plugins_loaded = False
+
+
+def register_reader(spec: ReaderSpec, first: bool = False) -> None:
+    """Register a reader for the files declared by `spec`.
+
+    Args:
+        spec: Declaration of the reader.
+        first: Try the reader before all readers registered previously,
+            e.g. to take precedence over a built-in reader.
+    """
+    for extension in spec.extensions:
+        candidates = _readers.setdefault(extension.lower(), [])
+        if first:
+            candidates.insert(0, spec)
+        else:
+            candidates.append(spec)
+
+
+def find_reader(path: Path) -> ReaderSpec | None:
+    """The reader of `path`, None if it is not a known measurement file."""
+    _load_plugins()
+    candidates = _readers.get(path.suffix.lower())
+    if not candidates:
+        return None
+
+    sniffer = FileSniffer(path)
+    for spec in candidates:
+        if spec.matches(path, sniffer):
+            return spec
+
+    return None
+
+
+def registered_extensions() -> tuple[str, ...]:
+    """All extensions for which a reader is registered."""
+    _load_plugins()
+    return tuple(_readers)
+
+
+def _load_plugins() -> None:
+    """Register readers of installed packages, which provide an iterable of
+    `ReaderSpec` as entry point in the `proespm.readers` group."""
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+
+    _plugins_loaded = True
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        specs: Iterable[ReaderSpec] = entry_point.load()
+        for spec in specs:
+            register_reader(spec)
+
+
+for _spec in BUILTIN_READERS:
+    register_reader(_spec)
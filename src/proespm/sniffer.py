@@ -0,0 +1,89 @@
+import codecs
+from pathlib import Path
+from typing import final
+
+SNIFF_SIZE = 8192
+"""Number of bytes initially read from the start of a file."""
+
+
+@final
+class FileSniffer:
+    """Identification of a file by strings in its first lines.
+
+    The start of the file is read only once, on the first call of `check`,
+    and decoded as UTF-8 or, if this fails, as UTF-16. All following checks
+    run against this buffer. If it is extended for checks of later lines,
+    only the following bytes are read and decoded in the same encoding.
+
+    Args:
+        filepath: File to check.
+        size: Number of bytes initially read from the start of `filepath`.
+    """
+
+    def __init__(self, filepath: Path, size: int = SNIFF_SIZE) -> None:
+        self.filepath = filepath
+        self._size = size
+        self._decoder: codecs.IncrementalDecoder | None = None
+        self._text = ""
+        self._lines: list[str] | None = None
+        self._is_complete = False
+
+    def check(self, string_to_check: str, line_num: int) -> bool:
+        """Check if the file contains a string at a certain line number.
+
+        Args:
+            string_to_check: String to check for in the file.
+            line_num: Line number which is checked, starting from 1.
+
+        Returns:
+            True if the file contains `string_to_check` at line `line_num`,
+            False if not.
+        """
+        lines = self._read_lines(line_num)
+        if line_num > len(lines):
+            return False
+
+        return string_to_check in lines[line_num - 1]
+
+    def _read_lines(self, line_num: int) -> list[str]:
+        """Lines of the buffer, which contains at least `line_num` complete
+        lines if the file is long enough."""
+        # The last line of an incomplete buffer may be cut off
+        while self._lines is None or (
+            not self._is_complete and line_num >= len(self._lines)
+        ):
+            position = 0
+            if self._lines is not None:
+                position = self._size
+                self._size *= 2
+
+            with open(self.filepath, "rb") as f:
+                _ = f.seek(position)
+                chunk = f.read(self._size - position)
+
+            self._is_complete = position + len(chunk) < self._size
+            if self._decoder is None:
+                self._decoder = _decoder(chunk, self._is_complete)
+            self._text += self._decoder.decode(chunk, final=self._is_complete)
+            self._lines = (
+                self._text.replace("\r\n", "\n")
+                .replace("\r", "\n")
+                .split("\n")
+            )
+
+        return self._lines
+
+
+def _decoder(head: bytes, is_complete: bool) -> codecs.IncrementalDecoder:
+    """Decoder of a file starting with `head`, for UTF-8 if `head` is valid
+    UTF-8 and for UTF-16 otherwise. `head` may end in the middle of a
+    multi-byte character if `is_complete` is False."""
+    try:
+        _ = codecs.getincrementaldecoder("utf-8")().decode(
+            head, final=is_complete
+        )
+        encoding = "utf-8"
+    except UnicodeDecodeError:
+        encoding = "utf-16"
+
+    return codecs.getincrementaldecoder(encoding)(errors="replace")
@@ -23,6 +23,8 @@ class AesStaib(Measurement):
     """
 
     measurement_family = "Spectroscopy"
+    render_attrs = ("script", "div")
+    data_attrs = ("aes_data",)
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
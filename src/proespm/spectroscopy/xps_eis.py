@@ -102,6 +102,26 @@ class XpsEis(Measurement):
     def template_name(self) -> str:
         return "xps_eis.j2"
 
+    @override
+    def render_artifacts(self) -> dict[str, Any]:
+        return {
+            "components": [
+                (xps_scan.script, xps_scan.div) for xps_scan in self.data
+            ]
+        }
+
+    @override
+    def load_render_artifacts(self, artifacts: dict[str, Any]) -> None:
+        for xps_scan, (script, div) in zip(
+            self.data, artifacts["components"], strict=True
+        ):
+            xps_scan.script, xps_scan.div = script, div
+
+    @override
+    def release_render_artifacts(self) -> None:
+        for xps_scan in self.data:
+            xps_scan.script, xps_scan.div = None, None
+
 
 @final
 class XpsScan:
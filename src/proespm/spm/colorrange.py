@@ -0,0 +1,108 @@
+import math
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Number of pixels sampled for the approximate color range
+SAMPLE_SIZE = 65536
+
+
+def color_range(
+    arr: NDArray[np.floating[Any]],
+    percentiles: tuple[float, float],
+    mode: str = "exact",
+    tolerance: float = 0.05,
+) -> tuple[float, float]:
+    """Values at the `percentiles` of `arr`, used as limits of the color
+    range of an image.
+
+    Args:
+        arr: Pixel data of the image.
+        percentiles: Lower and upper percentile between 0 and 100.
+        mode: `"exact"` to get the same values as `np.percentile` from a
+            single partition of the pixels, `"approx"` to estimate them from
+            a random sample, which is much faster for large images.
+        tolerance: Maximum error in percentile units in the mode `"approx"`:
+            each returned value is the exact percentile of a percentile
+            within `tolerance` of the requested one. Estimates that do not
+            meet this are computed exactly.
+
+    Returns:
+        The lower and upper limit.
+    """
+    flat = arr.ravel()
+    if mode == "approx" and flat.size > SAMPLE_SIZE:
+        return _approx_percentiles(flat, percentiles, tolerance)
+
+    return _exact_percentiles(flat, percentiles)
+
+
+def _exact_percentiles(
+    flat: NDArray[np.floating[Any]], percentiles: tuple[float, float]
+) -> tuple[float, float]:
+    """Linearly interpolated percentiles like `np.percentile`, with a single
+    partition for all of them."""
+    indices = [p / 100 * (flat.size - 1) for p in percentiles]
+    kth = sorted({k for i in indices for k in (math.floor(i), math.ceil(i))})
+    partitioned = np.partition(flat, kth)
+
+    return (
+        _interpolate(partitioned, indices[0]),
+        _interpolate(partitioned, indices[1]),
+    )
+
+
+def _interpolate(partitioned: NDArray[np.floating[Any]], index: float) -> float:
+    """Value at the fractional `index` of the sorted values, which must be
+    in place at the floor and ceil of `index`."""
+    below = float(partitioned[math.floor(index)])
+    above = float(partitioned[math.ceil(index)])
+    return below + (above - below) * (index - math.floor(index))
+
+
+def _approx_percentiles(
+    flat: NDArray[np.floating[Any]],
+    percentiles: tuple[float, float],
+    tolerance: float,
+) -> tuple[float, float]:
+    """Percentiles estimated from a sample, whose error is verified by
+    counting the pixels below the estimates."""
+    # Fixed seed, so that the same image always gets the same colors
+    rng = np.random.default_rng(0)
+    sample = flat[rng.integers(0, flat.size, SAMPLE_SIZE)]
+    estimates = np.percentile(sample, percentiles)
+
+    lower, upper = float(estimates[0]), float(estimates[1])
+    lower_ok, upper_ok = (
+        _within_tolerance(flat, percentile, estimate, tolerance)
+        for percentile, estimate in zip(percentiles, (lower, upper))
+    )
+    if not (lower_ok and upper_ok):
+        exact_lower, exact_upper = _exact_percentiles(flat, percentiles)
+        lower = lower if lower_ok else exact_lower
+        upper = upper if upper_ok else exact_upper
+
+    return lower, upper
+
+
+def _within_tolerance(
+    flat: NDArray[np.floating[Any]],
+    percentile: float,
+    value: float,
+    tolerance: float,
+) -> bool:
+    """Check if `value` is the percentile of a percentile within `tolerance`
+    of `percentile`."""
+    index = percentile / 100 * (flat.size - 1)
+    below = int(np.count_nonzero(flat < value))
+    not_above = int(np.count_nonzero(flat <= value))
+
+    # The value is the exact percentile if it fills the neighbouring indices
+    if below <= math.floor(index) and math.ceil(index) < not_above:
+        return True
+
+    # Otherwise it lies between the sorted values at these indices
+    lowest, highest = max(below - 1, 0), min(not_above, flat.size - 1)
+    max_deviation = tolerance / 100 * (flat.size - 1)
+    return index - max_deviation <= lowest and highest <= index + max_deviation
@@ -1,17 +1,34 @@
-from pathlib import Path
 import os
+import queue
+import threading
+from collections.abc import Iterator
 from datetime import datetime
-from typing import Self, final, override
+from pathlib import Path
+from typing import Any, Self, final, override
 
 import cv2
+import numpy as np
+from numpy.typing import NDArray
 
 from proespm.config import Config
 from proespm.spm.mul import StmMul
+from proespm.spm.spm import level_images
 
 for k, v in os.environ.items():
     if k.startswith("QT_") and "cv2" in v:
         del os.environ[k]
 
+# Frames that may wait for encoding
+_QUEUED_FRAMES = 32
+# Rows at the top of a frame covered by its label
+_LABEL_ROWS = 30
+
+
+class Mp4WriterError(Exception):
+    def __init__(self, filename: str) -> None:
+        message = f"Cannot write {filename}, is the mp4v codec available?"
+        super().__init__(message)
+
 
 @final
 class StmFlm(StmMul):
@@ -33,47 +50,112 @@ class StmFlm(StmMul):
         )
         self.dimensions = self.mulimages[0].img_data.shape
 
-    def convert_to_mp4(self, fps: int = 10) -> None:
-        """
-        takes image-data(np-arrays) of all images in flm-file,
-        flips the matrices vertically(as scanning starts in lower left corner),
-        normalizes them from 0 to 255 and outputs them as mp4-file
+    def convert_to_mp4(self, fps: int = 10, downscale: int = 1) -> None:
+        """Write all frames to an mp4 file, each normalized from 0 to 255,
+        colored with the HOT colormap and labeled with the frame number, the
+        time since the start and the scan size.
+
+        Frames are colored while a background thread encodes the previous
+        ones, as encoding takes most of the time. The file is written under a
+        temporary name first, which is removed on any error, so a failed or
+        interrupted run never leaves a truncated movie behind.
+
+        Args:
+            fps: Frame rate of the movie.
+            downscale: Factor by which the frames are downscaled.
+
+        Raises:
+            Mp4WriterError: If the movie cannot be written, e.g. because the
+                mp4v codec is not available.
         """
+        os.makedirs(self.mp4_save_dir, exist_ok=True)
+        tmp_name = f"{self.mp4_name}.tmp.mp4"
         fourcc = cv2.VideoWriter_fourcc(*"mp4v")  # ty:ignore[unresolved-attribute]
+        video = cv2.VideoWriter(
+            tmp_name, fourcc, fps, self._mp4_frame_size(downscale)
+        )
+        if not video.isOpened():
+            raise Mp4WriterError(tmp_name)
 
-        if not os.path.exists(self.mp4_save_dir):
-            os.makedirs(self.mp4_save_dir)
+        frames: queue.Queue[NDArray[np.uint8] | None] = queue.Queue(
+            maxsize=_QUEUED_FRAMES
+        )
+        errors: list[Exception] = []
+
+        def encode() -> None:
+            while (frame := frames.get()) is not None:
+                if errors:
+                    continue  # Drain the queue, so the producer never blocks
+                try:
+                    video.write(frame)
+                except Exception as e:
+                    errors.append(e)
+
+        encoder = threading.Thread(target=encode, daemon=True)
+        encoder.start()
+        try:
+            try:
+                for frame in self._mp4_frames(downscale):
+                    frames.put(frame)
+            finally:
+                frames.put(None)
+                encoder.join()
+                video.release()
+
+            if errors:
+                raise errors[0]
+            os.replace(tmp_name, self.mp4_name)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def mp4_is_up_to_date(self, fps: int = 10, downscale: int = 1) -> bool:
+        """Check if the mp4 file is newer than the .flm file and contains all
+        frames with the given frame rate and size."""
+        if not os.path.exists(self.mp4_name) or os.path.getmtime(
+            self.mp4_name
+        ) < os.path.getmtime(self.fileinfo.filepath):
+            return False
+
+        capture = cv2.VideoCapture(self.mp4_name)
+        try:
+            size = (
+                int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            )
+            return (
+                abs(capture.get(cv2.CAP_PROP_FPS) - fps) < 1e-3
+                and size == self._mp4_frame_size(downscale)
+                and int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+                == len(self.mulimages)
+            )
+        finally:
+            capture.release()
 
-        video = cv2.VideoWriter(self.mp4_name, fourcc, fps, self.dimensions)
+    def _mp4_frame_size(self, downscale: int) -> tuple[int, int]:
+        """Width and height of the frames of the movie."""
+        height, width = self.dimensions
+        return width // downscale, height // downscale
 
+    def _mp4_frames(self, downscale: int) -> Iterator[NDArray[np.uint8]]:
+        """Colored and labeled frames of the movie."""
+        size = self._mp4_frame_size(downscale)
         scan_duration = 0
-        for frame, img in enumerate(self.mulimages):
+        for frame_num, img in enumerate(self.mulimages):
+            arr = img.img_data.arr  # ty:ignore[unresolved-attribute]
+            if downscale > 1:
+                arr = cv2.resize(arr, size, interpolation=cv2.INTER_AREA)
             img_norm = cv2.normalize(
-                img.img_data.arr,  # ty:ignore[unresolved-attribute]
-                None,
-                255,
-                0,
-                norm_type=cv2.NORM_MINMAX,
-                dtype=cv2.CV_8U,
+                arr, None, 255, 0, norm_type=cv2.NORM_MINMAX, dtype=cv2.CV_8U
             )  # ty:ignore[no-matching-overload]
-            img_color = cv2.applyColorMap(img_norm, cv2.COLORMAP_HOT)
+            frame = cv2.applyColorMap(img_norm, cv2.COLORMAP_HOT)
 
-            overlay = img_color.copy()
             scan_duration += img.speed
-            size = f"{img.xsize:.0f}nm x {img.ysize:.0f}nm"
-            cv2.putText(
-                overlay,
-                f"{frame}, {scan_duration:.2f} s, {size}",
-                (10, 20),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.4,
-                (255, 255, 255, 0.1),
-                1,
+            scan_size = f"{img.xsize:.0f}nm x {img.ysize:.0f}nm"
+            _draw_label(
+                frame, f"{frame_num}, {scan_duration:.2f} s, {scan_size}"
             )
-            cv2.addWeighted(overlay, 0.5, img_color, 0.5, 0, img_color)
-            video.write(img_color)
-
-        video.release()
+            yield frame
 
     @override
     def m_id(self) -> str:
@@ -85,12 +167,46 @@ class StmFlm(StmMul):
 
     @override
     def process(self, config: Config) -> Self:
-        for mul_image in self.mulimages:
-            mul_image.img_data.corr_plane().corr_lines_median()  # ty:ignore[unresolved-attribute]
+        if self.mp4_is_up_to_date(config.mp4_fps, config.mp4_downscale):
+            return self
 
-        self.convert_to_mp4()
+        level_images(
+            [mul_image.img_data for mul_image in self.mulimages],  # ty:ignore[invalid-argument-type]
+            config,
+        )
+        self.convert_to_mp4(config.mp4_fps, config.mp4_downscale)
         return self
 
     @override
     def template_name(self) -> None:
         return None
+
+    @override
+    def slides(self) -> list[Any]:
+        return []
+
+    @override
+    def render_artifacts(self) -> dict[str, Any]:
+        return {}
+
+    @override
+    def load_render_artifacts(self, artifacts: dict[str, Any]) -> None:
+        pass
+
+
+def _draw_label(frame: NDArray[np.uint8], text: str) -> None:
+    """Blend white `text` at 50 % opacity into the top left of `frame`.
+
+    Only the rows of the text are blended, instead of the whole frame."""
+    strip = frame[:_LABEL_ROWS]
+    overlay = strip.copy()
+    _ = cv2.putText(
+        overlay,
+        text,
+        (10, 20),
+        cv2.FONT_HERSHEY_SIMPLEX,
+        0.4,
+        (255, 255, 255, 0.1),
+        1,
+    )
+    _ = cv2.addWeighted(overlay, 0.5, strip, 0.5, 0, strip)
@@ -1,16 +1,35 @@
 import os
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Self, final, override
+from typing import Any, Self, final, override
 
 import access2thematrix
 import numpy as np
+from numpy.typing import NDArray
 
+from proespm.assets import asset_name
 from proespm.config import Config
 from proespm.fileinfo import Fileinfo
 from proespm.measurement import Measurement
 from proespm.spm.spm import SpmImage
 
+# Identifier at the start of all Matrix files
+MTRX_FILE_ID = b"ONTMATRX0101"
+
+# Attributes set from experiment element parameters with their factor
+EXPERIMENT_PARAMS = {
+    "GapVoltageControl.Voltage": ("bias", 1.0),  # in V
+    "Regulator.Loop_Gain_1_I": ("i_gain", 1.0),  # in %
+    "Regulator.Loop_Gain_1_P": ("p_gain", 1.0),  # in %
+    "XYScanner.Raster_Time": ("raster_time", 1.0),  # in s per pixel
+    "XYScanner.X_Drift": ("xdrift", 1e9),  # in nm/s
+    "XYScanner.Y_Drift": ("ydrift", 1e9),  # in nm/s
+    "XYScanner.X_Offset": ("xoffset", 1e9),  # in nm
+    "XYScanner.Y_Offset": ("yoffset", 1e9),  # in nm
+}
+
 
 class NoTracesError(Exception):
     def __init__(self, filename: str) -> None:
@@ -18,6 +37,12 @@ class NoTracesError(Exception):
         super().__init__(message)
 
 
+class NoParamFileError(Exception):
+    def __init__(self, filename: str) -> None:
+        message = f"{filename} has no parameter file `<chain>_0001.mtrx`"
+        super().__init__(message)
+
+
 @final
 class StmMatrix(Measurement):
     """Class for handling Omicron .Z_mtrx files
@@ -27,67 +52,47 @@ class StmMatrix(Measurement):
     """
 
     measurement_family = "SPM"
+    render_attrs = ("img_data_fw.data_uri", "img_data_bw.data_uri")
+    data_attrs = ("img_data_fw.arr", "img_data_bw.arr")
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
         self.slide_num: int | None = None
 
-        mtrx_data = access2thematrix.MtrxData()
-
-        self.traces, _ = mtrx_data.open(str(filepath))
-        if self.traces == {}:
-            raise NoTracesError(self.fileinfo.filename)
-
-        img_fw = mtrx_data.select_image(self.traces[0])[0]
-        img_bw = mtrx_data.select_image(self.traces[1])[0]
-
-        self.creation_comment = mtrx_data.creation_comment
-        self.data_set_name = mtrx_data.data_set_name
-        self.sample_name = mtrx_data.sample_name
-
-        self.yres, self.xres = img_fw.data.shape
-        self.xsize = img_fw.width * 1e9  # in nm
-        self.ysize = img_fw.height * 1e9  # in nm
-        self.rotation = img_fw.angle  # in deg
-
-        meta = mtrx_data.get_experiment_element_parameters()[1]
-        for param in meta.split("\n"):
-            # print(f"{param=}")
-            if param.startswith("Regulator.Setpoint_1"):
-                self.current = float(param.split()[1]) * 1e9  # in nA
-                if param.split()[2] == "Ampere":
-                    self.op_mode = "STM"
-                else:
-                    self.op_mode = "AFM"
-            elif param.startswith("GapVoltageControl.Voltage "):
-                self.bias = float(param.split()[1])  # in V
-            elif param.startswith("Regulator.Loop_Gain_1_I "):
-                self.i_gain = float(param.split()[1])  # in %
-            elif param.startswith("Regulator.Loop_Gain_1_P "):
-                self.p_gain = float(param.split()[1])  # in %
-            elif param.startswith("XYScanner.Raster_Time "):
-                # in seconds, per pixel?
-                self.raster_time = float(param.split()[1])
-            elif param.startswith("XYScanner.X_Drift"):
-                self.xdrift = float(param.split()[1]) * 1e9  # in nm/s
-            elif param.startswith("XYScanner.Y_Drift"):
-                self.ydrift = float(param.split()[1]) * 1e9  # in nm/s
-            elif param.startswith("XYScanner.X_Offset"):
-                self.xoffset = float(param.split()[1]) * 1e9  # in nm
-            elif param.startswith("XYScanner.Y_Offset"):
-                self.yoffset = float(param.split()[1]) * 1e9  # in nm
-            elif param.startswith("XYScanner.Enable_Drift_Compensation"):
-                self.is_drift_compensation_enabled = param.split()[1]
-            elif param.startswith("XYScanner.Y_Retrace "):
-                self.retrace = param.split()[1]
+        param_files = _param_files(filepath)
+        if not param_files:
+            raise NoParamFileError(filepath.name)
+        # Shared by all images of the experiment, parsed only once
+        params = _read_experiment(param_files).params_of(filepath.name)
+
+        fw_data, bw_data, ysize = _read_traces(filepath, params)
+
+        self.creation_comment = params.get("MARK::MTRX.CREATION_COMMENT", "")
+        self.data_set_name = params.get("MARK::MTRX.DATA_SET_NAME", "")
+        self.sample_name = params.get("MARK::MTRX.SAMPLE_NAME", "")
+
+        self.yres, self.xres = fw_data.shape
+        self.xsize = params["EEPA::XYScanner.Width"][0] * 1e9  # in nm
+        self.ysize = ysize * 1e9  # in nm
+        self.rotation = params["EEPA::XYScanner.Angle"][0]  # in deg
+
+        setpoint, setpoint_unit = params["EEPA::Regulator.Setpoint_1"]
+        self.current = setpoint * 1e9  # in nA
+        self.op_mode = "STM" if setpoint_unit == "Ampere" else "AFM"
+        for key, (attr, factor) in EXPERIMENT_PARAMS.items():
+            setattr(self, attr, params[f"EEPA::{key}"][0] * factor)
+        self.is_drift_compensation_enabled = str(
+            params["EEPA::XYScanner.Enable_Drift_Compensation"][0]
+        )
+        self.retrace = str(params["EEPA::XYScanner.Y_Retrace"][0])
 
         self.line_time = self.raster_time * self.xres * 1e3  # in ms
         self.scan_duration = self.line_time * self.yres / 1e3  # in s
 
-        row_fw = np.flip(img_fw.data, axis=0) * 1e9
-        row_bw = np.flip(img_bw.data, axis=0) * 1e9
-        self.img_data_fw = SpmImage(row_fw, self.xsize)
-        self.img_data_bw = SpmImage(row_bw, self.xsize)
+        row_fw = np.flip(fw_data, axis=0)
+        row_bw = np.flip(bw_data, axis=0)
+        self.img_data_fw = SpmImage(row_fw, self.xsize, scale=1e9)
+        self.img_data_bw = SpmImage(row_bw, self.xsize, scale=1e9)
 
     @override
     def m_id(self) -> str:
@@ -100,21 +105,189 @@ class StmMatrix(Measurement):
     @override
     def process(self, config: Config) -> Self:
         _ = (
-            self.img_data_fw.corr_plane()
-            .corr_lines_median()
-            .corr_plane()
-            .corr_lines_median()
-            .plot(config.colormap, config.colorrange)
+            self.img_data_fw.prepare(config)
+            .level()
+            .plot(config, asset_name(self.fileinfo.filepath, "_fw"))
         )
         _ = (
-            self.img_data_bw.corr_plane()
-            .corr_lines_median()
-            .corr_plane()
-            .corr_lines_median()
-            .plot(config.colormap, config.colorrange)
+            self.img_data_bw.prepare(config)
+            .level()
+            .plot(config, asset_name(self.fileinfo.filepath, "_bw"))
         )
         return self
 
     @override
     def template_name(self) -> str:
         return "mtrx.j2"
+
+    @override
+    def slides(self) -> list[Any]:
+        return [self]
+
+    @override
+    def source_files(self) -> list[Path]:
+        # Experiment parameters are stored in `<chain>_0001.mtrx`, ...
+        filepath = self.fileinfo.filepath
+        chain = filepath.name[: filepath.name.rfind("--")]
+        return [filepath, *sorted(filepath.parent.glob(f"{chain}_*.mtrx"))]
+
+
+@dataclass
+class _Experiment:
+    """Experiment element parameters of a Matrix experiment.
+
+    Args:
+        params: Parameters at the time each data file was recorded, by the
+            name of the data file.
+        final_params: Parameters at the end of the experiment.
+    """
+
+    params: dict[str, dict[str, Any]]
+    final_params: dict[str, Any]
+
+    def params_of(self, filename: str) -> dict[str, Any]:
+        """Parameters at the time the data file `filename` was recorded."""
+        return self.params.get(filename, self.final_params)
+
+
+def _param_files(filepath: Path) -> tuple[Path, ...]:
+    """Files with the experiment parameters of the data file at `filepath`,
+    `<chain>_0001.mtrx`, `<chain>_0002.mtrx`, ..."""
+    chain = filepath.name[: filepath.name.rfind("--")]
+    files: list[Path] = []
+    while (
+        path := filepath.with_name(f"{chain}_{len(files) + 1:04d}.mtrx")
+    ).exists():
+        files.append(path)
+
+    return tuple(files)
+
+
+def _read_experiment(param_files: tuple[Path, ...]) -> _Experiment:
+    """Experiment element parameters from the `param_files`, cached until
+    one of them is modified."""
+    signature = tuple(
+        (path.stat().st_mtime_ns, path.stat().st_size) for path in param_files
+    )
+    return _parse_experiment(param_files, signature)
+
+
+@lru_cache(maxsize=16)
+def _parse_experiment(
+    param_files: tuple[Path, ...], signature: tuple[tuple[int, int], ...]
+) -> _Experiment:
+    """Parse the parameter files in a single pass, recording the state of
+    the parameters whenever a new data file is referenced.
+
+    `signature` is only part of the cache key.
+    """
+    raw_param = b""
+    for i, path in enumerate(param_files):
+        content = path.read_bytes()
+        raw_param += content if i == 0 else content[len(MTRX_FILE_ID) :]
+    if not raw_param.startswith(MTRX_FILE_ID):
+        raise ValueError(f"{param_files[0]} is no Matrix parameter file")
+
+    # The parser of access2thematrix keeps the current state in `param`
+    mtrx_data = access2thematrix.MtrxData()
+    params: dict[str, dict[str, Any]] = {}
+    position = len(MTRX_FILE_ID)
+    while position < len(raw_param):
+        # Private method, the version of access2thematrix is pinned for it
+        position = mtrx_data._scan_raw_param(position, raw_param)
+        data_file = mtrx_data.param["BREF"]
+        if data_file and data_file not in params:
+            params[data_file] = dict(mtrx_data.param)
+
+    return _Experiment(params, dict(mtrx_data.param))
+
+
+def _read_raw_data(filepath: Path) -> NDArray[np.int32]:
+    """Raw data points of the data file at `filepath`."""
+    content = filepath.read_bytes()
+    if not content.startswith(MTRX_FILE_ID):
+        raise NoTracesError(filepath.name)
+
+    count = 0
+    position = len(MTRX_FILE_ID)
+    while position + 8 <= len(content):
+        block_id = content[position : position + 4]
+        size = int.from_bytes(content[position + 4 : position + 8], "little")
+        position += 8
+        if block_id == b"TLKB":
+            # Timestamp and a reserved field, followed by the nested blocks
+            position += 12
+        elif block_id == b"CSED":
+            count = int.from_bytes(
+                content[position + 20 : position + 24], "little", signed=True
+            )
+            position += size
+        elif block_id == b"ATAD":
+            return np.frombuffer(content, "<i4", count=count, offset=position)
+        else:
+            # Followed by a timestamp
+            position += size + 8
+
+    raise NoTracesError(filepath.name)
+
+
+def _transfer(
+    data: NDArray[np.int32], params: dict[str, Any], channel_name: str
+) -> NDArray[np.float64]:
+    """Physical values of the raw `data` of the channel `channel_name`."""
+    key = max(
+        int(k[6:])
+        for k, v in params.items()
+        if k.startswith("DICT::") and v[0] == channel_name
+    )
+    name, _, p = params[f"XFER::{key}"]
+    if name == "TFF_Linear1D":
+        return (data - p["Offset"]) / p["Factor"]
+    if name == "TFF_MultiLinear1D":
+        return (
+            (p["Raw_1"] - p["PreOffset"])
+            * (data - p["Offset"])
+            / (p["NeutralFactor"] * p["PreFactor"])
+        )
+
+    return data.astype(np.float64)
+
+
+def _read_traces(
+    filepath: Path, params: dict[str, Any]
+) -> tuple[NDArray[np.float64], NDArray[np.float64], float]:
+    """The first two traces of the image, `forward/up` and `backward/up`
+    (or `forward/down` without retrace in x-direction), and the height of
+    the image in m.
+
+    Only these traces are computed. They equal the images that
+    `access2thematrix.MtrxData.select_image` returns for them.
+    """
+    # e.g. `Z` for `20201111--4_1.Z_mtrx`
+    last_part = filepath.name[filepath.name.rfind("--") + 2 :]
+    channel_name = last_part[last_part.index(".") + 1 : last_part.rindex("_")]
+
+    x_retrace = bool(params["EEPA::XYScanner.X_Retrace"][0])
+    y_retrace = bool(params["EEPA::XYScanner.Y_Retrace"][0])
+    xres = params["EEPA::XYScanner.Points"][0]
+    lines = params["EEPA::XYScanner.Lines"][0]
+
+    data = _read_raw_data(filepath)
+    points_per_line = xres * (1 + x_retrace)
+    # Recorded lines, including those scanned downwards
+    recorded_lines = data.size // points_per_line
+    yres = min(lines, recorded_lines)
+    if yres < 2 or xres < 2 or not (x_retrace or y_retrace):
+        raise NoTracesError(filepath.name)
+
+    z = _transfer(
+        data[: points_per_line * recorded_lines], params, channel_name
+    ).reshape(-1, xres)
+    height = params["EEPA::XYScanner.Height"][0] * yres / lines
+
+    if x_retrace:
+        return z[: 2 * yres : 2], z[1 : 2 * yres : 2, ::-1], height
+    if recorded_lines <= lines:
+        raise NoTracesError(filepath.name)
+
+    return z[:yres], z[yres:][::-1], height
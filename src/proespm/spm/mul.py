@@ -1,15 +1,16 @@
 from pathlib import Path
 from datetime import datetime
-from typing import Self, override
+from typing import Any, Self, override
 
 import mulfile
 from mulfile.mul import Mul
 import numpy as np
 
+from proespm.assets import asset_name
 from proespm.fileinfo import Fileinfo
 from proespm.config import Config
 from proespm.measurement import Measurement
-from proespm.spm.spm import SpmImage
+from proespm.spm.spm import SpmImage, level_images
 
 
 class StmMul(Measurement):
@@ -46,13 +47,14 @@ class StmMul(Measurement):
 
     @override
     def process(self, config: Config) -> Self:
+        level_images(
+            [mul_image.img_data for mul_image in self.mulimages],  # ty:ignore[invalid-argument-type]
+            config,
+        )
         for mul_image in self.mulimages:
-            (
-                mul_image.img_data.corr_plane()  # ty:ignore[unresolved-attribute]
-                .corr_lines_median()
-                .corr_plane()
-                .corr_lines_median()
-                .plot(config.colormap, config.colorrange)
+            _ = mul_image.img_data.plot(  # ty:ignore[unresolved-attribute]
+                config,
+                asset_name(self.fileinfo.filepath, f"_{mul_image.m_id}"),  # ty:ignore[unresolved-attribute]
             )
 
         return self
@@ -60,3 +62,33 @@ class StmMul(Measurement):
     @override
     def template_name(self) -> str | None:
         return "mul.j2"
+
+    @override
+    def slides(self) -> list[Any]:
+        return self.mulimages
+
+    @override
+    def render_artifacts(self) -> dict[str, Any]:
+        return {
+            "data_uris": [
+                mul_image.img_data.data_uri  # ty:ignore[unresolved-attribute]
+                for mul_image in self.mulimages
+            ]
+        }
+
+    @override
+    def load_render_artifacts(self, artifacts: dict[str, Any]) -> None:
+        for mul_image, data_uri in zip(
+            self.mulimages, artifacts["data_uris"], strict=True
+        ):
+            mul_image.img_data.data_uri = data_uri  # ty:ignore[unresolved-attribute]
+
+    @override
+    def release_render_artifacts(self) -> None:
+        for mul_image in self.mulimages:
+            mul_image.img_data.data_uri = None  # ty:ignore[unresolved-attribute]
+
+    @override
+    def release_data(self) -> None:
+        for mul_image in self.mulimages:
+            mul_image.img_data.arr = None  # ty:ignore[unresolved-attribute]
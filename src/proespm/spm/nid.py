@@ -1,11 +1,15 @@
+import os
 import re
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Self, final, override
+from typing import Any, Self, final, override
 
 import numpy as np
 from dateutil import parser
+from numpy.typing import NDArray
 
+from proespm.assets import asset_name
 from proespm.config import Config
 from proespm.fileinfo import Fileinfo
 from proespm.measurement import Measurement
@@ -14,19 +18,57 @@ from proespm.spm.spm import SpmImage
 FLOAT_REGEX = re.compile(r"[+-]?([0-9]*[.])?[0-9]+")
 UNITS_REGEX = re.compile(r"[a-zA-Zµ°]+")
 
+# End of the text header, followed by the binary data
+HEADER_END = b"#!"
+_HEADER_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class NidChannel:
+    """A channel in the binary data of a .nid file.
+
+    Args:
+        index: Position of the channel in the binary data.
+        name: Measured quantity, e.g. `"Z-Axis"` or `"Amplitude"`.
+        frame: Scan direction, e.g. `"Scan forward"`.
+        unit: Unit of the data values.
+        xres: Number of points per line.
+        yres: Number of lines.
+        save_bits: Bits per value, 16 or 32.
+    """
+
+    index: int
+    name: str
+    frame: str
+    unit: str
+    xres: int
+    yres: int
+    save_bits: int
+
+    @classmethod
+    def from_meta(cls, index: int, meta: dict[str, str]):
+        return cls(
+            index=index,
+            name=meta["Dim2Name"],
+            frame=meta["Frame"],
+            unit=meta["Dim2Unit"],
+            xres=int(meta["Points"]),
+            yres=int(meta["Lines"]),
+            save_bits=int(meta["SaveBits"]),
+        )
+
 
 @final
 class SpmNid(Measurement):
     measurement_family = "SPM"
+    render_attrs = ("img_data_fw.data_uri", "img_data_bw.data_uri")
+    data_attrs = ("img_data_fw.arr", "img_data_bw.arr")
 
     def __init__(self, filepath: Path):
         self.fileinfo = Fileinfo(filepath)
         self.slide_num: int | None = None
 
-        with open(filepath, "rb") as f:
-            content = f.read()
-
-        content_list = content.split(b"\r\n\r\n")
+        content_list = _read_header(filepath).split(b"\r\n\r\n")
         header = _get_header(content_list)
 
         file_meta = _get_file_meta(content_list)
@@ -80,50 +122,68 @@ class SpmNid(Measurement):
 
         channels = get_channels(header)
         channel_meta_list = _get_channels_meta(content_list, channels)
-        self.xres = int(channel_meta_list[0]["Points"])
-        self.yres = int(channel_meta_list[0]["Lines"])
-
-        # `Z-Axis` for topo AFM/STM, `Tip Current` for current STM, `Amplitude` for AFM
-        # scantype = channel_meta_list[0]["Dim2Name"]
-        save_bits = int(channel_meta_list[0]["SaveBits"])
-        datatype = np.int16 if save_bits == 16 else np.int32
-
-        for channel in channel_meta_list:
-            assert self.xres == int(channel["Points"])
-            assert self.yres == int(channel["Lines"])
-
-        num_channels = len(channel_meta_list)
+        self.channels = [
+            NidChannel.from_meta(i, meta)
+            for i, meta in enumerate(channel_meta_list)
+        ]
+        self.xres = self.channels[0].xres
+        self.yres = self.channels[0].yres
+        self._save_bits = self.channels[0].save_bits
+
+        for channel in self.channels:
+            assert self.xres == channel.xres
+            assert self.yres == channel.yres
+            assert self._save_bits == channel.save_bits
+
+        # The binary data of all channels is at the end of the file
         bytes_to_read = (
-            int(self.xres * self.yres * save_bits / 8) * num_channels
+            self.xres * self.yres * self._save_bits // 8 * len(self.channels)
         )
-        img_data_start = len(content) - bytes_to_read
-        img_data = np.frombuffer(content[img_data_start:], dtype=datatype)
-        img_data_list = np.array_split(img_data, num_channels)
-
-        fw_idx = None
-        bw_idx = None
-        for i, ch in enumerate(channel_meta_list):
-            if ch["Dim2Name"] in ["Z-Axis", "Topography"]:
-                if ch["Frame"] == "Scan forward":
-                    fw_idx = i
-                elif ch["Frame"] == "Scan backward":
-                    bw_idx = i
-
-        assert fw_idx is not None
-        assert bw_idx is not None
-        img_data_fw = (
-            img_data_list[fw_idx]
-            .reshape(self.yres, self.xres)
-            .astype(np.float64)
+        self._data_offset = os.path.getsize(filepath) - bytes_to_read
+
+        # `Z-Axis` for topo AFM/STM, `Tip Current` for current STM, `Amplitude` for AFM
+        fw_channel = self.find_channel(("Z-Axis", "Topography"), "Scan forward")
+        bw_channel = self.find_channel(
+            ("Z-Axis", "Topography"), "Scan backward"
         )
-        img_data_bw = (
-            img_data_list[bw_idx]
-            .reshape(self.yres, self.xres)
-            .astype(np.float64)
+        assert fw_channel is not None
+        assert bw_channel is not None
+        # Converted to floating point in `process`
+        img_data_fw, img_data_bw = self.read_channels([fw_channel, bw_channel])
+
+        self.img_data_fw = SpmImage(img_data_fw, self.xsize)
+        self.img_data_bw = SpmImage(img_data_bw, self.xsize)
+
+    def find_channel(
+        self, names: tuple[str, ...], frame: str
+    ) -> NidChannel | None:
+        """Last channel with one of the `names` in the scan direction
+        `frame`, None if there is none."""
+        for channel in reversed(self.channels):
+            if channel.name in names and channel.frame == frame:
+                return channel
+
+        return None
+
+    def read_channels(
+        self, channels: list[NidChannel]
+    ) -> list[NDArray[np.integer[Any]]]:
+        """Raw data of the `channels`, e.g. from `self.channels`, flipped so
+        that the first line is at the bottom.
+
+        Only the data of the requested channels is read from the memory
+        mapped file.
+        """
+        datatype = np.dtype("<i2" if self._save_bits == 16 else "<i4")
+        data = np.memmap(
+            self.fileinfo.filepath,
+            dtype=datatype,
+            mode="r",
+            offset=self._data_offset,
+            shape=(len(self.channels), self.yres, self.xres),
         )
-
-        self.img_data_fw = SpmImage(np.flip(img_data_fw, axis=0), self.xsize)
-        self.img_data_bw = SpmImage(np.flip(img_data_bw, axis=0), self.xsize)
+        # Copied, so the file is not kept open
+        return [np.flip(data[ch.index], axis=0).copy() for ch in channels]
 
     @override
     def m_id(self) -> str:
@@ -136,18 +196,14 @@ class SpmNid(Measurement):
     @override
     def process(self, config: Config) -> Self:
         _ = (
-            self.img_data_fw.corr_plane()
-            .corr_lines_median()
-            .corr_plane()
-            .corr_lines_median()
-            .plot(config.colormap, config.colorrange)
+            self.img_data_fw.prepare(config)
+            .level()
+            .plot(config, asset_name(self.fileinfo.filepath, "_fw"))
         )
         _ = (
-            self.img_data_bw.corr_plane()
-            .corr_lines_median()
-            .corr_plane()
-            .corr_lines_median()
-            .plot(config.colormap, config.colorrange)
+            self.img_data_bw.prepare(config)
+            .level()
+            .plot(config, asset_name(self.fileinfo.filepath, "_bw"))
         )
 
         return self
@@ -156,6 +212,26 @@ class SpmNid(Measurement):
     def template_name(self) -> str:
         return "nid.j2"
 
+    @override
+    def slides(self) -> list[Any]:
+        return [self]
+
+
+def _read_header(filepath: Path) -> bytes:
+    """Text header at the beginning of the file, without reading the binary
+    data."""
+    header = b""
+    with open(filepath, "rb") as f:
+        while chunk := f.read(_HEADER_CHUNK_SIZE):
+            # The end marker may be split between two chunks
+            start = max(len(header) - len(HEADER_END) + 1, 0)
+            header += chunk
+            end = header.find(HEADER_END, start)
+            if end != -1:
+                return header[:end]
+
+    return header
+
 
 def _get_header(content_list: list[bytes]) -> list[bytes]:
     return content_list[0].split(b"\r\n")
@@ -0,0 +1,142 @@
+import bisect
+import io
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+from PIL import Image, ImageDraw, ImageFont
+
+# Geometry of the images created by `SpmImage.plot` with matplotlib
+CANVAS_SIZE = 470
+AREA_SIZE = 468  # inside the 1 px frame
+SCALEBAR_LENGTH_FRACTION = 0.25
+SCALEBAR_WIDTH_FRACTION = 0.01
+SCALEBAR_RIGHT_PAD = 3  # px
+LABEL_BOTTOM_PAD = 6  # px, from the lower edge of the image to the baseline
+LABEL_BAR_SEP = 22  # px, from the baseline to the top of the bar
+FONT_SIZE = 14  # px, 10 pt at 100 dpi
+
+# Same choice of scalebar lengths as `matplotlib_scalebar`
+_PREFERRED_VALUES = (
+    1, 2, 5, 10, 15, 20, 25, 50, 75, 100, 125, 150, 200, 500, 750
+)  # fmt: skip
+_LENGTH_UNITS = (("pm", 1e-3), ("nm", 1.0), ("µm", 1e3), ("mm", 1e6))
+
+
+@cache
+def colormap_lut(colormap: str) -> NDArray[np.uint8]:
+    """256 RGB colors of a matplotlib colormap."""
+    from matplotlib import colormaps
+
+    rgba = colormaps[colormap](np.linspace(0.0, 1.0, 256))
+    return np.round(rgba[:, :3] * 255).astype(np.uint8)
+
+
+@cache
+def _font() -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    """DejaVu Sans as used by matplotlib, Pillow's default font if it is not
+    available."""
+    from matplotlib import get_data_path
+
+    font_path = Path(get_data_path()) / "fonts" / "ttf" / "DejaVuSans.ttf"
+    try:
+        return ImageFont.truetype(str(font_path), FONT_SIZE)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def scalebar_length(width: float) -> tuple[float, str]:
+    """Length of the scalebar in nm and its label for an image that is
+    `width` nm wide."""
+    value = width * SCALEBAR_LENGTH_FRACTION
+    unit, factor = _LENGTH_UNITS[0]
+    for candidate in _LENGTH_UNITS:
+        if value >= candidate[1]:
+            unit, factor = candidate
+
+    index = max(bisect.bisect_left(_PREFERRED_VALUES, value / factor) - 1, 0)
+    preferred = _PREFERRED_VALUES[index]
+
+    return preferred * factor, f"{preferred} {unit}"
+
+
+def render_png(
+    arr: NDArray[np.floating[Any]],
+    xsize: float,
+    colormap: str,
+    vmin: float,
+    vmax: float,
+) -> bytes:
+    """Render `arr` with a scalebar as PNG, looking like the matplotlib
+    figure of `SpmImage.plot`.
+
+    The colormap is applied with a lookup table, the image is scaled with
+    Pillow and the scalebar is drawn directly into the pixel buffer.
+    Non-finite pixels get the lowest color.
+
+    Args:
+        arr: Pixel data of the image.
+        xsize: Physical size of the image in x-direction in nm.
+        colormap: Name of a matplotlib colormap.
+        vmin: Value mapped to the lowest color.
+        vmax: Value mapped to the highest color.
+
+    Returns:
+        The encoded PNG.
+    """
+    yres, xres = arr.shape
+    scale = 255 / (vmax - vmin) if vmax > vmin else 0.0
+    indices = np.empty(arr.shape, dtype=np.float32)
+    _ = np.subtract(arr, vmin, out=indices, casting="unsafe")
+    _ = np.multiply(indices, scale, out=indices)
+    # Casting NaN to an integer is undefined, the lowest color is used
+    _ = np.nan_to_num(indices, copy=False, nan=0.0, posinf=0.0, neginf=0.0)
+    _ = np.clip(indices, 0, 255, out=indices)
+    rgb = colormap_lut(colormap)[indices.astype(np.uint8)]
+
+    # Fit into the plot area, keeping the aspect ratio of the pixels
+    if xres >= yres:
+        width, height = AREA_SIZE, max(round(AREA_SIZE * yres / xres), 1)
+    else:
+        width, height = max(round(AREA_SIZE * xres / yres), 1), AREA_SIZE
+    # matplotlib only smoothes when downsampling or upsampling moderately
+    resample = (
+        Image.Resampling.NEAREST
+        if width >= 3 * xres
+        else Image.Resampling.HAMMING
+    )
+    image = Image.fromarray(rgb, "RGB").resize((width, height), resample)
+
+    canvas = Image.new("RGB", (CANVAS_SIZE, CANVAS_SIZE), "white")
+    left = (CANVAS_SIZE - width) // 2
+    top = (CANVAS_SIZE - height) // 2
+    canvas.paste(image, (left, top))
+    draw = ImageDraw.Draw(canvas)
+    _ = draw.rectangle(
+        (left - 1, top - 1, left + width, top + height), outline="black"
+    )
+
+    length, label = scalebar_length(xsize)
+    bar_width = round(length / xsize * width)
+    bar_height = max(round(height * SCALEBAR_WIDTH_FRACTION), 1)
+    bar_right = left + width - SCALEBAR_RIGHT_PAD
+    baseline = top + height - LABEL_BOTTOM_PAD
+    bar_top = baseline - LABEL_BAR_SEP
+    bar_bottom = bar_top + bar_height - 1
+    _ = draw.rectangle(
+        (bar_right - bar_width, bar_top, bar_right - 1, bar_bottom),
+        fill="white",
+    )
+    draw.text(
+        (bar_right - bar_width / 2, baseline),
+        label,
+        fill="white",
+        font=_font(),
+        anchor="ms",
+    )
+
+    png_bytes = io.BytesIO()
+    canvas.save(png_bytes, format="PNG")
+    return png_bytes.getvalue()
@@ -1,12 +1,25 @@
+from dataclasses import dataclass
 from pathlib import Path
 from datetime import datetime
-from typing import Self, final, override
+from typing import Any, Self, final, override
 
 import numpy as np
 from bokeh.embed import components
 from numpy.typing import NDArray
-from sm4file import Sm4
+from sm4file import Sm4Channel
+from sm4file.cursor import Cursor
+from sm4file.sm4_file import (
+    RhkObjectType,
+    RhkPageDataType,
+    RhkPageType,
+    Sm4FileHeader,
+    Sm4Page,
+    Sm4PageHeaderDefault,
+    Sm4PageIndexHeader,
+)
+from sm4file.sm4_object_types import StringData
 
+from proespm.assets import asset_name
 from proespm.config import Config
 from proespm.ec.ec import EcPlot
 from proespm.fileinfo import Fileinfo
@@ -14,6 +27,87 @@ from proespm.measurement import Measurement
 from proespm.spm.spm import SpmImage
 
 
+@dataclass
+class Sm4PageInfo:
+    """Header and label of a page of an .sm4 file, whose data is only read
+    when needed.
+
+    Args:
+        label: Label of the page, e.g. `"Topography"`.
+        data_type: Type of the data, e.g. image or line.
+        header: Header of the page.
+        strings: String data of the page with label, date and time, None if
+            it has none.
+        data_offset: Offset of the data in the file.
+        data_size: Size of the data in bytes.
+    """
+
+    label: str
+    data_type: RhkPageDataType
+    header: Sm4PageHeaderDefault
+    strings: StringData | None
+    data_offset: int
+    data_size: int
+
+    def read_data(self, filepath: Path) -> NDArray[np.float64]:
+        """Data of the page, arranged like in `sm4file.Sm4`."""
+        with open(filepath, "rb") as f:
+            _ = f.seek(self.data_offset)
+            raw_data = np.frombuffer(f.read(self.data_size), dtype="<i4")
+
+        header = self.header
+        data = raw_data * header.z_scale + header.z_offset
+        data = data.reshape(header.y_size, header.x_size)
+
+        if self.data_type == RhkPageDataType.RHK_DATA_IMAGE:
+            if header.x_scale < 0:
+                data = np.flip(data, axis=1)
+            if header.y_scale > 0:
+                data = np.flip(data, axis=0)
+        elif self.data_type == RhkPageDataType.RHK_DATA_LINE:
+            x_values = np.arange(header.x_size) * header.x_scale
+            data = np.column_stack((x_values + header.x_offset, data.T))
+
+        return data
+
+    def to_channel(self, filepath: Path) -> Sm4Channel:
+        """`sm4file.Sm4Channel` of the page with its data."""
+        header = self.header
+        if self.strings is not None:
+            month, day, year = (int(x) for x in self.strings.date.split("/"))
+            hour, minute, second = (
+                int(x) for x in self.strings.time.split(":")
+            )
+            ch_datetime = datetime(
+                2000 + year, month, day, hour, minute, second
+            )
+        else:
+            ch_datetime = datetime.fromtimestamp(filepath.stat().st_ctime)
+
+        return Sm4Channel(
+            label=self.label,
+            page_type=header.page_type,
+            line_type=header.line_type,
+            datetime=ch_datetime,
+            xres=header.x_size,
+            yres=header.y_size,
+            image_type=header.image_type,
+            scan_type=header.scan_type,
+            scan_direction=header.scan_type.direction(),
+            xsize=abs(header.x_scale * header.x_size),
+            ysize=abs(header.y_scale * header.y_size),
+            z_scale=header.z_scale,
+            x_offset=header.x_offset,
+            y_offset=header.y_offset,
+            z_offset=header.z_offset,
+            period=header.period,
+            bias=header.bias,
+            current=header.current,
+            angle=header.angle,
+            data=self.read_data(filepath),  # ty:ignore[invalid-argument-type]
+        )
+
+
 @final
 class StmSm4(Measurement):
     """Class for handling RHK SM4 files
@@ -23,19 +117,31 @@ class StmSm4(Measurement):
     """
 
     measurement_family = "SPM"
+    render_attrs = ("img_data_fw.data_uri", "img_data_bw.data_uri")
+    data_attrs = (
+        "img_fw",
+        "img_bw",
+        "img_data_fw.arr",
+        "img_data_bw.arr",
+    )
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
         self.slide_num: int | None = None
         self.par5: str | None = None
 
-        self.sm4 = Sm4(str(filepath))
+        # Only the data of the needed pages is read
+        pages = read_page_index(filepath)
+
+        for page in pages:
+            if page.header.page_type == RhkPageType.RHK_PAGE_TOPOGRAPHIC:
+                if page.header.scan_type.direction() == "right":
+                    fw_page = page
+                elif page.header.scan_type.direction() == "left":
+                    bw_page = page
 
-        for channel in self.sm4.topography_channels():
-            if channel.scan_direction == "right":
-                self.img_fw = channel
-            elif channel.scan_direction == "left":
-                self.img_bw = channel
+        self.img_fw = fw_page.to_channel(filepath)
+        self.img_bw = bw_page.to_channel(filepath)
 
         self._datetime = self.img_fw.datetime
         self.current = self.img_fw.current * 1e9  # in nA
@@ -51,8 +157,8 @@ class StmSm4(Measurement):
         self.line_time = self.img_fw.period * self.xres * 1e3  # in ms
         self.scan_direction = self.img_fw.scan_direction
 
-        self.img_data_fw = SpmImage(self.img_fw.data * 1e9, self.xsize)
-        self.img_data_bw = SpmImage(self.img_bw.data * 1e9, self.xsize)
+        self.img_data_fw = SpmImage(self.img_fw.data, self.xsize, scale=1e9)
+        self.img_data_bw = SpmImage(self.img_bw.data, self.xsize, scale=1e9)
 
         # Electrochemistry specific stuff (EC-STM)
         self.voltage_script = None
@@ -61,20 +167,18 @@ class StmSm4(Measurement):
         self.current_div = None
 
         # If there is more than 2 current and 2 topography channels
-        if len(self.sm4) > 4:
-            self.init_ec_data()
+        if len(pages) > 4:
+            self.init_ec_data(pages)
 
-    def init_ec_data(self) -> None:
-        e_cell_imgs = [
-            ch for ch in self.sm4 if "VEC" in ch.label or "E_WE" in ch.label
-        ]
-        u_tun_imgs = [
-            ch for ch in self.sm4 if "U_Tun" in ch.label or "Utun" in ch.label
-        ]
+    def init_ec_data(self, pages: list[Sm4PageInfo]) -> None:
+        e_cell_page, u_tun_page, i_cell_page = _find_pages(
+            pages, (("VEC", "E_WE"), ("U_Tun", "Utun"), ("I_WE", "IEC"))
+        )
+        filepath = self.fileinfo.filepath
 
-        if len(e_cell_imgs) != 0:
+        if e_cell_page is not None:
             e_cell_avg: NDArray[np.float32] = np.average(
-                e_cell_imgs[0].data, axis=0
+                e_cell_page.read_data(filepath), axis=0
             )
             x = np.arange(1, len(e_cell_avg) + 1)
 
@@ -83,9 +187,9 @@ class StmSm4(Measurement):
             plot.set_y_axis_label("U line-averaged")
             plot.plot_scatter(x, e_cell_avg, legend_label="E_WE [V]")  # ty:ignore[invalid-argument-type]
 
-            if len(u_tun_imgs) != 0:
+            if u_tun_page is not None:
                 u_tun_avg: NDArray[np.float32] = np.average(
-                    u_tun_imgs[0].data, axis=0
+                    u_tun_page.read_data(filepath), axis=0
                 )
                 plot.plot_scatter(x, u_tun_avg, legend_label="U_b [V]")  # ty:ignore[invalid-argument-type]
 
@@ -95,13 +199,9 @@ class StmSm4(Measurement):
                 plot.fig, wrap_script=True
             )
 
-        i_cell_imgs = [
-            ch for ch in self.sm4 if "I_WE" in ch.label or "IEC" in ch.label
-        ]
-
-        if len(i_cell_imgs) != 0:
+        if i_cell_page is not None:
             i_cell_avg: NDArray[np.float32] = np.average(
-                i_cell_imgs[0].data, axis=1
+                i_cell_page.read_data(filepath), axis=1
             )
             if self.par5 is not None:
                 i_cell_avg = i_cell_avg * float(self.par5)
@@ -128,18 +228,14 @@ class StmSm4(Measurement):
     @override
     def process(self, config: Config) -> Self:
         _ = (
-            self.img_data_fw.corr_plane()
-            .corr_lines_median()
-            .corr_plane()
-            .corr_lines_median()
-            .plot(config.colormap, config.colorrange)
+            self.img_data_fw.prepare(config)
+            .level()
+            .plot(config, asset_name(self.fileinfo.filepath, "_fw"))
         )
         _ = (
-            self.img_data_bw.corr_plane()
-            .corr_lines_median()
-            .corr_plane()
-            .corr_lines_median()
-            .plot(config.colormap, config.colorrange)
+            self.img_data_bw.prepare(config)
+            .level()
+            .plot(config, asset_name(self.fileinfo.filepath, "_bw"))
         )
 
         return self
@@ -147,3 +243,99 @@ class StmSm4(Measurement):
     @override
     def template_name(self) -> str:
         return "sm4.j2"
+
+    @override
+    def slides(self) -> list[Any]:
+        return [self]
+
+
+def read_page_index(filepath: Path) -> list[Sm4PageInfo]:
+    """Headers and labels of all pages of the .sm4 file at `filepath`,
+    without reading their data.
+
+    Sequential pages are skipped, like in `sm4file.Sm4`.
+    """
+    with open(filepath, "rb") as f:
+        cursor = Cursor(f)
+        file_header = Sm4FileHeader.from_buffer(cursor)
+        index_offset = _object_offset(
+            file_header.object_list, RhkObjectType.RHK_OBJECT_PAGE_INDEX_HEADER
+        )
+        if index_offset is None:
+            raise BufferError(f"No page index header in {filepath}")
+
+        cursor.set_position(index_offset)
+        index_header = Sm4PageIndexHeader.from_buffer(cursor, index_offset)
+        array_offset = index_header.page_index_array_offset()
+        assert array_offset is not None
+        cursor.set_position(array_offset)
+        pages = [
+            Sm4Page.from_buffer(cursor)
+            for _ in range(index_header.page_count)
+        ]
+
+        return [
+            _read_page_info(cursor, page)
+            for page in pages
+            if page.page_data_type != RhkPageDataType.RHK_DATA_SEQUENTIAL
+        ]
+
+
+def _read_page_info(cursor: Cursor, page: Sm4Page) -> Sm4PageInfo:
+    """Header and string data of `page`."""
+    header_offset = _object_offset(
+        page.object_list, RhkObjectType.RHK_OBJECT_PAGE_HEADER
+    )
+    if header_offset is None:
+        raise BufferError("No page header in page")
+    cursor.set_position(header_offset)
+    header = Sm4PageHeaderDefault.from_buffer(cursor)
+
+    strings = None
+    strings_offset = _object_offset(
+        header.object_list, RhkObjectType.RHK_OBJECT_STRING_DATA
+    )
+    if strings_offset is not None:
+        cursor.set_position(strings_offset)
+        strings = StringData.from_buffer(cursor, header.string_count)
+
+    data_offset, data_size = 0, 0
+    for obj in page.object_list:
+        if (
+            obj.obj_type == RhkObjectType.RHK_OBJECT_PAGE_DATA
+            and obj.offset != 0
+            and obj.size != 0
+        ):
+            data_offset, data_size = obj.offset, obj.size
+
+    return Sm4PageInfo(
+        label=strings.label if strings is not None else "",
+        data_type=page.page_data_type,
+        header=header,
+        strings=strings,
+        data_offset=data_offset,
+        data_size=data_size,
+    )
+
+
+def _object_offset(objects: list[Any], obj_type: RhkObjectType) -> int | None:
+    """Offset of the first object of `obj_type` that is not empty."""
+    for obj in objects:
+        if obj.obj_type == obj_type and obj.offset != 0 and obj.size != 0:
+            return obj.offset
+
+    return None
+
+
+def _find_pages(
+    pages: list[Sm4PageInfo], labels: tuple[tuple[str, ...], ...]
+) -> list[Sm4PageInfo | None]:
+    """First page whose label contains one of the strings of each entry of
+    `labels`, in a single pass over the pages."""
+    found: list[Sm4PageInfo | None] = [None] * len(labels)
+    for page in pages:
+        for i, parts in enumerate(labels):
+            if found[i] is None and any(part in page.label for part in parts):
+                found[i] = page
+
+    return found
@@ -1,13 +1,18 @@
-import base64
 import io
 from typing import Any, Self, cast, final
 
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib_scalebar.scalebar import ScaleBar
 from numpy._typing import NDArray
+from PIL import Image as PilImage
 
-plt.rcParams.update({"figure.max_open_warning": 0})
+from proespm.assets import image_uri
+from proespm.config import Config
+from proespm.spm.colorrange import color_range
+from proespm.spm.render import render_png
+
+# Size of the blocks of scan lines in which medians are computed, small enough
+# to stay in the CPU cache
+_MEDIAN_BLOCK_BYTES = 256 * 1024
 
 
 @final
@@ -17,32 +22,85 @@ class SpmImage:
     Args:
         arr: Pixel data of the STM image
         xsize: Physical dimension of the STM image in x-direction
+        scale: Factor converting the pixel data to nm, applied by `prepare`
 
     """
 
-    def __init__(self, arr: NDArray[np.floating[Any]], xsize: float) -> None:
+    def __init__(
+        self,
+        arr: NDArray[np.number[Any]],
+        xsize: float,
+        scale: float = 1.0,
+    ) -> None:
         self.arr = arr
         self.yres, self.xres = arr.shape
         self.xsize = xsize
+        self.scale = scale
         self.data_uri = None
 
     @property
     def shape(self) -> tuple[int, int]:
         return cast(tuple[int, int], self.arr.shape)
 
-    def plot(
-        self, colormap: str, colorrange: tuple[float, float], show: bool = False
-    ) -> Self:
-        """Plots the image in"""
+    def prepare(self, config: Config) -> Self:
+        """Convert the image array to the floating point precision of the
+        config and scale it, without copying it if possible
+
+        Args:
+            config: Runtime configuration, `config.float32` selects single
+                precision.
+        """
+        dtype = np.float32 if config.float32 else np.float64
+        # Read-only arrays are views of file buffers and must be copied
+        self.arr = self.arr.astype(dtype, copy=not self.arr.flags.writeable)
+        if self.scale != 1.0:
+            self.arr *= self.scale
+            self.scale = 1.0
+
+        return self
+
+    def plot(self, config: Config, name: str, show: bool = False) -> Self:
+        """Plots the image in
+
+        Args:
+            config: Runtime configuration with colormap, color range and
+                renderer.
+            name: Unique name of the image, used for external assets.
+            show: Show the plot in a window.
+        """
+
+        vmin, vmax = color_range(
+            self.arr,
+            config.colorrange,
+            config.colorrange_mode,
+            config.colorrange_tolerance,
+        )
+
+        if config.renderer == "fast":
+            png = render_png(self.arr, self.xsize, config.colormap, vmin, vmax)
+            if show is True:
+                PilImage.open(io.BytesIO(png)).show()
+        else:
+            png = self._plot_matplotlib(config.colormap, vmin, vmax, show)
+
+        self.data_uri = image_uri(png, "png", name, config)
+
+        return self
+
+    def _plot_matplotlib(
+        self, colormap: str, vmin: float, vmax: float, show: bool
+    ) -> bytes:
+        """Render the image as PNG with a matplotlib figure."""
+        # Imported here, as the fast renderer does not need pyplot
+        import matplotlib.pyplot as plt
+        from matplotlib_scalebar.scalebar import ScaleBar
 
-        vmin = np.percentile(self.arr, colorrange[0])
-        vmax = np.percentile(self.arr, colorrange[1])
         fig, ax = plt.subplots(figsize=(5, 5))
         _ = ax.imshow(
             self.arr,
             cmap=colormap,
-            vmin=vmin,  # ty:ignore[invalid-argument-type]
-            vmax=vmax,  # ty:ignore[invalid-argument-type]
+            vmin=vmin,
+            vmax=vmax,
             extent=(0, self.xres, 0, self.yres),
         )
         # plt.colorbar()
@@ -68,18 +126,12 @@ class SpmImage:
             fig.dpi_scale_trans.inverted()
         )
         plt.savefig(png_bytes, bbox_inches=extent)
-        _ = png_bytes.seek(0)
-
-        png_data_uri = "data:image/png;base64, " + base64.b64encode(
-            png_bytes.read()
-        ).decode("ascii")
 
         if show is True:
             plt.show()
+        plt.close(fig)
 
-        self.data_uri = png_data_uri
-
-        return self
+        return png_bytes.getvalue()
 
     def fix_zero(self):
         """Subtract the minimum value of the image array from the image array"""
@@ -98,29 +150,160 @@ class SpmImage:
 
     def corr_lines_median(self):
         """Subtract a plane of the median of each scan line from the image array"""
-        median = cast(float, np.median(self.arr, axis=1))
-        correction = np.broadcast_to(
-            median, (self.arr.shape[1], self.arr.shape[0])
-        ).T
-        self.arr -= correction
+        _subtract_line_medians(self.arr[np.newaxis])
 
         return self
 
     def corr_plane(self):
-        """Subtract a fitted background plane from the image array"""
+        """Subtract a fitted background plane from the image array
+
+        On the regular pixel grid, the normal equations of the least squares
+        fit are diagonal for coordinates centered on the image, so the
+        coefficients follow from the row and column sums. The plane is
+        subtracted in place, without full-size temporary arrays.
+        """
         y_shape, x_shape = self.arr.shape
-        x_coords, y_coords = np.meshgrid(np.arange(x_shape), np.arange(y_shape))
-        coeff_matrix = np.column_stack(
-            (np.ones(self.arr.size), x_coords.ravel(), y_coords.ravel())
+        x_coords = np.arange(x_shape) - (x_shape - 1) / 2
+        y_coords = np.arange(y_shape) - (y_shape - 1) / 2
+
+        col_sums = np.sum(self.arr, axis=0, dtype=np.float64)
+        row_sums = np.sum(self.arr, axis=1, dtype=np.float64)
+        offset = col_sums.sum() / self.arr.size
+        x_slope = (
+            col_sums @ x_coords / (y_shape * (x_coords @ x_coords))
+            if x_shape > 1
+            else 0.0
         )
-        least_squares = np.linalg.lstsq(
-            coeff_matrix, self.arr.ravel(), rcond=-1
-        )[0]
-        background: NDArray[np.floating[Any]] = (
-            least_squares[0] * np.ones(self.arr.shape)
-            + least_squares[1] * x_coords
-            + least_squares[2] * y_coords
+        y_slope = (
+            row_sums @ y_coords / (x_shape * (y_coords @ y_coords))
+            if y_shape > 1
+            else 0.0
+        )
+
+        self.arr -= (offset + x_slope * x_coords).astype(self.arr.dtype)
+        self.arr -= (y_slope * y_coords).astype(self.arr.dtype)[:, np.newaxis]
+
+        return self
+
+    def level(self) -> Self:
+        """Level the image array by subtracting a background plane and the
+        median of each scan line
+
+        Gives the same result as applying `corr_plane().corr_lines_median()`
+        twice: Subtracting the line medians also removes the offset and slope
+        in y-direction of the plane, and the second round only subtracts
+        constants from each line, which are removed again by the median. This
+        leaves one pass for the column sums and one pass over blocks of lines
+        for subtracting the slope in x-direction and the medians.
+        """
+        slope_line = _x_slope_lines(self.arr)
+        _subtract_line_medians(
+            self.arr[np.newaxis],
+            None if slope_line is None else slope_line[np.newaxis],
         )
-        self.arr -= background
 
         return self
+
+
+def level_images(images: list[SpmImage], config: Config) -> None:
+    """Call `prepare` and `level` of all `images`, vectorized over small
+    images of the same shape, e.g. the frames of a movie.
+
+    Images of the same shape that are smaller than a block of lines of
+    `level` are copied into one `(n, y, x)` stack, which is leveled as a
+    whole. Their arrays are views into this stack afterwards. Larger images
+    are leveled one by one in place, as copying them into a new stack costs
+    more than the per-image overhead it saves.
+
+    Args:
+        images: Images to level.
+        config: Runtime configuration, see `SpmImage.prepare`.
+    """
+    dtype = np.float32 if config.float32 else np.float64
+    by_shape: dict[tuple[int, int], list[SpmImage]] = {}
+    for image in images:
+        if image.arr.size * np.dtype(dtype).itemsize < _MEDIAN_BLOCK_BYTES:
+            by_shape.setdefault(image.shape, []).append(image)
+        else:
+            _ = image.prepare(config).level()
+
+    for (y_shape, x_shape), group in by_shape.items():
+        stack = np.empty((len(group), y_shape, x_shape), dtype=dtype)
+        for frame, image in zip(stack, group):
+            # Conversion and scaling in a single pass
+            _ = np.multiply(image.arr, image.scale, out=frame, casting="unsafe")
+            image.arr = frame
+            image.scale = 1.0
+
+        _subtract_line_medians(stack, _x_slope_lines(stack))
+
+
+def _x_slope_lines(
+    arr: NDArray[np.floating[Any]],
+) -> NDArray[np.floating[Any]] | None:
+    """Slope in x-direction of the background plane of an image, or of each
+    image of a `(n, y, x)` stack, evaluated along a line.
+
+    On the regular pixel grid, the slope follows from the column sums, see
+    `SpmImage.corr_plane`. None for images that are only one pixel wide.
+    """
+    y_shape, x_shape = arr.shape[-2:]
+    if x_shape < 2:
+        return None
+
+    x_coords = np.arange(x_shape) - (x_shape - 1) / 2
+    col_sums = np.sum(arr, axis=-2, dtype=np.float64)
+    x_slopes = col_sums @ x_coords / (y_shape * (x_coords @ x_coords))
+    return (x_slopes[..., np.newaxis] * x_coords).astype(arr.dtype)
+
+
+def _subtract_line_medians(
+    arr: NDArray[np.floating[Any]],
+    background: NDArray[np.floating[Any]] | None = None,
+) -> None:
+    """Subtract `background` from each line of each image of the `(n, y, x)`
+    stack `arr` and then the median of each line, in place.
+
+    Lines are processed in blocks of whole images or parts of an image, whose
+    medians are found by partitioning a copy in a small scratch buffer
+    instead of sorting a copy of the array.
+
+    Args:
+        arr: Stack of images.
+        background: Line subtracted from all lines of each image, with shape
+            `(n, x)`.
+    """
+    num_images, y_shape, x_shape = arr.shape
+    if arr.size == 0:
+        return
+
+    block_lines = max(_MEDIAN_BLOCK_BYTES // (x_shape * arr.itemsize), 1)
+    if block_lines >= y_shape:
+        images_per_block = block_lines // y_shape
+        blocks = [
+            (slice(i, i + images_per_block), slice(None))
+            for i in range(0, num_images, images_per_block)
+        ]
+    else:
+        blocks = [
+            (slice(i, i + 1), slice(start, start + block_lines))
+            for i in range(num_images)
+            for start in range(0, y_shape, block_lines)
+        ]
+
+    upper = x_shape // 2
+    scratch = np.empty(block_lines * x_shape, dtype=arr.dtype)
+
+    for images, lines in blocks:
+        block = arr[images, lines]
+        if background is not None:
+            block -= background[images, np.newaxis, :]
+        buffer = scratch[: block.size].reshape(block.shape)
+        np.copyto(buffer, block)
+        # Partitioning for a second kth is much slower than taking the
+        # maximum of the lower half
+        buffer.partition(upper, axis=2)
+        medians = buffer[..., upper]
+        if x_shape % 2 == 0:
+            medians = (buffer[..., :upper].max(axis=2) + medians) / 2
+        block -= medians[..., np.newaxis]
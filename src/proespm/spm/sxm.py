@@ -1,16 +1,22 @@
 from datetime import datetime
 from pathlib import Path
-from typing import Self, final, override
+from typing import Any, Self, final, override
 
-import nanonispy as nap
 import numpy as np
 from dateutil import parser
+from numpy.typing import NDArray
 
+from proespm.assets import asset_name
 from proespm.config import Config
 from proespm.fileinfo import Fileinfo
 from proespm.measurement import Measurement
 from proespm.spm.spm import SpmImage
 
+# Last line of the text header
+HEADER_END = ":SCANIT_END:"
+# Marks the start of the binary data, a few bytes after `HEADER_END`
+DATA_START = b"\x1a\x04"
+
 
 @final
 class StmSxm(Measurement):
@@ -21,39 +27,43 @@ class StmSxm(Measurement):
     """
 
     measurement_family = "SPM"
+    render_attrs = ("img_data_fw.data_uri", "img_data_bw.data_uri")
+    data_attrs = ("img_data_fw.arr", "img_data_bw.arr")
 
     def __init__(self, filepath: Path) -> None:
         self.fileinfo = Fileinfo(filepath)
         self.slide_num: int | None = None
 
-        self.sxm = nap.read.Scan(filepath)
+        header, data_offset = _read_header(filepath)
 
-        day, month, year = self.sxm.header["rec_date"].split(".")
-        time = self.sxm.header["rec_time"]
+        day, month, year = header["rec_date"][0].split(".")
+        time = header["rec_time"][0]
         self._datetime = parser.parse(f"{year}-{month}-{day} {time}")
 
-        self.current: float = (
-            float(self.sxm.header["z-controller"]["Setpoint"][0].split()[0])
-            * 1e9
-        )  # in nA
+        z_controller = _parse_table(header["z-controller"])
+        # in nA
+        self.current = float(z_controller[0]["Setpoint"].split()[0]) * 1e9
 
-        self.bias: float = self.sxm.header["bias"]
+        self.bias: float = float(header["bias"][0])
 
-        self.xsize, self.ysize = self.sxm.header["scan_range"] * 1e9
-        self.xoffset, self.yoffset = self.sxm.header["scan_offset"] * 1e9
-        self.xres, self.yres = self.sxm.header["scan_pixels"]
-        self.rotation = float(self.sxm.header["scan_angle"])
-        self.line_time = self.sxm.header["scan_time"][0] * 1e3
+        self.xsize, self.ysize = _parse_floats(header["scan_range"], 1e9)
+        self.xoffset, self.yoffset = _parse_floats(header["scan_offset"], 1e9)
+        self.xres, self.yres = (
+            int(n) for n in header["scan_pixels"][0].split()
+        )
+        self.rotation = float(header["scan_angle"][0])
+        self.line_time = _parse_floats(header["scan_time"], 1e3)[0]
         self.speed = self.line_time * self.yres / 1e3
 
-        self.img_data_fw = SpmImage(
-            np.flip(self.sxm.signals["Z"]["forward"], axis=0),
-            self.xsize,
-        )
-        self.img_data_bw = SpmImage(
-            np.flip(self.sxm.signals["Z"]["backward"], axis=(0, 1)),
-            self.xsize,
+        z_fw, z_bw = _read_channel(
+            filepath,
+            header,
+            data_offset,
+            "Z",
+            (self.yres, self.xres),
         )
+        self.img_data_fw = SpmImage(np.flip(z_fw, axis=0), self.xsize)
+        self.img_data_bw = SpmImage(np.flip(z_bw, axis=(0, 1)), self.xsize)
 
     @override
     def m_id(self) -> str:
@@ -66,21 +76,101 @@ class StmSxm(Measurement):
     @override
     def process(self, config: Config) -> Self:
         _ = (
-            self.img_data_fw.corr_plane()
-            .corr_lines_median()
-            .corr_plane()
-            .corr_lines_median()
-            .plot(config.colormap, config.colorrange)
+            self.img_data_fw.prepare(config)
+            .level()
+            .plot(config, asset_name(self.fileinfo.filepath, "_fw"))
         )
         _ = (
-            self.img_data_bw.corr_plane()
-            .corr_lines_median()
-            .corr_plane()
-            .corr_lines_median()
-            .plot(config.colormap, config.colorrange)
+            self.img_data_bw.prepare(config)
+            .level()
+            .plot(config, asset_name(self.fileinfo.filepath, "_bw"))
         )
         return self
 
     @override
     def template_name(self) -> str:
         return "sxm.j2"
+
+    @override
+    def slides(self) -> list[Any]:
+        return [self]
+
+
+def _read_header(filepath: Path) -> tuple[dict[str, list[str]], int]:
+    """Lines of the header entries by their lowercase name, and the offset
+    of the binary data."""
+    header: dict[str, list[str]] = {}
+    entry: list[str] = []
+    with open(filepath, "rb") as f:
+        for line in f:
+            text = line.decode(errors="replace").strip()
+            if text == HEADER_END:
+                break
+            if text.startswith(":") and text.endswith(":"):
+                entry = header.setdefault(text.strip(":").lower(), [])
+            elif text:
+                entry.append(text)
+        else:
+            raise ValueError(f"No {HEADER_END} in {filepath}")
+
+        position = f.tell()
+        data_start = f.read(16).find(DATA_START)
+        if data_start == -1:
+            raise ValueError(f"No start of the data in {filepath}")
+
+    return header, position + data_start + len(DATA_START)
+
+
+def _parse_table(lines: list[str]) -> list[dict[str, str]]:
+    """Rows of a tab separated header entry, e.g. `DATA_INFO`, by their
+    column names."""
+    names = lines[0].split("\t")
+    return [dict(zip(names, line.split("\t"))) for line in lines[1:]]
+
+
+def _parse_floats(lines: list[str], factor: float) -> list[float]:
+    """Whitespace separated numbers of a header entry, multiplied by
+    `factor`."""
+    return [float(n) * factor for n in lines[0].split()]
+
+
+def _read_channel(
+    filepath: Path,
+    header: dict[str, list[str]],
+    data_offset: int,
+    name: str,
+    shape: tuple[int, int],
+) -> tuple[NDArray[np.floating[Any]], NDArray[np.floating[Any]]]:
+    """Forward and backward data of the channel `name`.
+
+    The channels are stored one after another, each with the forward and, if
+    recorded in both directions, the backward image. Only the requested
+    channel is read from the memory mapped file.
+    """
+    # e.g. `FLOAT MSBFIRST`
+    byte_order = ">" if "MSBFIRST" in header["scanit_type"][0] else "<"
+    datatype = np.dtype(f"{byte_order}f4")
+    image_bytes = shape[0] * shape[1] * datatype.itemsize
+
+    offset = data_offset
+    for channel in _parse_table(header["data_info"]):
+        num_directions = 2 if channel["Direction"] == "both" else 1
+        if channel["Name"] == name:
+            if num_directions != 2:
+                raise ValueError(
+                    f"Channel {name} of {filepath} is not recorded in both "
+                    "directions"
+                )
+            data = np.memmap(
+                filepath,
+                dtype=datatype,
+                mode="r",
+                offset=offset,
+                shape=(num_directions, *shape),
+            )
+            # Copied, so the file is not kept open
+            return data[0].copy(), data[1].copy()
+
+        offset += num_directions * image_bytes
+
+    raise ValueError(f"No channel {name} in {filepath}")
@@ -0,0 +1,156 @@
+from pathlib import Path
+from typing import Callable, final
+
+from proespm.cache import ArtifactCache
+from proespm.config import Config
+from proespm.measurement import Measurement
+from proespm.processing import (
+    OrphanEc4FileError,
+    _import_files,
+    assign_slide_nums,
+    create_html,
+    process_loop,
+    read_measurements,
+)
+
+type _Signature = tuple[int, int] | None
+
+
+def _signature(path: Path) -> _Signature:
+    """Size and modification time of `path`, None if it does not exist."""
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+@final
+class ReportWatcher:
+    """Incremental creation of the report of a directory that receives new
+    measurement files.
+
+    Every call of `update` scans the directory, reads and processes only new
+    or modified files and reuses the measurements of unchanged files. A file
+    is picked up once its size and modification time did not change since the
+    previous scan, so files that are still being written are skipped. Files
+    that cannot be read are logged and only read again once they change.
+
+    Args:
+        process_dir: Full path of the directory containing files to import.
+        output_path: Full path where the report will be saved.
+        report_name: Name of the report.
+        config: Runtime configuration.
+        log: Log function which is used to emit information about the
+            processing status.
+        cache: Cache of render artifacts.
+    """
+
+    def __init__(
+        self,
+        process_dir: str,
+        output_path: str,
+        report_name: str,
+        config: Config,
+        log: Callable[[str], None],
+        cache: ArtifactCache | None = None,
+    ) -> None:
+        self.process_dir = process_dir
+        self.output_path = output_path
+        self.report_name = report_name
+        self.config = config
+        self.log = log
+        self.cache = cache
+        # Processed measurements with the signatures of their source files
+        self._measurements: list[tuple[Measurement, list[_Signature]]] = []
+        # Files that are not known measurement files or cannot be read, until
+        # they are modified
+        self._ignored: dict[Path, _Signature] = {}
+        self._last_scan: dict[Path, _Signature] = {}
+        self._has_report = False
+
+    def update(self) -> bool:
+        """Scan the directory and recreate the report if files changed.
+
+        Returns:
+            True if the report was (re)created, False if nothing changed.
+        """
+        paths = _import_files(self.process_dir)
+        scan = {path: _signature(path) for path in paths}
+        if self._has_report:
+            stable = [
+                path
+                for path in paths
+                if self._last_scan.get(path) == scan[path]
+            ]
+        else:
+            stable = paths
+        self._last_scan = scan
+        self._ignored = {
+            path: signature
+            for path, signature in self._ignored.items()
+            if path in scan
+        }
+
+        kept: list[tuple[Measurement, list[_Signature]]] = []
+        known = {
+            path
+            for path, signature in self._ignored.items()
+            if signature == scan[path]
+        }
+        for measurement, signatures in self._measurements:
+            source_files = measurement.source_files()
+            # Measurements with modified or removed source files are read again
+            if [_signature(path) for path in source_files] == signatures:
+                kept.append((measurement, signatures))
+                known.update(source_files)
+
+        to_read = [path for path in stable if path not in known]
+        if (
+            self._has_report
+            and not to_read
+            and len(kept) == len(self._measurements)
+        ):
+            return False
+
+        try:
+            new_measurements = read_measurements(
+                to_read, self.config.jobs, on_error=self._log_read_error
+            )
+        except OrphanEc4FileError:
+            # The first file of the EC4 measurement was read before, read
+            # everything again so the continuation files are grouped with it
+            self.log("Reading all files again")
+            kept = []
+            to_read = stable
+            new_measurements = read_measurements(
+                to_read, self.config.jobs, on_error=self._log_read_error
+            )
+
+        process_loop(new_measurements, self.config, self.log, self.cache)
+
+        read_files: set[Path] = set()
+        for measurement in new_measurements:
+            source_files = measurement.source_files()
+            read_files.update(source_files)
+            kept.append(
+                (measurement, [_signature(path) for path in source_files])
+            )
+        for path in to_read:
+            if path not in read_files:
+                self._ignored[path] = scan[path]
+
+        self._measurements = kept
+        measurement_objects = sorted(
+            (measurement for measurement, _ in kept),
+            key=lambda x: x.get_datetime(),
+        )
+        assign_slide_nums(measurement_objects)
+        create_html(measurement_objects, self.output_path, self.report_name)
+        self._has_report = True
+
+        return True
+
+    def _log_read_error(self, path: Path, error: Exception) -> None:
+        self.log(f"Cannot read {path.name}: {error}")
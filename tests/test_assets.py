@@ -0,0 +1,108 @@
+import base64
+import os
+import stat
+from dataclasses import replace
+from pathlib import Path
+
+from proespm.assets import asset_name, assets_dir_for, image_uri
+from proespm.cache import ArtifactCache
+from proespm.config import Config, config_digest
+from proespm.misc.image import Image
+from proespm.processing import create_html, process_loop
+from proespm.spm.nid import SpmNid
+
+testdata = Path(__file__).parent / "testdata"
+
+CONFIG = Config(colormap="inferno", colorrange=(0.1, 99.9))
+
+
+def test_image_uri_inline():
+    uri = image_uri(b"png data", "png", "image", CONFIG)
+    encoded = base64.b64encode(b"png data").decode()
+    assert uri == f"data:image/png;base64,{encoded}"
+
+
+def test_image_uri_external(tmp_path: Path):
+    assets_dir = assets_dir_for(tmp_path / "test_report.html")
+    assert assets_dir == tmp_path / "test_report_files"
+    config = replace(CONFIG, assets_dir=assets_dir)
+
+    uri = image_uri(b"png data", "png", "image", config)
+    assert uri == f"test_report_files/image_{config_digest(config)[:8]}.png"
+    assert (tmp_path / uri).read_bytes() == b"png data"
+
+    # Readable by others according to the umask, like any new file
+    umask = os.umask(0)
+    _ = os.umask(umask)
+    mode = stat.S_IMODE((tmp_path / uri).stat().st_mode)
+    assert mode == 0o666 & ~umask
+
+    hashed = replace(config, hash_assets=True)
+    uri_a = image_uri(b"png data", "png", "a", hashed)
+    uri_b = image_uri(b"png data", "png", "b", hashed)
+    assert uri_a == uri_b != uri
+    assert len(list(assets_dir.iterdir())) == 2
+
+
+def test_report_external_assets(tmp_path: Path):
+    output_path = tmp_path / "test_report.html"
+    config = replace(CONFIG, assets_dir=assets_dir_for(output_path))
+    cache = ArtifactCache(tmp_path / "cache", 2**30)
+
+    image = Image(testdata / "leed.png")
+    process_loop([image], config, lambda _: None, cache)
+    create_html([image], str(output_path), "test")
+
+    name = asset_name(testdata / "leed.png")
+    filename = f"{name}_{config_digest(config)[:8]}.png"
+    assert f'src="test_report_files/{filename}"' in output_path.read_text()
+    assert (tmp_path / "test_report_files" / filename).exists()
+
+    # Cached results are only used while their image files exist
+    assert cache.get(Image(testdata / "leed.png"), config) is not None
+    (tmp_path / "test_report_files" / filename).unlink()
+    assert cache.get(Image(testdata / "leed.png"), config) is None
+
+
+def test_external_assets_same_filename(tmp_path: Path):
+    config = replace(CONFIG, assets_dir=tmp_path / "report_files")
+    images = []
+    for subdir in ("a", "b"):
+        filepath = tmp_path / subdir / "image.png"
+        filepath.parent.mkdir()
+        _ = filepath.write_bytes(f"png data {subdir}".encode())
+        images.append(Image(filepath))
+    process_loop(images, config, lambda _: None)
+
+    assert images[0].img_uri != images[1].img_uri
+    for image, subdir in zip(images, ("a", "b")):
+        assert image.img_uri is not None
+        content = (tmp_path / image.img_uri).read_bytes()
+        assert content == f"png data {subdir}".encode()
+
+
+def test_external_assets_other_config(tmp_path: Path):
+    config = replace(CONFIG, assets_dir=tmp_path / "report_files")
+    cache = ArtifactCache(tmp_path / "cache", 2**30)
+    filepath = testdata / "stm-nanosurf-nid.nid"
+
+    uris: dict[str, str] = {}
+    images: dict[str, bytes] = {}
+    for colormap in ("inferno", "gray"):
+        nid = SpmNid(filepath)
+        process_loop(
+            [nid], replace(config, colormap=colormap), lambda _: None, cache
+        )
+        uri = nid.img_data_fw.data_uri
+        assert uri is not None
+        uris[colormap] = uri
+        images[colormap] = (tmp_path / uri).read_bytes()
+    assert uris["inferno"] != uris["gray"]
+
+    # The cached result of the first run still shows its own image
+    artifacts = cache.get(SpmNid(filepath), config)
+    assert artifacts is not None
+    nid = SpmNid(filepath)
+    nid.load_render_artifacts(artifacts)
+    assert nid.img_data_fw.data_uri == uris["inferno"]
+    assert (tmp_path / uris["inferno"]).read_bytes() == images["inferno"]
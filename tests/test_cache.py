@@ -0,0 +1,60 @@
+import shutil
+from dataclasses import replace
+from pathlib import Path
+
+from proespm.cache import ArtifactCache
+from proespm.config import Config
+from proespm.misc.qcmb import Qcmb
+from proespm.processing import process_loop
+from proespm.spm.nid import SpmNid
+
+testdata = Path(__file__).parent / "testdata"
+
+CONFIG = Config(colormap="inferno", colorrange=(0.1, 99.9))
+
+
+def test_cache_roundtrip(tmp_path: Path):
+    cache = ArtifactCache(tmp_path, 2**30)
+    nid = SpmNid(testdata / "stm-nanosurf-nid.nid")
+    assert cache.get(nid, CONFIG) is None
+
+    process_loop([nid], CONFIG, lambda _: None, cache)
+    cached = cache.get(SpmNid(testdata / "stm-nanosurf-nid.nid"), CONFIG)
+    assert cached == nid.render_artifacts()
+    assert cached["img_data_fw.data_uri"] is not None
+
+    other_config = replace(CONFIG, colormap="gray")
+    assert cache.get(nid, other_config) is None
+    assert cache.get(nid, replace(CONFIG, jobs=4)) is not None
+
+
+def test_cache_skips_processing(tmp_path: Path):
+    cache = ArtifactCache(tmp_path, 2**30)
+    process_loop([Qcmb(testdata / "qcmb-test.log")], CONFIG, print, cache)
+
+    logs: list[str] = []
+    qcmb = Qcmb(testdata / "qcmb-test.log")
+    process_loop([qcmb], CONFIG, logs.append, cache)
+    assert logs == ["Using cached result of qcmb-test"]
+    assert qcmb.div is not None
+
+
+def test_cache_invalidation(tmp_path: Path):
+    cache = ArtifactCache(tmp_path / "cache", 2**30)
+    path = Path(shutil.copy2(testdata / "qcmb-test.log", tmp_path))
+    process_loop([Qcmb(path)], CONFIG, lambda _: None, cache)
+    assert cache.get(Qcmb(path), CONFIG) is not None
+
+    with open(path, "a") as f:
+        _ = f.write("\n")
+    assert cache.get(Qcmb(path), CONFIG) is None
+
+
+def test_cache_eviction(tmp_path: Path):
+    cache = ArtifactCache(tmp_path, 1)
+    qcmb = Qcmb(testdata / "qcmb-test.log").process(CONFIG)
+    cache.put(qcmb, CONFIG)
+    assert cache.get(qcmb, CONFIG) is not None
+
+    cache.evict()
+    assert cache.get(qcmb, CONFIG) is None
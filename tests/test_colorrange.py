@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from proespm.spm.colorrange import SAMPLE_SIZE, color_range
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (7, 5), (256, 256)])
+def test_color_range_exact(shape: tuple[int, int]):
+    arr = np.random.default_rng(0).normal(size=shape)
+
+    lower, upper = color_range(arr, (0.1, 99.9))
+
+    assert lower == pytest.approx(np.percentile(arr, 0.1), abs=1e-12)
+    assert upper == pytest.approx(np.percentile(arr, 99.9), abs=1e-12)
+
+
+def test_color_range_approx():
+    rng = np.random.default_rng(0)
+    arr = rng.standard_cauchy(size=(1024, 1024))
+    tolerance = 0.01
+
+    lower, upper = color_range(arr, (0.1, 99.9), "approx", tolerance)
+
+    flat = np.sort(arr.ravel())
+    for value, percentile in ((lower, 0.1), (upper, 99.9)):
+        # Percentile of the returned value, at most one index off
+        index = np.searchsorted(flat, value)
+        actual = index / (flat.size - 1) * 100
+        assert abs(actual - percentile) <= tolerance + 100 / (flat.size - 1)
+
+
+def test_color_range_approx_saturated():
+    # Estimates within many equal values are accepted as exact
+    arr = np.zeros((1024, 1024))
+    arr[:, :10] = np.arange(1024)[:, np.newaxis]
+    assert arr.size > SAMPLE_SIZE
+
+    lower, _ = color_range(arr, (0.1, 99.9), "approx", 1e-6)
+    assert lower == 0.0
@@ -1,8 +1,31 @@
+import base64
+import io
+import os
+import shutil
+import stat
 from pathlib import Path
 
+import h5py
+import numpy as np
+from PIL import Image, ImageOps
+
+from proespm.config import Config
 from proespm.fastspm.atom_tracking import AtomTracking
+from proespm.fastspm.catalog import (
+    CATALOG_DIR,
+    MetadataCatalog,
+    build_catalogs,
+    file_attributes,
+    use_catalogs,
+)
 from proespm.fastspm.error_topography import ErrorTopography
 from proespm.fastspm.fast_scan import FastScan
+from proespm.fastspm.fastspm import (
+    ATTRIBUTES,
+    iter_frames,
+    read_corresponding_image,
+    read_frame_strip,
+)
 from proespm.fastspm.high_speed import HighSpeed
 from proespm.fastspm.slow_image import SlowImage
 
@@ -55,6 +78,20 @@ def test_fast_scan():
     assert fs.aux_2_label == "Setpoint"
 
 
+def test_attribute_schema():
+    for cls in (AtomTracking, ErrorTopography, FastScan, HighSpeed, SlowImage):
+        assert set(cls.attribute_names) <= ATTRIBUTES.keys()
+
+    at = AtomTracking(AT)
+    assert at.control_timestep == 1.0
+    assert at.control_timestep_unit == "ms"
+
+    # Missing attributes get their default value
+    si = SlowImage(SI)
+    assert "Z_In.ConversionFactor" not in si.attributes
+    assert np.isnan(si.z_in_convfact)
+
+
 def test_high_speed():
     hs = HighSpeed(HS)
     assert hs.aux_1_unit == "V/V"
@@ -71,3 +108,120 @@ def test_slow_image():
     assert round(si.aux_2, 2) == -22.26
     assert si.aux_2_unit == "nA/V"
     assert si.aux_2_label == "Setpoint"
+
+
+def test_fast_scan_frames(tmp_path: Path):
+    # 5 frames of 3 lines with 4 forward and 4 backward samples
+    data = np.arange(5 * 3 * 8, dtype=np.int16)
+    filepath = tmp_path / "FS_000000_001.h5"
+    with h5py.File(filepath, "w") as f:
+        dataset = f.create_dataset("data", data=data, chunks=(7,))
+        dataset.attrs["Scanner.X_Points"] = "4"
+        dataset.attrs["Scanner.Y_Points"] = "3"
+
+    with h5py.File(filepath, "r") as f:
+        frames = list(iter_frames(f["data"], 4, 3))
+        decimated = list(iter_frames(f["data"], 4, 3, step=2))
+
+    assert len(frames) == 5
+    assert frames[0].tolist() == [
+        [0, 1, 2, 3],
+        [8, 9, 10, 11],
+        [16, 17, 18, 19],
+    ]
+    # Downward frames are flipped
+    assert frames[1][0].tolist() == [40, 41, 42, 43]
+    assert [frame[0, 0] for frame in decimated] == [0, 48, 96]
+
+    config = Config(colormap="gray", colorrange=(0.0, 100.0))
+    frames_uri = read_frame_strip(filepath, 3, config)
+    assert frames_uri is not None
+    assert frames_uri.startswith("data:image/png;base64,")
+
+
+def test_fastspm_catalog(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    cache_dir = tmp_path / "cache"
+    filepath = data_dir / "AT_000000_001.h5"
+    with h5py.File(filepath, "w") as f:
+        f.attrs["ExperimentInfo.TimeStart"] = "2025-01-01T12:00:00+01:00"
+        dataset = f.create_dataset("data", data=np.zeros(4))
+        dataset.attrs["Aux1.Value"] = np.float64(0.5)
+        dataset.attrs["Acquisition.NumFrames"] = np.uint16(100)
+    _ = shutil.copy(filepath, data_dir / "AT_000000_002.h5")
+
+    build_catalogs(
+        [filepath, data_dir / "AT_000000_002.h5", data_dir / "a.jpg"],
+        cache_dir,
+    )
+    # Nothing is written into the data directory
+    assert sorted(p.name for p in data_dir.iterdir()) == [
+        "AT_000000_001.h5",
+        "AT_000000_002.h5",
+    ]
+    catalog = MetadataCatalog(data_dir, cache_dir / CATALOG_DIR)
+    umask = os.umask(0)
+    _ = os.umask(umask)
+    mode = stat.S_IMODE(catalog.path.stat().st_mode)
+    assert mode == 0o666 & ~umask
+
+    groups = catalog.get(filepath)
+    assert groups is not None
+    assert groups["/"] == {
+        "ExperimentInfo.TimeStart": "2025-01-01T12:00:00+01:00"
+    }
+    assert groups["data"] == {
+        "Aux1.Value": 0.5,
+        "Acquisition.NumFrames": 100,
+    }
+    assert file_attributes(filepath, "data") == groups["data"]
+
+    # Entries of changed files are not used
+    with h5py.File(filepath, "a") as f:
+        f["data"].attrs["Aux1.Value"] = np.float64(1.5)
+    catalog = MetadataCatalog(data_dir, cache_dir / CATALOG_DIR)
+    assert catalog.get(filepath) is None
+    assert file_attributes(filepath, "data")["Aux1.Value"] == 1.5
+
+    # Entries of deleted files are removed
+    (data_dir / "AT_000000_002.h5").unlink()
+    build_catalogs([filepath], cache_dir)
+    catalog = MetadataCatalog(data_dir, cache_dir / CATALOG_DIR)
+    assert list(catalog._entries) == [filepath.name]
+    assert catalog.get(filepath) is not None
+
+    # Without cache, the attributes are read from the file
+    use_catalogs(None)
+    with h5py.File(filepath, "a") as f:
+        f["data"].attrs["Aux1.Value"] = np.float64(2.5)
+    assert file_attributes(filepath, "data")["Aux1.Value"] == 2.5
+
+
+def test_read_corresponding_image():
+    config = Config(colormap="gray", colorrange=(0.0, 100.0))
+    original = HS.with_suffix(".jpeg").read_bytes()
+
+    def decode(uri: str) -> bytes:
+        return base64.b64decode(uri.removeprefix("data:image/jpeg;base64,"))
+
+    # Embedded without transcoding
+    assert decode(read_corresponding_image(HS, False, config)) == original
+
+    # Rotated losslessly by the EXIF orientation
+    with (
+        Image.open(io.BytesIO(original)) as img,
+        Image.open(
+            io.BytesIO(decode(read_corresponding_image(HS, True, config)))
+        ) as rotated,
+    ):
+        assert rotated.getexif()[0x0112] == 8
+        assert np.array_equal(
+            np.asarray(ImageOps.exif_transpose(rotated)),
+            np.asarray(img.rotate(90, expand=True)),
+        )
+
+    config.fastspm_image_max_size = 200
+    uri = read_corresponding_image(HS, True, config)
+    with Image.open(io.BytesIO(decode(uri))) as thumbnail:
+        assert thumbnail.size == (200, 116)
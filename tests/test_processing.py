@@ -1,6 +1,19 @@
+import shutil
+from dataclasses import replace
 from pathlib import Path
 
-from proespm.processing import _import_files, create_measurement_objs
+from proespm.cache import ArtifactCache
+from proespm.config import Config
+from proespm.misc.qcmb import Qcmb
+from proespm.processing import (
+    _import_files,
+    create_html,
+    create_measurement_objs,
+    process_loop,
+    read_and_process,
+)
+from proespm.spm.mul import StmMul
+from proespm.spm.nid import SpmNid
 
 testdata = Path(__file__).parent / "testdata"
 
@@ -13,3 +26,121 @@ def test_import_files():
 def test_create_measurement_objs():
     measurement_objects = create_measurement_objs(str(testdata), lambda _: None)
     assert len(measurement_objects) > 50
+
+
+def test_create_measurement_objs_fastspm_catalog(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    _ = shutil.copy(testdata / "fastspm" / "AT_250526_002.h5", data_dir)
+    _ = shutil.copy(testdata / "fastspm" / "AT_250526_002.jpg", data_dir)
+    cache = ArtifactCache(tmp_path / "cache", 2**30)
+
+    # The catalog of the first run is used by the second one
+    for _ in range(2):
+        measurement_objects = create_measurement_objs(
+            str(data_dir), lambda _: None, cache=cache
+        )
+        assert len(measurement_objects) == 1
+    assert len(list((tmp_path / "cache").glob("fastspm/*.json"))) == 1
+
+    # The catalog is stored in the cache, not next to the data
+    assert len(list(data_dir.iterdir())) == 2
+    measurement_objects = create_measurement_objs(
+        str(data_dir), lambda _: None
+    )
+    assert len(measurement_objects) == 1
+    assert len(list(data_dir.iterdir())) == 2
+
+
+def test_create_measurement_objs_jobs(tmp_path: Path):
+    _ = shutil.copytree(testdata / "ec4", tmp_path / "ec4")
+    for name in ("stm-nanosurf-nid.nid", "stm-aarhus-mul-a.mul", "leed.png"):
+        _ = shutil.copy2(testdata / name, tmp_path)
+
+    sequential = create_measurement_objs(str(tmp_path), lambda _: None)
+    parallel = create_measurement_objs(str(tmp_path), lambda _: None, jobs=4)
+
+    assert [m.m_id() for m in sequential] == [m.m_id() for m in parallel]
+    # 5 EC4 files, grouped into 3 measurements
+    assert len(parallel) == 6
+
+
+def test_process_loop_jobs():
+    config = Config(colormap="inferno", colorrange=(0.1, 99.9))
+
+    def measurements():
+        return [
+            SpmNid(testdata / "stm-nanosurf-nid.nid"),
+            StmMul(testdata / "stm-aarhus-mul-a.mul"),
+            Qcmb(testdata / "qcmb-test.log"),
+        ]
+
+    sequential = measurements()
+    process_loop(sequential, config, lambda _: None)
+    parallel = measurements()
+    process_loop(parallel, replace(config, jobs=2), lambda _: None)
+
+    for seq, par in zip(sequential, parallel, strict=True):
+        assert seq.m_id() == par.m_id()
+        if isinstance(seq, Qcmb):
+            # Bokeh components contain random ids
+            assert par.render_artifacts()["div"] is not None
+        else:
+            assert seq.render_artifacts() == par.render_artifacts()
+
+    slide_nums = [
+        [img.slide_num for img in m.mulimages]
+        for measurements in (sequential, parallel)
+        for m in measurements
+        if isinstance(m, StmMul)
+    ]
+    assert slide_nums[0] == slide_nums[1]
+
+
+def test_create_html_release(tmp_path: Path):
+    config = Config(colormap="inferno", colorrange=(0.1, 99.9))
+    nid = SpmNid(testdata / "stm-nanosurf-nid.nid")
+    mul = StmMul(testdata / "stm-aarhus-mul-a.mul")
+    measurements = [nid, mul]
+    process_loop(measurements, config, lambda _: None)
+    data_uris = [nid.img_data_fw.data_uri, mul.mulimages[0].img_data.data_uri]
+
+    output_path = tmp_path / "test_report.html"
+    create_html(measurements, str(output_path), "test")
+    kept = output_path.read_text()
+    create_html(measurements, str(output_path), "test", release=True)
+
+    html = output_path.read_text()
+    assert html == kept
+    assert all(data_uri in html for data_uri in data_uris)
+    assert nid.img_data_fw.data_uri is None
+    assert mul.mulimages[0].img_data.data_uri is None
+
+
+def test_read_and_process(tmp_path: Path):
+    _ = shutil.copytree(testdata / "ec4", tmp_path / "ec4")
+    for name in ("stm-nanosurf-nid.nid", "stm-aarhus-mul-a.mul", "leed.png"):
+        _ = shutil.copy2(testdata / name, tmp_path)
+    config = Config(colormap="inferno", colorrange=(0.1, 99.9))
+
+    measurements = create_measurement_objs(str(tmp_path), lambda _: None)
+    process_loop(measurements, config, lambda _: None)
+    lean = read_and_process(
+        str(tmp_path), replace(config, lean=True), lambda _: None
+    )
+    lean_parallel = read_and_process(
+        str(tmp_path), replace(config, lean=True, jobs=2), lambda _: None
+    )
+
+    for lean_measurements in (lean, lean_parallel):
+        assert [m.m_id() for m in lean_measurements] == [
+            m.m_id() for m in measurements
+        ]
+        nid = next(m for m in lean_measurements if isinstance(m, SpmNid))
+        expected = next(m for m in measurements if isinstance(m, SpmNid))
+        assert nid.img_data_fw.arr is None
+        assert nid.render_artifacts() == expected.render_artifacts()
+
+    output_path = tmp_path / "test_report.html"
+    create_html(lean_parallel, str(output_path), "test")
+    assert nid.img_data_fw.data_uri in output_path.read_text()
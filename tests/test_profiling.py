@@ -0,0 +1,51 @@
+import json
+import shutil
+from dataclasses import replace
+from pathlib import Path
+
+from proespm.config import Config
+from proespm.processing import (
+    create_html,
+    create_measurement_objs,
+    process_loop,
+)
+from proespm.profiling import Profiler
+
+testdata = Path(__file__).parent / "testdata"
+
+CONFIG = Config(colormap="inferno", colorrange=(0.1, 99.9))
+
+
+def test_profile_trace(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for name in ("stm-nanosurf-nid.nid", "qcmb-test.log"):
+        _ = shutil.copy2(testdata / name, data_dir)
+
+    profiler = Profiler()
+    measurements = create_measurement_objs(
+        str(data_dir), lambda _: None, profiler=profiler
+    )
+    process_loop(
+        measurements, replace(CONFIG, jobs=2), lambda _: None, None, profiler
+    )
+    create_html(
+        measurements, str(tmp_path / "data_report.html"), "data", True, profiler
+    )
+
+    trace_path = tmp_path / "trace.json"
+    profiler.write_trace(trace_path)
+    with open(trace_path) as f:
+        events = json.load(f)["traceEvents"]
+
+    stages = [e["name"] for e in events if e["cat"] == "stage"]
+    assert stages == ["discovery", "reading", "processing", "report"]
+    assert len([e for e in events if e["cat"] == "read"]) == 2
+    processed = [e for e in events if e["cat"] == "process"]
+    # Spans of the worker processes
+    assert {e["args"]["class"] for e in processed} == {"SpmNid", "Qcmb"}
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+
+    summary = profiler.summary()
+    assert any(line.startswith("process: SPM") for line in summary)
+    assert any(line.startswith("report") for line in summary)
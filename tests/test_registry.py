@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import pytest
+
+from proespm import registry
+from proespm.registry import (
+    BUILTIN_READERS,
+    ReaderSpec,
+    find_reader,
+    register_reader,
+)
+
+testdata = Path(__file__).parent / "testdata"
+
+
+def test_builtin_readers():
+    for spec in BUILTIN_READERS:
+        assert spec.load().__name__ == spec.name
+
+
+def test_find_reader():
+    qcmb = find_reader(testdata / "qcmb-test.log")
+    assert qcmb is not None and qcmb.name == "Qcmb"
+    assert find_reader(testdata / "leed.png").name == "Image"  # ty:ignore[possibly-missing-attribute]
+    assert find_reader(testdata / "unknown.xyz") is None
+
+
+def test_register_reader(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    readers = {ext: list(specs) for ext, specs in registry._readers.items()}
+    monkeypatch.setattr(registry, "_readers", readers)
+
+    log = tmp_path / "custom.log"
+    _ = log.write_text("Custom Instrument\nRate (Å/s)\n")
+    custom = ReaderSpec(
+        "proespm.misc.qcmb:Qcmb",
+        (".log", ".xyz"),
+        signatures=(("Custom Instrument", 1),),
+    )
+
+    register_reader(custom)
+    # Built-in readers are tried first
+    assert find_reader(log) is not custom
+    xyz = tmp_path / "other.xyz"
+    _ = xyz.write_text("Other Instrument\n")
+    assert find_reader(xyz) is None
+    assert ".xyz" in registry.registered_extensions()
+
+    register_reader(custom, first=True)
+    assert find_reader(log) is custom
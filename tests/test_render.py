@@ -0,0 +1,55 @@
+import base64
+import io
+from dataclasses import replace
+
+import numpy as np
+from PIL import Image
+
+from proespm.config import Config
+from proespm.spm.render import render_png, scalebar_length
+from proespm.spm.spm import SpmImage
+
+CONFIG = Config(colormap="inferno", colorrange=(0.1, 99.9))
+
+
+def test_scalebar_length():
+    assert scalebar_length(50.0) == (10.0, "10 nm")
+    assert scalebar_length(100.0) == (20.0, "20 nm")
+    assert scalebar_length(1.0) == (200e-3, "200 pm")
+    assert scalebar_length(8000.0) == (1000.0, "1 µm")
+
+
+def test_render_png():
+    arr = np.random.default_rng(0).random((64, 128))
+    png = render_png(arr, 50.0, "inferno", 0.0, 1.0)
+    image = Image.open(io.BytesIO(png))
+    assert image.size == (470, 470)
+
+
+def test_render_png_non_finite():
+    arr = np.ones((64, 64))
+    arr[:8] = np.nan
+    arr[8:16] = np.inf
+    arr[16:24] = -np.inf
+    expected = np.ones((64, 64))
+    expected[:24] = 0.0
+
+    png = render_png(arr, 50.0, "inferno", 0.0, 1.0)
+    assert png == render_png(expected, 50.0, "inferno", 0.0, 1.0)
+
+
+def test_fast_renderer_matches_matplotlib():
+    y, x = np.mgrid[0:256, 0:256]
+    arr = np.sin(x / 20) * np.cos(y / 30)
+
+    images = []
+    for renderer in ("matplotlib", "fast"):
+        spm_image = SpmImage(arr.copy(), 50.0)
+        _ = spm_image.plot(replace(CONFIG, renderer=renderer), "image")
+        assert spm_image.data_uri is not None
+        png = base64.b64decode(spm_image.data_uri.partition(",")[2])
+        image = Image.open(io.BytesIO(png)).convert("RGB")
+        images.append(np.asarray(image, dtype=np.float64))
+
+    assert images[0].shape == images[1].shape
+    assert np.mean(np.abs(images[0] - images[1])) < 8
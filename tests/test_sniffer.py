@@ -0,0 +1,44 @@
+from pathlib import Path
+
+from proespm.sniffer import FileSniffer
+
+testdata = Path(__file__).parent / "testdata"
+
+QCMB = testdata / "qcmb-test.log"
+CV_PALMSENS = testdata / "palm_sens" / "PS241105-3_1.csv"
+
+
+def test_sniffer_utf8():
+    sniffer = FileSniffer(QCMB)
+    assert sniffer.check("Rate (Å/s)", 2)
+    assert not sniffer.check("Rate (Å/s)", 1)
+
+
+def test_sniffer_utf16():
+    sniffer = FileSniffer(CV_PALMSENS)
+    assert sniffer.check("Cyclic Voltammetry", 4)
+    assert not sniffer.check("Chronoamperometry", 4)
+
+
+def test_sniffer_small_buffer():
+    sniffer = FileSniffer(CV_PALMSENS, size=16)
+    assert sniffer.check("Cyclic Voltammetry", 4)
+
+
+def test_sniffer_short_file(tmp_path: Path):
+    path = tmp_path / "short.txt"
+    _ = path.write_text("Region\r\nfoo")
+    sniffer = FileSniffer(path)
+    assert sniffer.check("Region", 1)
+    assert sniffer.check("foo", 2)
+    assert not sniffer.check("foo", 3)
+
+
+def test_sniffer_encoding_of_first_buffer(tmp_path: Path):
+    # Invalid UTF-8 after the first buffer does not change the encoding
+    path = tmp_path / "latin1.txt"
+    _ = path.write_bytes(b"Region\nfoo\nbar\nbaz\nR\xe4te\nqux")
+    sniffer = FileSniffer(path, size=16)
+    assert sniffer.check("Region", 1)
+    assert sniffer.check("R\ufffdte", 5)
+    assert sniffer.check("qux", 6)
@@ -0,0 +1,96 @@
+from dataclasses import replace
+
+import numpy as np
+
+from proespm.config import Config
+from proespm.spm.spm import SpmImage, level_images
+
+
+def corr_plane_lstsq(arr: np.ndarray) -> np.ndarray:
+    """Plane correction by a least squares fit of the full design matrix."""
+    y_shape, x_shape = arr.shape
+    x_coords, y_coords = np.meshgrid(np.arange(x_shape), np.arange(y_shape))
+    coeff_matrix = np.column_stack(
+        (np.ones(arr.size), x_coords.ravel(), y_coords.ravel())
+    )
+    coeffs = np.linalg.lstsq(coeff_matrix, arr.ravel(), rcond=-1)[0]
+    return arr - (coeffs[0] + coeffs[1] * x_coords + coeffs[2] * y_coords)
+
+
+def test_corr_plane():
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:100, 0:150]
+    arr = 3.0 + 0.2 * x - 0.5 * y + rng.normal(size=(100, 150))
+
+    image = SpmImage(arr.copy(), 10.0)
+    _ = image.corr_plane()
+
+    np.testing.assert_allclose(image.arr, corr_plane_lstsq(arr), atol=1e-9)
+
+
+def test_corr_plane_single_line():
+    arr = np.arange(10.0)[np.newaxis, :] * 2 + 1
+
+    image = SpmImage(arr.copy(), 10.0)
+    _ = image.corr_plane()
+
+    np.testing.assert_allclose(image.arr, corr_plane_lstsq(arr), atol=1e-9)
+
+
+def test_corr_lines_median():
+    arr = np.random.default_rng(0).normal(size=(300, 101))
+
+    image = SpmImage(arr.copy(), 10.0)
+    _ = image.corr_lines_median()
+
+    expected = arr - np.median(arr, axis=1)[:, np.newaxis]
+    np.testing.assert_allclose(image.arr, expected, atol=1e-12)
+
+
+def test_level():
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:600, 0:500]
+    arr = 0.1 * x + 0.3 * y + rng.normal(size=(600, 500))
+    arr += rng.normal(size=(600, 1))  # offsets of the scan lines
+
+    expected = corr_plane_lstsq(arr)
+    expected -= np.median(expected, axis=1)[:, np.newaxis]
+    expected = corr_plane_lstsq(expected)
+    expected -= np.median(expected, axis=1)[:, np.newaxis]
+
+    image = SpmImage(arr.copy(), 10.0)
+    _ = image.level()
+
+    np.testing.assert_allclose(image.arr, expected, atol=1e-9)
+
+
+def test_prepare():
+    config = Config(colormap="inferno", colorrange=(0.1, 99.9))
+    arr = np.arange(12.0).reshape(3, 4)
+
+    image = SpmImage(arr, 10.0, scale=1e9)
+    _ = image.prepare(config).prepare(config)
+    assert image.arr is arr  # scaled in place, only once
+    expected = np.arange(12.0).reshape(3, 4) * 1e9
+    np.testing.assert_array_equal(image.arr, expected)
+
+    raw = np.frombuffer(np.arange(12, dtype=np.int32).tobytes(), np.int32)
+    image = SpmImage(raw.reshape(3, 4), 10.0)
+    _ = image.prepare(replace(config, float32=True)).level()
+    assert image.arr.dtype == np.float32
+
+
+def test_level_images():
+    config = Config(colormap="inferno", colorrange=(0.1, 99.9))
+    rng = np.random.default_rng(0)
+    arrs = [rng.normal(size=shape) for shape in [(40, 50)] * 3 + [(20, 30)]]
+    arrs[1] += np.arange(50) * 0.3
+
+    images = [SpmImage(arr.copy(), 10.0, scale=2.0) for arr in arrs]
+    level_images(images, config)
+
+    for image, arr in zip(images, arrs):
+        expected = SpmImage(arr.copy(), 10.0, scale=2.0).prepare(config)
+        np.testing.assert_allclose(image.arr, expected.level().arr, atol=1e-9)
+    assert images[0].arr.base is images[2].arr.base
+    assert images[3].arr.base is not images[0].arr.base
@@ -0,0 +1,32 @@
+import subprocess
+import sys
+
+# Dependencies of the readers, which must not be imported on startup
+HEAVY_MODULES = (
+    "numpy",
+    "matplotlib",
+    "bokeh",
+    "cv2",
+    "h5py",
+    "PIL",
+    "bs4",
+    "access2thematrix",
+    "nanonispy",
+    "vamas",
+)
+
+
+def test_cli_import_budget():
+    code = (
+        "import sys; import proespm.cli, proespm.processing, proespm.watch;"
+        "print(' '.join(sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    imported = {name.split(".")[0] for name in result.stdout.split()}
+    assert imported.isdisjoint(HEAVY_MODULES)
+
@@ -1,7 +1,31 @@
+import dataclasses
+import os
+import shutil
+import struct
+from collections.abc import Iterator
+from itertools import islice
 from pathlib import Path
+from typing import Any
+
+import access2thematrix
+import cv2
+import numpy as np
+import pytest
+from numpy.typing import NDArray
+from sm4file import Sm4
+
+from proespm.config import Config
+from proespm.ec.ec import EcPlot
+from proespm.spm.flm import Mp4WriterError, StmFlm
 from proespm.spm.nid import SpmNid
-from proespm.spm.mtrx import StmMatrix
-from proespm.spm.sm4 import StmSm4
+from proespm.spm.mtrx import (
+    NoParamFileError,
+    StmMatrix,
+    _param_files,
+    _read_experiment,
+)
+from proespm.spm.sm4 import StmSm4, read_page_index
+from proespm.spm.sxm import StmSxm
 
 testdata = Path(__file__).parent / "testdata"
 
@@ -10,6 +34,7 @@ STM_MUL_A = testdata / "stm-aarhus-mul-a.mul"
 STM_MUL_B = testdata / "stm-aarhus-mul-b.mul"
 STM_MATRIX = testdata / "20201111--4_1.Z_mtrx"
 STM_RHK = testdata / "data0740.SM4"
+STM_SXM = testdata / "stm-nanonis-sxm.sxm"
 STM_NID = testdata / "stm-nanosurf-nid.nid"
 AFM_NID = testdata / "afm-nanosurf-nid.nid"
 
@@ -44,6 +69,45 @@ def test_afm_nid():
     assert nid.yoffset == -1200.0
 
 
+def test_nid_channels():
+    nid = SpmNid(AFM_NID)
+    assert [(ch.name, ch.frame) for ch in nid.channels] == [
+        ("Z-Axis", "Scan forward"),
+        ("Amplitude", "Scan forward"),
+        ("Z-Axis", "Scan backward"),
+        ("Amplitude", "Scan backward"),
+    ]
+
+    amplitude = nid.find_channel(("Amplitude",), "Scan forward")
+    assert amplitude is not None
+    assert amplitude.unit == "V"
+    (arr,) = nid.read_channels([amplitude])
+    assert arr.shape == (nid.yres, nid.xres)
+    assert nid.find_channel(("Tip Current",), "Scan forward") is None
+
+    # Of several matching channels, the last one is used
+    nid.channels[1] = dataclasses.replace(nid.channels[1], name="Z-Axis")
+    channel = nid.find_channel(("Z-Axis", "Topography"), "Scan forward")
+    assert channel is not None
+    assert channel.index == 1
+
+
+def test_stm_sxm():
+    sxm = StmSxm(STM_SXM)
+    assert round(sxm.current, 4) == 0.9319
+    assert sxm.bias == 2.0
+    assert round(sxm.xsize, 2) == 20.00
+    assert round(sxm.ysize, 2) == 20.00
+    assert sxm.xres == 256
+    assert sxm.yres == 256
+    assert sxm.rotation == 0.0
+    assert round(sxm.line_time, 2) == 25.60
+    assert round(sxm.xoffset, 4) == 138.5985
+    assert round(sxm.yoffset, 4) == -66.0261
+    assert sxm.img_data_fw.arr.shape == (256, 256)
+    assert sxm.img_data_bw.arr.shape == (256, 256)
+
+
 def test_stm_matrix():
     mtrx = StmMatrix(STM_MATRIX)
     assert mtrx.current == 0.30
@@ -56,6 +120,33 @@ def test_stm_matrix():
     assert mtrx.scan_duration == 80.00
 
 
+def test_stm_matrix_traces():
+    mtrx = StmMatrix(STM_MATRIX)
+    mtrx_data = access2thematrix.MtrxData()
+    traces, _ = mtrx_data.open(str(STM_MATRIX))
+    img_fw = mtrx_data.select_image(traces[0])[0]
+    img_bw = mtrx_data.select_image(traces[1])[0]
+    assert np.array_equal(mtrx.img_data_fw.arr, np.flip(img_fw.data, axis=0))
+    assert np.array_equal(mtrx.img_data_bw.arr, np.flip(img_bw.data, axis=0))
+
+
+def test_stm_matrix_params():
+    # Parsed with the private parser of access2thematrix, which must keep
+    # the state of the parameters like `MtrxData.open`
+    mtrx_data = access2thematrix.MtrxData()
+    _ = mtrx_data.open(str(STM_MATRIX))
+    experiment = _read_experiment(_param_files(STM_MATRIX))
+    # `MtrxData.open` adds the time stamp of the data file as `BKLT`
+    expected = {k: v for k, v in mtrx_data.param.items() if k != "BKLT"}
+    assert experiment.params_of(STM_MATRIX.name) == expected
+
+
+def test_stm_matrix_no_param_file(tmp_path: Path):
+    _ = shutil.copy(STM_MATRIX, tmp_path)
+    with pytest.raises(NoParamFileError):
+        _ = StmMatrix(tmp_path / STM_MATRIX.name)
+
+
 def test_stm_sm4():
     mtrx = StmSm4(STM_RHK)
     assert round(mtrx.current, 2) == 1.00
@@ -65,3 +156,202 @@ def test_stm_sm4():
     assert mtrx.xres == 512
     assert mtrx.yres == 512
     assert round(mtrx.line_time) == 50.00
+
+
+def _sm4_string(text: str) -> bytes:
+    return struct.pack("<H", len(text)) + text.encode("utf-16-le")
+
+
+def write_sm4(
+    filepath: Path, pages: list[tuple[str, int, int, int, float]]
+) -> None:
+    """Write an .sm4 file with pages of 64x48 points of random data.
+
+    Each page is given by its label, data type (0 for image, 1 for line),
+    page type, scan type (0 for forward, 1 for backward) and the sign of its
+    y scale. The x scale is negative for every second page, so the data of
+    all image pages is flipped differently.
+    """
+    rng = np.random.default_rng(0)
+    xres, yres = 64, 48
+    prm = b"PRM TEXT"
+    file_header_size = 2 + 36 + 4 * 5 + 3 * 12
+    prm_header_offset = file_header_size
+    prm_offset = prm_header_offset + 12
+    index_header_offset = prm_offset + len(prm)
+    index_array_offset = index_header_offset + 16 + 12
+    page_entry_size = 2 + 14 + 16 + 2 * 12
+    page_header_size = 2 + 2 + 4 * 13 + 4 * 11 + 4 * 4 + 64 + 12
+
+    offset = index_array_offset + len(pages) * page_entry_size
+    entries, blocks = b"", b""
+    for i, (label, data_type, page_type, scan_type, y_sign) in enumerate(
+        pages
+    ):
+        strings = [label, "", "", "", "", "03/14/22", "12:34:56"] + [""] * 12
+        string_data = b"".join(_sm4_string(text) for text in strings)
+        strings_offset = offset + page_header_size
+        data_offset = strings_offset + len(string_data)
+        data = rng.integers(-1000, 1000, xres * yres, dtype="<i4")
+
+        page_header = (
+            struct.pack("<HH", 0, len(strings))
+            + struct.pack(
+                "<13I", page_type, 0, 4 * data_type, 0, 0, xres, yres, 0,
+                scan_type, 0, data.nbytes, 0, 0,
+            )
+            + struct.pack(
+                "<11f", (-1) ** i * 1e-10, y_sign * 1e-10, 1e-12, 0.0,
+                1e-9, 2e-9, 3e-12, 1e-4, 0.5, 1e-9, 0.0,
+            )
+            + struct.pack("<4I", 0, 0, 0, 1)
+            + bytes(64)
+            + struct.pack("<3I", 10, strings_offset, len(string_data))
+        )  # fmt: skip
+        entries += (
+            struct.pack("<H", i)
+            + bytes(14)
+            + struct.pack("<4I", data_type, 0, 2, 0)
+            + struct.pack("<3I", 3, offset, page_header_size)
+            + struct.pack("<3I", 4, data_offset, data.nbytes)
+        )
+        blocks += page_header + string_data + data.tobytes()
+        offset = data_offset + data.nbytes
+
+    content = (
+        struct.pack("<H", file_header_size)
+        + b"STiMage 005.006 1".ljust(36, b"\0")
+        + struct.pack("<5I", len(pages), 3, 12, 0, 0)
+        + struct.pack("<3I", 15, prm_header_offset, 12)
+        + struct.pack("<3I", 13, prm_offset, len(prm))
+        + struct.pack("<3I", 1, index_header_offset, 28)
+        + struct.pack("<3I", 0, len(prm), 0)
+        + prm
+        + struct.pack("<4I", len(pages), 1, 0, 0)
+        + struct.pack("<3I", 2, index_array_offset, len(entries))
+        + entries
+        + blocks
+    )
+    _ = filepath.write_bytes(content)
+
+
+def test_sm4_page_index(tmp_path: Path):
+    filepath = tmp_path / "synthetic.sm4"
+    write_sm4(
+        filepath,
+        [
+            ("Topography", 0, 1, 0, 1),
+            ("Topography", 0, 1, 1, -1),
+            ("Current", 0, 2, 0, 1),
+            ("Current", 0, 2, 1, 1),
+            ("I_WE", 1, 3, 0, 1),
+        ],
+    )
+
+    channels = list(Sm4(str(filepath)))
+    pages = read_page_index(filepath)
+    assert [page.label for page in pages] == [ch.label for ch in channels]
+
+    for page, channel in zip(pages, channels):
+        assert np.array_equal(page.read_data(filepath), channel.data)
+        page_channel = page.to_channel(filepath)
+        for field in dataclasses.fields(channel):
+            assert np.array_equal(
+                getattr(page_channel, field.name), getattr(channel, field.name)
+            ), field.name
+
+    # Forward and backward topography pages
+    sm4 = StmSm4(filepath)
+    assert channels[0].scan_direction == "right"
+    assert channels[1].scan_direction == "left"
+    assert np.array_equal(sm4.img_fw.data, channels[0].data)
+    assert np.array_equal(sm4.img_bw.data, channels[1].data)
+
+
+def test_sm4_ec_pages(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    filepath = tmp_path / "synthetic.sm4"
+    write_sm4(
+        filepath,
+        [
+            ("Topography", 0, 1, 0, 1),
+            ("Topography", 0, 1, 1, -1),
+            ("Current", 0, 2, 0, 1),
+            ("Current", 0, 2, 1, 1),
+            ("VEC", 1, 3, 0, 1),
+            ("E_WE", 1, 3, 0, 1),
+            ("U_Tun", 1, 3, 0, 1),
+            ("I_WE", 1, 3, 0, 1),
+        ],
+    )
+
+    plotted: list[NDArray[np.float64]] = []
+    plot_scatter = EcPlot.plot_scatter
+
+    def record(plot: EcPlot, x: Any, y: Any, *args: Any, **kwargs: Any):
+        plotted.append(y)
+        plot_scatter(plot, x, y, *args, **kwargs)
+
+    monkeypatch.setattr(EcPlot, "plot_scatter", record)
+    sm4 = StmSm4(filepath)
+    assert sm4.voltage_script is not None
+    assert sm4.current_script is not None
+
+    # Of the two pages of the cell potential, the first one is plotted
+    channels = {ch.label: ch for ch in reversed(list(Sm4(str(filepath))))}
+    expected = [
+        np.average(channels["VEC"].data, axis=0),
+        np.average(channels["U_Tun"].data, axis=0),
+        np.average(channels["I_WE"].data, axis=1),
+    ]
+    assert len(plotted) == len(expected)
+    for averaged, expected_averaged in zip(plotted, expected):
+        assert np.array_equal(averaged, expected_averaged)
+    assert not np.array_equal(
+        plotted[0], np.average(channels["E_WE"].data, axis=0)
+    )
+
+
+def test_stm_flm_mp4(tmp_path: Path):
+    # An .flm file has the same format as a .mul file
+    flm_path = tmp_path / "movie.flm"
+    _ = shutil.copy(STM_MUL_A, flm_path)
+    flm = StmFlm(flm_path)
+    config = Config(
+        colormap="inferno", colorrange=(0.1, 99.9), mp4_downscale=2
+    )
+    _ = flm.process(config)
+
+    capture = cv2.VideoCapture(flm.mp4_name)
+    assert int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == len(flm.mulimages)
+    assert int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)) == 256
+    assert int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)) == 256
+    capture.release()
+
+    assert flm.mp4_is_up_to_date(config.mp4_fps, config.mp4_downscale)
+    assert not flm.mp4_is_up_to_date(config.mp4_fps + 1, 1)
+
+    os.utime(flm.mp4_name, (0, 0))
+    assert not flm.mp4_is_up_to_date(config.mp4_fps, config.mp4_downscale)
+
+
+def test_stm_flm_mp4_failure(monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+    flm_path = tmp_path / "movie.flm"
+    _ = shutil.copy(STM_MUL_A, flm_path)
+    flm = StmFlm(flm_path)
+
+    def failing_frames(_: int) -> Iterator[NDArray[np.uint8]]:
+        yield from islice(frames, 1)
+        raise cv2.error("resize failed")
+
+    # No temporary file is left behind by failing frames
+    frames = flm._mp4_frames(1)
+    monkeypatch.setattr(flm, "_mp4_frames", failing_frames)
+    with pytest.raises(cv2.error):
+        flm.convert_to_mp4()
+    assert os.listdir(flm.mp4_save_dir) == []
+
+    # A missing codec is reported before any frame is colored
+    monkeypatch.setattr(cv2, "VideoWriter_fourcc", lambda *_: 0x5A5A5A5A)
+    with pytest.raises(Mp4WriterError):
+        flm.convert_to_mp4()
+    assert os.listdir(flm.mp4_save_dir) == []
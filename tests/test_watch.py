@@ -0,0 +1,94 @@
+import os
+import shutil
+from pathlib import Path
+
+from proespm.config import Config
+from proespm.ec.nordic_ec4 import NordicEc4
+from proespm.watch import ReportWatcher
+
+testdata = Path(__file__).parent / "testdata"
+
+CONFIG = Config(colormap="inferno", colorrange=(0.1, 99.9))
+
+
+def create_watcher(data_dir: Path, output_path: Path) -> ReportWatcher:
+    return ReportWatcher(
+        str(data_dir), str(output_path), "test", CONFIG, lambda _: None
+    )
+
+
+def test_watch_new_and_modified_files(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    output_path = tmp_path / "report.html"
+    _ = shutil.copy2(testdata / "stm-nanosurf-nid.nid", data_dir)
+    qcmb = Path(shutil.copy2(testdata / "qcmb-test.log", data_dir))
+
+    watcher = create_watcher(data_dir, output_path)
+    assert watcher.update()
+    assert output_path.exists()
+    assert not watcher.update()
+    measurements = [m for m, _ in watcher._measurements]
+    assert len(measurements) == 2
+
+    # New files are picked up once they did not change between two scans
+    _ = shutil.copy2(testdata / "leed.png", data_dir)
+    assert not watcher.update()
+    assert watcher.update()
+    assert len(watcher._measurements) == 3
+    assert all(
+        any(m is measurement for m, _ in watcher._measurements)
+        for measurement in measurements
+    )
+
+    stat = qcmb.stat()
+    os.utime(qcmb, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    _ = watcher.update()
+    assert watcher.update()
+    new_measurements = [m for m, _ in watcher._measurements]
+    assert len(new_measurements) == 3
+    assert not any(m is measurements[1] for m in new_measurements)
+
+    qcmb.unlink()
+    assert watcher.update()
+    assert len(watcher._measurements) == 2
+
+
+def test_watch_unreadable_file(tmp_path: Path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    output_path = tmp_path / "report.html"
+    _ = shutil.copy2(testdata / "leed.png", data_dir)
+    nid = data_dir / "broken.nid"
+    _ = nid.write_bytes((testdata / "stm-nanosurf-nid.nid").read_bytes()[:100])
+
+    messages: list[str] = []
+    watcher = ReportWatcher(
+        str(data_dir), str(output_path), "test", CONFIG, messages.append
+    )
+    assert watcher.update()
+    assert len(watcher._measurements) == 1
+    assert any(m.startswith("Cannot read broken.nid") for m in messages)
+
+    # Read again only once the file changed
+    assert not watcher.update()
+    _ = shutil.copy2(testdata / "stm-nanosurf-nid.nid", nid)
+    _ = watcher.update()
+    assert watcher.update()
+    assert len(watcher._measurements) == 2
+
+
+def test_watch_ec4_continuation(tmp_path: Path):
+    output_path = tmp_path / "report.html"
+    _ = shutil.copy2(testdata / "ec4" / "CV_103244_ 1.txt", tmp_path)
+
+    watcher = create_watcher(tmp_path, output_path)
+    assert watcher.update()
+
+    _ = shutil.copy2(testdata / "ec4" / "CV_103345_ 2.txt", tmp_path)
+    _ = watcher.update()
+    assert watcher.update()
+    assert len(watcher._measurements) == 1
+    ec4, _ = watcher._measurements[0]
+    assert isinstance(ec4, NordicEc4)
+    assert len(ec4.source_files()) == 2